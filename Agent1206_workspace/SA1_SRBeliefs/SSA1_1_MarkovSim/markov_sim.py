@@ -6,22 +6,23 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
-from shared.markov_utils import MarkovChain, save_figure
+from shared.markov_utils import MarkovChain
+from shared.chain_stats import TransitionAccumulator
+from shared.figures import FigureQueue, pyplot
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
 
 ALPHAS = [0.1, 0.3, 0.5]
 BETAS = [0.1, 0.3, 0.5]
-N_SIMS = 500
+N_SIMS = 500          # maximum paths per (alpha, beta)
 T_STEPS = 5000
+BATCH_SIZE = 50       # paths simulated per accumulator update
+CI_TARGET = 0.002     # stop once every 95% CI half-width is below this
 
 
-def run_validation():
+def run_validation(figures):
     """Run simulations and compare empirical vs theoretical statistics."""
     rng = np.random.default_rng(42)
 
@@ -40,27 +41,20 @@ def run_validation():
             mc = MarkovChain(alpha=alpha, beta=beta)
             pi_theo = mc.pi[0]  # Pr(G)
 
-            emp_freqs = np.zeros(N_SIMS)
-            emp_trans_GG = np.zeros(N_SIMS)
-            emp_trans_BG = np.zeros(N_SIMS)
+            # Draw batches of paths until the CIs are narrow enough
+            acc = TransitionAccumulator(n_states=2, max_lag=1)
+            while acc.n_paths < N_SIMS:
+                acc.update(mc.simulate_batch(BATCH_SIZE, T_STEPS, rng=rng), new_paths=True)
+                if acc.n_paths >= 2 * BATCH_SIZE and acc.max_ci_halfwidth() <= CI_TARGET:
+                    break
 
-            for n in range(N_SIMS):
-                states = mc.simulate(T_STEPS, rng=rng)
-                emp_freqs[n] = np.mean(states == 0)
-
-                # Empirical transition frequencies
-                from_G = states[:-1] == 0
-                from_B = states[:-1] == 1
-                if from_G.sum() > 0:
-                    emp_trans_GG[n] = np.mean(states[1:][from_G] == 0)
-                if from_B.sum() > 0:
-                    emp_trans_BG[n] = np.mean(states[1:][from_B] == 0)
-
-            mean_freq = np.mean(emp_freqs)
+            mean_freq = acc.stationary()[0]
+            emp_T = acc.transition_matrix()
             freq_err = abs(mean_freq - pi_theo)
-            trans_err_GG = abs(np.mean(emp_trans_GG) - (1 - alpha))
-            trans_err_BG = abs(np.mean(emp_trans_BG) - beta)
+            trans_err_GG = abs(emp_T[0, 0] - (1 - alpha))
+            trans_err_BG = abs(emp_T[1, 0] - beta)
             max_trans_err = max(trans_err_GG, trans_err_BG)
+            autocorr = acc.autocorrelation(1)
 
             freq_errors[i, j] = freq_err
             trans_errors[i, j] = max_trans_err
@@ -71,15 +65,29 @@ def run_validation():
                 'alpha': alpha, 'beta': beta,
                 'pi_theo': pi_theo, 'pi_emp': mean_freq,
                 'freq_err': freq_err, 'trans_err': max_trans_err,
-                'std_freq': np.std(emp_freqs),
-                'trans_GG_err': trans_err_GG, 'trans_BG_err': trans_err_BG
+                'std_freq': acc.stationary_std()[0],
+                'trans_GG_err': trans_err_GG, 'trans_BG_err': trans_err_BG,
+                'autocorr': autocorr, 'autocorr_theo': 1 - alpha - beta,
+                'n_paths': acc.n_paths, 'ci_halfwidth': acc.max_ci_halfwidth()
             })
 
             print(f"α={alpha:.1f}, β={beta:.1f}: π(G)={pi_theo:.4f}, "
                   f"emp={mean_freq:.4f}, freq_err={freq_err:.5f}, "
-                  f"trans_err={max_trans_err:.5f}")
+                  f"trans_err={max_trans_err:.5f}, "
+                  f"rho1={autocorr:.4f} (theory {1 - alpha - beta:.4f}), "
+                  f"paths={acc.n_paths}")
+
+    figures.submit(plot_validation_stats, os.path.join(FIGURES_DIR, 'validation_stats.png'),
+                   freq_errors, trans_errors, pi_theoretical)
+
+    return results
+
 
-    # Create validation heatmaps
+def plot_validation_stats(freq_errors, trans_errors, pi_theoretical):
+    """Validation heatmaps: frequency errors, transition errors, theoretical π(G)."""
+    plt = pyplot()
+    n_alpha = len(ALPHAS)
+    n_beta = len(BETAS)
     fig, axes = plt.subplots(1, 3, figsize=(16, 5))
 
     # Heatmap 1: Stationary frequency errors
@@ -128,44 +136,46 @@ def run_validation():
                          ha='center', va='center', fontsize=9)
     fig.colorbar(im2, ax=axes[2], shrink=0.8)
 
-    fig.suptitle(f'Markov Chain Validation (N={N_SIMS}, T={T_STEPS})', fontsize=14, y=1.02)
+    fig.suptitle(f'Markov Chain Validation (N≤{N_SIMS}, T={T_STEPS}, CI≤{CI_TARGET})', fontsize=14, y=1.02)
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'validation_stats.png')
-    save_figure(fig, fig_path)
-    print(f"\nSaved: {fig_path}")
-
-    return results
+    return fig
 
 
 def write_report(results):
     """Generate report.md with findings."""
     max_freq_err = max(r['freq_err'] for r in results)
     max_trans_err = max(r['trans_err'] for r in results)
+    n_within = sum(max(r['freq_err'], r['trans_err']) <= r['ci_halfwidth'] for r in results)
 
     report = f"""# SSA1_1: Markov Chain Simulation — Validation Report
 
 ## Summary
 
-Validated the `MarkovChain` class by comparing empirical statistics from {N_SIMS} simulations
+Validated the `MarkovChain` class by comparing empirical statistics from simulations
 of {T_STEPS} steps each against theoretical values for all (α,β) combinations in
-{{0.1, 0.3, 0.5}} × {{0.1, 0.3, 0.5}}.
+{{0.1, 0.3, 0.5}} × {{0.1, 0.3, 0.5}}. Paths are drawn in batches of {BATCH_SIZE} and
+accumulated online; each cell stops once every 95% CI half-width (stationary
+distribution and transition probabilities) is below {CI_TARGET}, or at {N_SIMS} paths.
 
 ## Results
 
-| α | β | π(G) theoretical | π(G) empirical | Freq Error | Max Trans Error |
-|---|---|---|---|---|---|
+| α | β | π(G) theoretical | π(G) empirical | Freq Error | Max Trans Error | ρ(1) theoretical | ρ(1) empirical | Paths |
+|---|---|---|---|---|---|---|---|---|
 """
     for r in results:
         report += (f"| {r['alpha']:.1f} | {r['beta']:.1f} | {r['pi_theo']:.4f} | "
-                   f"{r['pi_emp']:.4f} | {r['freq_err']:.5f} | {r['trans_err']:.5f} |\n")
+                   f"{r['pi_emp']:.4f} | {r['freq_err']:.5f} | {r['trans_err']:.5f} | "
+                   f"{r['autocorr_theo']:.4f} | {r['autocorr']:.4f} | {r['n_paths']} |\n")
 
     report += f"""
 ## Key Findings
 
 1. **Maximum stationary frequency error**: {max_freq_err:.5f}
 2. **Maximum transition frequency error**: {max_trans_err:.5f}
-3. All errors are within expected Monte Carlo tolerance (~1/√(N·T) ≈ {1/np.sqrt(N_SIMS * T_STEPS):.5f})
-4. The MarkovChain class correctly implements the 2-state Markov chain
+3. {n_within} of {len(results)} cells have both errors within their own 95% CI half-width (max {max(r['ci_halfwidth'] for r in results):.5f})
+4. Lag-1 autocorrelations match 1 − α − β (max error {max(abs(r['autocorr'] - r['autocorr_theo']) for r in results):.4f})
+5. Early stopping used {sum(r['n_paths'] for r in results)} of {N_SIMS * len(results)} possible paths
+6. The MarkovChain class correctly implements the 2-state Markov chain
 
 ## Figures
 
@@ -188,6 +198,10 @@ if __name__ == '__main__':
     print("=" * 60)
     print("SSA1_1: Markov Chain Simulation Validation")
     print("=" * 60)
-    results = run_validation()
+    figures = FigureQueue()
+    results = run_validation(figures)
     write_report(results)
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
@@ -6,12 +6,11 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
-from shared.markov_utils import (MarkovChain, DeterrenceGame, BayesianFilter,
-                                  make_strategy_matrix, tv_distance, save_figure)
+from shared.markov_utils import (MarkovChain, simulate_path, DeterrenceGame,
+                                  make_strategy_matrix, log_odds_filter,
+                                  log_odds_to_belief)
+from shared.figures import FigureQueue, pyplot
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
@@ -26,28 +25,25 @@ def run_belief_tracking(alpha, beta, label, rng):
     strategy_mat = make_strategy_matrix(game.stackelberg_strategy)
 
     # Simulate state sequence
-    states = mc.simulate(T_STEPS, rng=rng)
+    states = simulate_path(mc, T_STEPS, rng)
 
-    # Run Bayesian filter
-    bf = BayesianFilter(mc)
-    beliefs = np.zeros(T_STEPS)
-    tv_distances = np.zeros(T_STEPS)
+    # SR observes action chosen by commitment type in state theta_t
+    actions = strategy_mat[states].argmax(axis=1)
 
-    beliefs[0] = bf.belief[0]
-    tv_distances[0] = tv_distance(bf.belief, mc.pi)
+    # Filter the whole action sequence at once: the prior π at t = 0,
+    # then one update per observed action
+    posteriors = np.empty((T_STEPS, 2))
+    posteriors[0] = mc.pi
+    posteriors[1:, 0] = log_odds_to_belief(log_odds_filter(actions[1:], mc, strategy_mat))
+    posteriors[1:, 1] = 1 - posteriors[1:, 0]
 
-    for t in range(1, T_STEPS):
-        # SR observes action chosen by commitment type in state theta_t
-        action = game.stackelberg_strategy(states[t])
-        posterior = bf.update(signal=action, strategy_matrix=strategy_mat)
-        beliefs[t] = posterior[0]  # Pr(G)
-        tv_distances[t] = tv_distance(posterior, mc.pi)
+    beliefs = posteriors[:, 0]  # Pr(G)
+    tv_distances = 0.5 * np.abs(posteriors - mc.pi).sum(axis=1)
 
     # Conditional beliefs: what SR SHOULD believe if they knew theta_{t-1}
     conditional_beliefs = np.zeros(T_STEPS)
     conditional_beliefs[0] = mc.pi[0]
-    for t in range(1, T_STEPS):
-        conditional_beliefs[t] = mc.T[states[t-1], 0]  # Pr(G | theta_{t-1})
+    conditional_beliefs[1:] = mc.T[states[:-1], 0]  # Pr(G | theta_{t-1})
 
     return {
         'states': states,
@@ -63,6 +59,7 @@ def run_belief_tracking(alpha, beta, label, rng):
 
 def plot_belief_trajectory(results_list):
     """Plot belief trajectories for multiple parameter settings."""
+    plt = pyplot()
     n = len(results_list)
     fig, axes = plt.subplots(n, 1, figsize=(14, 5 * n), sharex=True)
     if n == 1:
@@ -99,13 +96,12 @@ def plot_belief_trajectory(results_list):
     axes[-1].set_xlabel('Time step')
     fig.suptitle('SR Player Belief Trajectories Under Commitment Strategy', fontsize=13, y=1.01)
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'belief_trajectory.png')
-    save_figure(fig, fig_path)
-    print(f"Saved: {fig_path}")
+    return fig
 
 
 def plot_tv_distance(results_list):
     """Plot TV distance over time."""
+    plt = pyplot()
     fig, axes = plt.subplots(len(results_list), 1, figsize=(14, 4 * len(results_list)),
                               sharex=True)
     if len(results_list) == 1:
@@ -137,9 +133,7 @@ def plot_tv_distance(results_list):
     axes[-1].set_xlabel('Time step')
     fig.suptitle('TV Distance ‖belief − π‖ Over Time', fontsize=13, y=1.01)
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'tv_distance_timeseries.png')
-    save_figure(fig, fig_path)
-    print(f"Saved: {fig_path}")
+    return fig
 
 
 def write_report(results_list):
@@ -227,7 +221,13 @@ if __name__ == '__main__':
     print(f"  Mean TV distance: {np.mean(res2['tv_distances']):.4f}")
     print(f"  Last 1000 mean TV: {np.mean(res2['tv_distances'][-1000:]):.4f}")
 
-    plot_belief_trajectory(results_list)
-    plot_tv_distance(results_list)
+    figures = FigureQueue()
+    figures.submit(plot_belief_trajectory, os.path.join(FIGURES_DIR, 'belief_trajectory.png'),
+                   results_list)
+    figures.submit(plot_tv_distance, os.path.join(FIGURES_DIR, 'tv_distance_timeseries.png'),
+                   results_list)
     write_report(results_list)
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
@@ -1,20 +1,29 @@
 #!/usr/bin/env python3
-"""SSA1_3: Belief Visualization and Summary Statistics across parameter space."""
+"""SSA1_3: Belief Visualization and Summary Statistics across parameter space.
+
+Figures are rendered after the report (shared/figures.py); pass
+--no-figures to skip them.
+"""
 
 import os
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
-from shared.markov_utils import (MarkovChain, DeterrenceGame, BayesianFilter,
-                                  make_strategy_matrix, tv_distance, save_figure)
+from shared.markov_utils import (MarkovChain, simulate_path, DeterrenceGame,
+                                  make_strategy_matrix, tv_distance,
+                                  log_odds_filter, log_odds_to_belief)
+from shared.figures import FigureQueue, pyplot
+from shared.grid import evaluate_grid
+from shared.belief_chain import BeliefChain
+from shared.trajectories import TrajectoryStore
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
+TRAJECTORY_STORE = os.path.join(os.path.dirname(__file__), 'trajectories')
+# Root seed of the stored persistence-comparison paths (recorded in the manifest)
+PERSISTENCE_SEED = 789
 
 N_SIMS = 200
 T_STEPS = 5000
@@ -22,6 +31,16 @@ ALPHA_GRID = np.linspace(0.05, 0.95, 10)
 BETA_GRID = np.linspace(0.05, 0.95, 10)
 
 
+def filter_beliefs(mc, states, strategy_mat):
+    """SR posteriors over t = 0..T-1: the prior π at t = 0, then one update per action."""
+    actions = strategy_mat[states].argmax(axis=1)
+    beliefs = np.empty((len(states), 2))
+    beliefs[0] = mc.pi
+    beliefs[1:, 0] = log_odds_to_belief(log_odds_filter(actions[1:], mc, strategy_mat))
+    beliefs[1:, 1] = 1 - beliefs[1:, 0]
+    return beliefs
+
+
 def compute_tv_for_params(alpha, beta, n_sims, t_steps, rng):
     """Run n_sims simulations, return array of time-averaged TV distances."""
     mc = MarkovChain(alpha=alpha, beta=beta)
@@ -31,16 +50,9 @@ def compute_tv_for_params(alpha, beta, n_sims, t_steps, rng):
     time_avg_tvs = np.zeros(n_sims)
     all_tv_trajectories = []
 
-    for n in range(n_sims):
-        states = mc.simulate(t_steps, rng=rng)
-        bf = BayesianFilter(mc)
-        tv_dists = np.zeros(t_steps)
-        tv_dists[0] = tv_distance(bf.belief, mc.pi)
-
-        for t in range(1, t_steps):
-            action = game.stackelberg_strategy(states[t])
-            posterior = bf.update(signal=action, strategy_matrix=strategy_mat)
-            tv_dists[t] = tv_distance(posterior, mc.pi)
+    paths = mc.simulate_batch(n_sims, t_steps, rng=rng)
+    for n, states in enumerate(paths):
+        tv_dists = tv_distance(filter_beliefs(mc, states, strategy_mat), mc.pi)
 
         time_avg_tvs[n] = np.mean(tv_dists)
         if n < 5:
@@ -49,29 +61,45 @@ def compute_tv_for_params(alpha, beta, n_sims, t_steps, rng):
     return time_avg_tvs, all_tv_trajectories
 
 
-def make_heatmap(rng):
-    """Create heatmap of mean TV distance over (α, β) grid."""
+def exact_tv_kernel(alpha, beta, t_steps):
+    """Grid kernel: exact expected time-averaged TV distance for one (α, β).
+
+    Under the Stackelberg strategy the belief chain is finite, so the
+    expectation over paths is computed from the (state, belief) chain
+    instead of by simulation.
+    """
+    mc = MarkovChain(alpha=alpha, beta=beta)
+    strategy_mat = make_strategy_matrix(DeterrenceGame().stackelberg_strategy)
+    chain = BeliefChain(mc, strategy_mat)
+    return chain.time_average(lambda b: tv_distance(b, mc.pi), t_steps)
+
+
+def make_heatmap(figures):
+    """Compute mean TV distance over the (α, β) grid and queue its heatmap."""
     print("Computing TV heatmap over parameter grid...")
-    n_a = len(ALPHA_GRID)
-    n_b = len(BETA_GRID)
-    heatmap = np.zeros((n_a, n_b))
 
-    # Use fewer sims for the grid to keep runtime manageable
-    n_sims_grid = 50
     t_steps_grid = 2000
 
-    for i, alpha in enumerate(ALPHA_GRID):
-        for j, beta in enumerate(BETA_GRID):
-            tv_avgs, _ = compute_tv_for_params(alpha, beta, n_sims_grid, t_steps_grid, rng)
-            heatmap[i, j] = np.mean(tv_avgs)
-            print(f"  α={alpha:.2f}, β={beta:.2f}: mean TV = {heatmap[i, j]:.4f}")
+    # Exact expectations: one small belief-chain solve per cell, no simulation
+    grid = evaluate_grid(exact_tv_kernel, ALPHA_GRID, BETA_GRID, mode='serial',
+                         t_steps=t_steps_grid)
+    heatmap = grid['value']
+    for i, j, alpha, beta in grid.cells():
+        print(f"  α={alpha:.2f}, β={beta:.2f}: mean TV = {heatmap[i, j]:.4f}")
 
+    figures.submit(plot_heatmap, os.path.join(FIGURES_DIR, 'tv_heatmap.png'), heatmap)
+    return heatmap
+
+
+def plot_heatmap(heatmap):
+    """Heatmap of mean TV distance over the (α, β) grid."""
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(9, 7))
     im = ax.imshow(heatmap, origin='lower', aspect='auto', cmap='inferno',
                     extent=[BETA_GRID[0], BETA_GRID[-1], ALPHA_GRID[0], ALPHA_GRID[-1]])
     ax.set_xlabel('β (Pr(G|B))', fontsize=12)
     ax.set_ylabel('α (Pr(B|G))', fontsize=12)
-    ax.set_title('Mean TV Distance ‖SR Belief − π‖\n(averaged over time and simulations)',
+    ax.set_title('Mean TV Distance ‖SR Belief − π‖\n(exact expectation of the time average)',
                   fontsize=13)
 
     # Mark the i.i.d. line α + β = 1
@@ -85,14 +113,11 @@ def make_heatmap(rng):
     cbar.set_label('Mean TV Distance', fontsize=11)
 
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'tv_heatmap.png')
-    save_figure(fig, fig_path)
-    print(f"Saved: {fig_path}")
-    return heatmap
+    return fig
 
 
-def make_violin(rng):
-    """Create violin plot of time-averaged TV distances for selected (α,β)."""
+def make_violin(rng, figures):
+    """Time-averaged TV distances for selected (α,β); queues their violin plot."""
     print("\nComputing distributions for violin plot...")
     param_sets = [
         (0.1, 0.1, "α=0.1,β=0.1\n(high persist)"),
@@ -109,8 +134,16 @@ def make_violin(rng):
         all_tvs.append(tv_avgs)
         labels.append(label)
         print(f"  {label.replace(chr(10), ' ')}: mean={np.mean(tv_avgs):.4f}, "
-              f"std={np.std(tv_avgs):.4f}")
+              f"std={np.std(tv_avgs):.4f}, "
+              f"exact={exact_tv_kernel(alpha, beta, T_STEPS):.4f}")
+
+    figures.submit(plot_violin, os.path.join(FIGURES_DIR, 'tv_violin.png'), all_tvs, labels)
+    return all_tvs, labels
 
+
+def plot_violin(all_tvs, labels):
+    """Violin plot of time-averaged TV distances."""
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(12, 6))
     parts = ax.violinplot(all_tvs, positions=range(len(all_tvs)), showmeans=True,
                            showmedians=True)
@@ -127,47 +160,70 @@ def make_violin(rng):
     ax.grid(axis='y', alpha=0.3)
 
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'tv_violin.png')
-    save_figure(fig, fig_path)
-    print(f"Saved: {fig_path}")
-    return all_tvs, labels
+    return fig
 
 
-def make_persistence_comparison(rng):
-    """Compare belief trajectories for low vs high persistence."""
+def make_persistence_comparison(figures, seed=PERSISTENCE_SEED):
+    """Belief trajectories for low vs high persistence; queues their comparison plot.
+
+    The paths use their own generator, default_rng(seed), so the stored
+    trajectories can be regenerated from the manifest alone.
+    """
     print("\nComputing persistence comparison...")
+    rng = np.random.default_rng(seed)
     mc_low = MarkovChain(alpha=0.5, beta=0.5)   # i.i.d.
     mc_high = MarkovChain(alpha=0.05, beta=0.05)  # very persistent
     game = DeterrenceGame()
     strategy_mat = make_strategy_matrix(game.stackelberg_strategy)
 
     t_show = 500
+    panels = []
+
+    # Paths are also kept in a trajectory store for reuse by other analyses
+    store = TrajectoryStore.create(TRAJECTORY_STORE, params={
+        'T': T_STEPS,
+        'chains': {'low': {'alpha': mc_low.alpha, 'beta': mc_low.beta},
+                   'high': {'alpha': mc_high.alpha, 'beta': mc_high.beta}},
+    }, seed=seed)
+
+    for key, mc, label in [
+            ('low', mc_low, "Low persistence (α=β=0.5, near i.i.d.)"),
+            ('high', mc_high, "High persistence (α=β=0.05)")]:
+        states = simulate_path(mc, T_STEPS, rng)
+        posteriors = filter_beliefs(mc, states, strategy_mat)
+        tv_dists = tv_distance(posteriors, mc.pi)
+        store.write(f'states_{key}', states.astype(np.uint8))
+        store.write(f'actions_{key}', strategy_mat[states].argmax(axis=1).astype(np.uint8))
+        store.write(f'beliefs_{key}', posteriors)
+        panels.append({'label': label, 'pi_g': mc.pi[0], 'mean_tv': np.mean(tv_dists),
+                       'states': np.array(states[:t_show]),
+                       'beliefs': posteriors[:t_show, 0], 'tv': tv_dists[:t_show]})
+
+    store.close()
+    print(f"Saved: {TRAJECTORY_STORE}")
+
+    figures.submit(plot_persistence_comparison,
+                   os.path.join(FIGURES_DIR, 'persistence_comparison.png'), panels)
+
+
+def plot_persistence_comparison(panels):
+    """Belief and TV distance paths, one row per persistence level."""
+    plt = pyplot()
     fig, axes = plt.subplots(2, 2, figsize=(14, 8))
 
-    for row, (mc, label) in enumerate([(mc_low, "Low persistence (α=β=0.5, near i.i.d.)"),
-                                        (mc_high, "High persistence (α=β=0.05)")]):
-        states = mc.simulate(T_STEPS, rng=rng)
-        bf = BayesianFilter(mc)
-        beliefs = np.zeros(T_STEPS)
-        tv_dists = np.zeros(T_STEPS)
-        beliefs[0] = bf.belief[0]
-        tv_dists[0] = tv_distance(bf.belief, mc.pi)
-
-        for t in range(1, T_STEPS):
-            action = game.stackelberg_strategy(states[t])
-            posterior = bf.update(signal=action, strategy_matrix=strategy_mat)
-            beliefs[t] = posterior[0]
-            tv_dists[t] = tv_distance(posterior, mc.pi)
+    for row, panel in enumerate(panels):
+        states, label = panel['states'], panel['label']
+        t_range = np.arange(len(states))
 
         # Left: belief trajectory
         ax = axes[row, 0]
-        t_range = np.arange(t_show)
-        ax.fill_between(t_range, 0, 1, where=states[:t_show] == 0,
+        ax.fill_between(t_range, 0, 1, where=states == 0,
                          alpha=0.15, color='green')
-        ax.fill_between(t_range, 0, 1, where=states[:t_show] == 1,
+        ax.fill_between(t_range, 0, 1, where=states == 1,
                          alpha=0.15, color='red')
-        ax.plot(t_range, beliefs[:t_show], color='blue', linewidth=0.7, label='SR belief')
-        ax.axhline(y=mc.pi[0], color='black', linestyle='--', label=f'π(G)={mc.pi[0]:.3f}')
+        ax.plot(t_range, panel['beliefs'], color='blue', linewidth=0.7, label='SR belief')
+        ax.axhline(y=panel['pi_g'], color='black', linestyle='--',
+                   label=f"π(G)={panel['pi_g']:.3f}")
         ax.set_ylabel('Pr(G)')
         ax.set_title(f'{label} — Belief')
         ax.legend(fontsize=8)
@@ -175,10 +231,9 @@ def make_persistence_comparison(rng):
 
         # Right: TV distance
         ax = axes[row, 1]
-        ax.plot(t_range, tv_dists[:t_show], color='purple', linewidth=0.7)
-        mean_tv = np.mean(tv_dists)
-        ax.axhline(y=mean_tv, color='red', linestyle='--',
-                    label=f'Mean TV={mean_tv:.4f}')
+        ax.plot(t_range, panel['tv'], color='purple', linewidth=0.7)
+        ax.axhline(y=panel['mean_tv'], color='red', linestyle='--',
+                    label=f"Mean TV={panel['mean_tv']:.4f}")
         ax.set_ylabel('TV distance')
         ax.set_title(f'{label} — TV distance')
         ax.legend(fontsize=8)
@@ -187,9 +242,7 @@ def make_persistence_comparison(rng):
     axes[1, 1].set_xlabel('Time step')
     fig.suptitle('Persistence Comparison: SR Belief Dynamics', fontsize=13, y=1.01)
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'persistence_comparison.png')
-    save_figure(fig, fig_path)
-    print(f"Saved: {fig_path}")
+    return fig
 
 
 def write_report(heatmap, all_tvs, labels):
@@ -200,7 +253,7 @@ def write_report(heatmap, all_tvs, labels):
 
 Comprehensive visualization of SR player belief dynamics across the parameter space.
 Ran {N_SIMS} simulations of {T_STEPS} steps for selected (α,β) values, plus a heatmap
-over a 10×10 grid.
+over a 10×10 grid computed exactly from the finite (state, belief) chain.
 
 ## TV Distance Statistics
 
@@ -254,9 +307,13 @@ if __name__ == '__main__':
     print("=" * 60)
 
     rng = np.random.default_rng(456)
+    figures = FigureQueue()
 
-    heatmap = make_heatmap(rng)
-    all_tvs, labels = make_violin(rng)
-    make_persistence_comparison(rng)
+    heatmap = make_heatmap(figures)
+    all_tvs, labels = make_violin(rng, figures)
+    make_persistence_comparison(figures)
     write_report(heatmap, all_tvs, labels)
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
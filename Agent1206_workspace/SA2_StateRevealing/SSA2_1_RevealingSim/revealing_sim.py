@@ -6,11 +6,9 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
-from shared.markov_utils import MarkovChain, DeterrenceGame, tv_distance, save_figure
+from shared.markov_utils import MarkovChain, simulate_path, DeterrenceGame, tv_distance
+from shared.figures import FigureQueue, pyplot
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
@@ -23,7 +21,7 @@ def run_revealing_sim(alpha, beta, rng):
     mc = MarkovChain(alpha=alpha, beta=beta)
     game = DeterrenceGame()
 
-    states = mc.simulate(T_STEPS, rng=rng)
+    states = simulate_path(mc, T_STEPS, rng)
 
     # Under s₁*(G)=A, s₁*(B)=F, observing the action reveals θ_t exactly.
     # SR player's belief about θ_{t+1} is F(·|θ_t), not π.
@@ -64,6 +62,7 @@ def run_revealing_sim(alpha, beta, rng):
 
 def plot_revealed_belief(results):
     """Plot belief trajectory showing it tracks F(·|θ_t), not π."""
+    plt = pyplot()
     t_show = 500
     t_range = np.arange(t_show)
 
@@ -107,13 +106,12 @@ def plot_revealed_belief(results):
     ax.legend(loc='upper right', fontsize=9)
 
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'revealed_belief_trajectory.png')
-    save_figure(fig, fig_path)
-    print(f"Saved: {fig_path}")
+    return fig
 
 
 def plot_gap_persistent(results_list):
     """Plot belief gap over full trajectory for multiple parameter settings."""
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(14, 5))
 
     for res in results_list:
@@ -133,9 +131,7 @@ def plot_gap_persistent(results_list):
     ax.grid(alpha=0.3)
 
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'belief_gap_persistent.png')
-    save_figure(fig, fig_path)
-    print(f"Saved: {fig_path}")
+    return fig
 
 
 def write_report(results_list):
@@ -219,7 +215,13 @@ if __name__ == '__main__':
         print(f"  Gap after G = {res['gap_after_G']:.4f}, after B = {res['gap_after_B']:.4f}")
         print(f"  Expected gap = {res['expected_gap']:.4f}, empirical = {emp_gap:.4f}")
 
-    plot_revealed_belief(results_list[0])
-    plot_gap_persistent(results_list)
+    figures = FigureQueue()
+    figures.submit(plot_revealed_belief, os.path.join(FIGURES_DIR, 'revealed_belief_trajectory.png'),
+                   results_list[0])
+    figures.submit(plot_gap_persistent, os.path.join(FIGURES_DIR, 'belief_gap_persistent.png'),
+                   results_list)
     write_report(results_list)
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
@@ -6,12 +6,10 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from matplotlib import cm
 
-from shared.markov_utils import MarkovChain, DeterrenceGame, tv_distance, save_figure
+from shared.markov_utils import MarkovChain, simulate_path, DeterrenceGame, tv_distance
+from shared.figures import FigureQueue, pyplot
+from shared.grid import evaluate_grid
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
@@ -54,19 +52,29 @@ def analytical_gap(alpha, beta):
     return gap_G, gap_B, expected_gap
 
 
-def compute_heatmap():
+def expected_gap_kernel(alpha, beta):
+    """Vectorized expected gap of `analytical_gap` over alpha/beta arrays (α+β > 0)."""
+    pi_G = beta / (alpha + beta)
+    pi_B = alpha / (alpha + beta)
+    gap_G = alpha * np.abs(1 - alpha - beta) / (alpha + beta)
+    gap_B = beta * np.abs(1 - alpha - beta) / (alpha + beta)
+    return pi_G * gap_G + pi_B * gap_B
+
+
+def compute_heatmap(figures):
     """Compute expected gap heatmap over fine grid."""
     print("Computing analytical gap heatmap...")
     n_pts = 200
     alphas = np.linspace(0.01, 0.99, n_pts)
     betas = np.linspace(0.01, 0.99, n_pts)
-    heatmap = np.zeros((n_pts, n_pts))
+    heatmap = evaluate_grid(expected_gap_kernel, alphas, betas, mode='vectorized')['value']
+    figures.submit(plot_heatmap, os.path.join(FIGURES_DIR, 'belief_gap_heatmap.png'), heatmap)
+    return heatmap
 
-    for i, alpha in enumerate(alphas):
-        for j, beta in enumerate(betas):
-            _, _, expected_gap = analytical_gap(alpha, beta)
-            heatmap[i, j] = expected_gap
 
+def plot_heatmap(heatmap):
+    """Heatmap of the analytical expected gap, with the i.i.d. line α + β = 1."""
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(9, 7))
     im = ax.imshow(heatmap, origin='lower', aspect='auto', cmap='magma',
                     extent=[0.01, 0.99, 0.01, 0.99])
@@ -87,14 +95,11 @@ def compute_heatmap():
     cbar.set_label('Expected Gap', fontsize=11)
 
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'belief_gap_heatmap.png')
-    save_figure(fig, fig_path)
-    print(f"Saved: {fig_path}")
-    return heatmap
+    return fig
 
 
-def compute_1d_slice():
-    """Plot gap along α = β diagonal and compare to simulation."""
+def compute_1d_slice(figures):
+    """Compute gap along α = β diagonal and compare to simulation."""
     print("\nComputing 1D slice along α = β...")
     n_pts = 100
     params = np.linspace(0.01, 0.99, n_pts)
@@ -110,13 +115,21 @@ def compute_1d_slice():
 
         # Simulate for verification
         mc = MarkovChain(alpha=p, beta=p)
-        states = mc.simulate(T, rng=rng)
+        states = simulate_path(mc, T, rng)
         gaps = np.zeros(T - 1)
         for t in range(1, T):
             sr_belief_G = mc.T[states[t - 1], 0]
             gaps[t - 1] = abs(sr_belief_G - mc.pi[0])
         simulated_gaps[i] = np.mean(gaps)
 
+    figures.submit(plot_gap_vs_persistence, os.path.join(FIGURES_DIR, 'gap_vs_persistence.png'),
+                   params, analytical_gaps, simulated_gaps)
+    return params, analytical_gaps, simulated_gaps
+
+
+def plot_gap_vs_persistence(params, analytical_gaps, simulated_gaps):
+    """Analytical vs simulated gap along α = β, against α and against 1 − α − β."""
+    plt = pyplot()
     fig, axes = plt.subplots(1, 2, figsize=(14, 5))
 
     # Left: gap vs parameter
@@ -144,11 +157,7 @@ def compute_1d_slice():
     ax.grid(alpha=0.3)
 
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'gap_vs_persistence.png')
-    save_figure(fig, fig_path)
-    print(f"Saved: {fig_path}")
-
-    return params, analytical_gaps, simulated_gaps
+    return fig
 
 
 def write_report(params, analytical_gaps, simulated_gaps):
@@ -241,8 +250,9 @@ if __name__ == '__main__':
     print("SSA2_2: Divergence Analysis")
     print("=" * 60)
 
-    heatmap = compute_heatmap()
-    params, analytical_gaps, simulated_gaps = compute_1d_slice()
+    figures = FigureQueue()
+    heatmap = compute_heatmap(figures)
+    params, analytical_gaps, simulated_gaps = compute_1d_slice(figures)
 
     # Print key results
     print("\nKey analytical results:")
@@ -254,4 +264,7 @@ if __name__ == '__main__':
           f"{np.max(np.abs(analytical_gaps - simulated_gaps)):.6f}")
 
     write_report(params, analytical_gaps, simulated_gaps)
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
@@ -6,19 +6,17 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from scipy.optimize import linprog
 
-from shared.markov_utils import MarkovChain, DeterrenceGame, save_figure
+from shared.markov_utils import MarkovChain, DeterrenceGame
+from shared.figures import FigureQueue, pyplot
+from shared.ot import solve_row_marginal_ot
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
 
 
 def solve_ot_problem(marginal, cost_matrix, n_rows, n_cols):
-    """Solve the optimal transport problem via linear programming.
+    """Solve the optimal transport problem.
 
     min_{P} sum_{i,j} C[i,j] * P[i,j]
     s.t. sum_j P[i,j] = row_marginal[i]  for all i
@@ -41,31 +39,9 @@ def solve_ot_problem(marginal, cost_matrix, n_rows, n_cols):
 
     Returns coupling matrix and optimal value.
     """
-    n_vars = n_rows * n_cols
-
-    # Objective: minimize sum C[i,j] * P[i,j]
-    c = cost_matrix.flatten()
-
-    # Row constraints: sum_j P[i,j] = marginal[i]
-    A_eq_rows = np.zeros((n_rows, n_vars))
-    for i in range(n_rows):
-        for j in range(n_cols):
-            A_eq_rows[i, i * n_cols + j] = 1.0
-    b_eq_rows = marginal
-
-    A_eq = A_eq_rows
-    b_eq = b_eq_rows
-
-    # Bounds: P[i,j] >= 0
-    bounds = [(0, None)] * n_vars
-
-    result = linprog(c, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs')
-
-    if result.success:
-        coupling = result.x.reshape(n_rows, n_cols)
-        return coupling, result.fun
-    else:
-        return None, None
+    # Only the row marginal is constrained, so the LP separates by row
+    coupling, value = solve_row_marginal_ot(marginal, cost_matrix.reshape(n_rows, n_cols))
+    return coupling, value
 
 
 def setup_deterrence_ot(mc, game, use_lifted=True):
@@ -245,6 +221,7 @@ def run_counterexample(alpha, beta, x, y, label):
 
 def plot_ot_comparison(all_results):
     """Visualize OT supports at ρ̃ vs F(·|θ_t)."""
+    plt = pyplot()
     n_cases = len(all_results)
     fig, axes = plt.subplots(n_cases, 3, figsize=(15, 4 * n_cases))
     if n_cases == 1:
@@ -304,9 +281,7 @@ def plot_ot_comparison(all_results):
 
     fig.suptitle('OT Coupling Comparison: ρ̃ vs F(·|θ_t)', fontsize=14, y=1.02)
     plt.tight_layout()
-    fig_path = os.path.join(FIGURES_DIR, 'ot_support_comparison.png')
-    save_figure(fig, fig_path)
-    print(f"\nSaved: {fig_path}")
+    return fig
 
 
 def write_report(all_results):
@@ -433,6 +408,11 @@ if __name__ == '__main__':
                                label="Supermodular, i.i.d. (α=β=0.5)")
     all_results.append(res4)
 
-    plot_ot_comparison(all_results)
+    figures = FigureQueue()
+    figures.submit(plot_ot_comparison, os.path.join(FIGURES_DIR, 'ot_support_comparison.png'),
+                   all_results)
     write_report(all_results)
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
@@ -10,22 +10,39 @@ Computes per-period signal distributions q_t and p_t for KL computation.
 
 import sys
 import os
+import hashlib
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
 from shared.markov_utils import (
-    MarkovChain, DeterrenceGame, BayesianFilter,
-    make_strategy_matrix, tv_distance, kl_divergence, save_figure
+    MarkovChain, simulate_path, DeterrenceGame, BayesianFilter,
+    make_strategy_matrix, tv_distance, kl_divergence,
+    predictive_signal_distributions
 )
+from shared.figures import FigureQueue, pyplot
+from shared.trajectories import TrajectoryStore
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FIG_DIR = os.path.join(SCRIPT_DIR, 'figures')
 os.makedirs(FIG_DIR, exist_ok=True)
 
+# Trajectory store read by downstream scripts (SSA3_2)
+SIGNAL_STORE = os.path.join(SCRIPT_DIR, 'signal_data')
+SIGNAL_ARRAYS = ('states', 'q_dists', 'p_dists', 'q_signals', 'p_signals')
+
+# P: confused type — mixed strategy
+SIGMA_P = np.array([
+    [0.7, 0.3],   # State G: 70% A, 30% F
+    [0.4, 0.6]    # State B: 40% A, 60% F
+])
+
+
+def source_hash():
+    """sha256 of this module's source; a stored run from other code is not reused."""
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
 
 def simulate_signal_processes(T=2000, alpha=0.3, beta=0.5, seed=42):
     """
@@ -47,13 +64,10 @@ def simulate_signal_processes(T=2000, alpha=0.3, beta=0.5, seed=42):
     # Q: commitment type — deterministic Stackelberg
     sigma_q = make_strategy_matrix(game.stackelberg_strategy)
     # P: confused type — mixed strategy
-    sigma_p = np.array([
-        [0.7, 0.3],   # State G: 70% A, 30% F
-        [0.4, 0.6]    # State B: 40% A, 60% F
-    ])
+    sigma_p = SIGMA_P
 
     # Simulate state sequence
-    states = mc.simulate(T, rng=rng)
+    states = simulate_path(mc, T, rng)
 
     # Bayesian filter for the SR player (used to compute p_t)
     # The SR player observes signals and updates beliefs about theta_t
@@ -133,8 +147,79 @@ def simulate_signal_processes(T=2000, alpha=0.3, beta=0.5, seed=42):
     return states, q_dists, p_dists, q_signals, p_signals
 
 
+def save_signal_processes(arrays, T, alpha=0.3, beta=0.5, seed=42, path=SIGNAL_STORE):
+    """Write the outputs of simulate_signal_processes to a trajectory store."""
+    params = {'T': T, 'alpha': alpha, 'beta': beta, 'sigma_p': SIGMA_P,
+              'source': source_hash()}
+    with TrajectoryStore.create(path, params=params, seed=seed) as store:
+        for name, values in zip(SIGNAL_ARRAYS, arrays):
+            store.write(name, values)
+    return path
+
+
+def load_signal_processes(T=2000, alpha=0.3, beta=0.5, seed=42, path=SIGNAL_STORE):
+    """
+    First T periods of the stored signal processes, or a fresh simulation.
+
+    The store is used when it was generated with the same alpha, beta,
+    seed, sigma_p and source code and holds at least T periods (the
+    filters are causal, so a prefix of a longer run is itself a T-period
+    run). The arrays are read-only memory maps. Returns (arrays, from_store).
+    """
+    if TrajectoryStore.exists(path):
+        store = TrajectoryStore.open(path)
+        params = store.params
+        if ((params.get('alpha'), params.get('beta'), store.seed) == (alpha, beta, seed)
+                and params.get('T', 0) >= T
+                and np.array_equal(params.get('sigma_p'), SIGMA_P)
+                and params.get('source') == source_hash()):
+            return tuple(store[name][:T] for name in SIGNAL_ARRAYS), True
+    return simulate_signal_processes(T=T, alpha=alpha, beta=beta, seed=seed), False
+
+
+def stream_signal_processes(T=2000, alpha=0.3, beta=0.5, seed=42, chunk_size=100_000):
+    """
+    Same Q and P processes as `simulate_signal_processes`, generated in chunks.
+
+    Memory is O(chunk_size) whatever T is: the state path is continued from
+    the last state of the previous chunk, and both SR filters run over each
+    chunk with `predictive_signal_distributions`, starting from the previous
+    chunk's posterior. The random stream differs from `simulate_signal_processes`,
+    so paths are not bit-for-bit equal.
+
+    Yields
+    ------
+    (states, q_dists, p_dists, q_signals, p_signals) for each chunk, with the
+    shapes of `simulate_signal_processes` and length <= chunk_size.
+    """
+    rng = np.random.default_rng(seed)
+    mc = MarkovChain(alpha=alpha, beta=beta)
+    game = DeterrenceGame()
+    sigma_q = make_strategy_matrix(game.stackelberg_strategy)
+    sigma_p = SIGMA_P
+
+    last_state = None
+    # SR posteriors after the previous chunk; pi before the first period
+    post_q = post_p = mc.pi
+    for start in range(0, T, chunk_size):
+        n = min(chunk_size, T - start)
+        if last_state is None:
+            states = mc.simulate_batch(1, n, rng=rng)[0].astype(int)
+        else:
+            states = mc.simulate_batch(1, n + 1, theta_0=last_state, rng=rng)[0, 1:].astype(int)
+        last_state = states[-1]
+
+        q_signals = (rng.random(n) >= sigma_q[states, 0]).astype(int)
+        p_signals = (rng.random(n) >= sigma_p[states, 0]).astype(int)
+
+        q_dists, post_q = predictive_signal_distributions(q_signals, mc, sigma_q, prior=post_q)
+        p_dists, post_p = predictive_signal_distributions(p_signals, mc, sigma_p, prior=post_p)
+        yield states, q_dists, p_dists, q_signals, p_signals
+
+
 def plot_signal_distributions(q_dists, p_dists, states, T_show=200):
     """Plot signal distributions over time for both processes."""
+    plt = pyplot()
     fig, axes = plt.subplots(3, 1, figsize=(12, 10), sharex=True)
 
     t_range = np.arange(T_show)
@@ -165,15 +250,14 @@ def plot_signal_distributions(q_dists, p_dists, states, T_show=200):
     axes[2].set_ylim(-0.05, 1.05)
 
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'signal_distributions.png')
-    save_figure(fig, path)
-    return path
+    return fig
 
 
 def plot_tv_comparison(q_dists, p_dists, T_show=500):
     """Plot TV distance between q_t and p_t over time."""
+    plt = pyplot()
     T = min(len(q_dists), T_show)
-    tv = np.array([tv_distance(q_dists[t], p_dists[t]) for t in range(T)])
+    tv = tv_distance(q_dists[:T], p_dists[:T])
 
     fig, ax = plt.subplots(figsize=(10, 4))
     ax.plot(np.arange(T), tv, 'k-', alpha=0.5, linewidth=0.5)
@@ -189,9 +273,7 @@ def plot_tv_comparison(q_dists, p_dists, T_show=500):
     ax.legend()
     ax.grid(True, alpha=0.3)
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'tv_distance_preview.png')
-    save_figure(fig, path)
-    return path
+    return fig
 
 
 def main():
@@ -199,7 +281,7 @@ def main():
     print("SSA3_1: Signal Process Simulator")
     print("=" * 60)
 
-    T = 2000
+    T = 5000  # the horizon SSA3_2 reads from the trajectory store
     states, q_dists, p_dists, q_signals, p_signals = simulate_signal_processes(T=T)
 
     # Summary statistics
@@ -211,7 +293,7 @@ def main():
     print(f"P signals: A={np.mean(p_signals==0):.3f}, F={np.mean(p_signals==1):.3f}")
 
     # TV distances
-    tv_vals = np.array([tv_distance(q_dists[t], p_dists[t]) for t in range(T)])
+    tv_vals = tv_distance(q_dists, p_dists)
     print(f"\nTV(q_t, p_t) statistics:")
     print(f"  Mean:   {np.mean(tv_vals):.4f}")
     print(f"  Median: {np.median(tv_vals):.4f}")
@@ -220,7 +302,7 @@ def main():
     print(f"  Max:    {np.max(tv_vals):.4f}")
 
     # Per-period KL divergence preview
-    kl_vals = np.array([kl_divergence(q_dists[t], p_dists[t]) for t in range(T)])
+    kl_vals = kl_divergence(q_dists, p_dists)
     print(f"\nD(q_t || p_t) statistics:")
     print(f"  Mean:   {np.mean(kl_vals):.6f}")
     print(f"  Median: {np.median(kl_vals):.6f}")
@@ -231,18 +313,16 @@ def main():
         count = np.sum(tv_vals > eta)
         print(f"  #{'{t: TV>'+f'{eta}'+'}'}: {count} / {T} = {count/T:.3f}")
 
-    # Generate plots
-    fig1_path = plot_signal_distributions(q_dists, p_dists, states)
-    print(f"\nFigure saved: {fig1_path}")
-
-    fig2_path = plot_tv_comparison(q_dists, p_dists)
-    print(f"Figure saved: {fig2_path}")
+    # Queue plots; they are rendered after the report
+    figures = FigureQueue()
+    figures.submit(plot_signal_distributions, os.path.join(FIG_DIR, 'signal_distributions.png'),
+                   q_dists, p_dists, states)
+    figures.submit(plot_tv_comparison, os.path.join(FIG_DIR, 'tv_distance_preview.png'),
+                   q_dists, p_dists)
 
     # Save data for downstream scripts
-    np.savez(os.path.join(SCRIPT_DIR, 'signal_data.npz'),
-             states=states, q_dists=q_dists, p_dists=p_dists,
-             q_signals=q_signals, p_signals=p_signals)
-    print(f"\nData saved: {os.path.join(SCRIPT_DIR, 'signal_data.npz')}")
+    store_path = save_signal_processes((states, q_dists, p_dists, q_signals, p_signals), T)
+    print(f"\nData saved: {store_path}")
 
     # Generate report
     report = f"""# SSA3_1: Signal Process Simulator — Report
@@ -289,6 +369,9 @@ The p_t distribution is smoother because the mixed strategy blurs state informat
     with open(report_path, 'w') as f:
         f.write(report)
     print(f"Report saved: {report_path}")
+
+    for path in figures.render():
+        print(f"Figure saved: {path}")
     print("\nDone.")
 
 
@@ -2,7 +2,8 @@
 SSA3_2: KL Divergence Computation Engine
 
 Takes signal distributions and computes per-period KL divergences,
-cumulative KL, and TV distances. Verifies the KL counting bound.
+cumulative KL, and TV distances. Verifies the KL counting bound, and
+re-checks it over a long horizon with streaming statistics.
 """
 
 import sys
@@ -10,14 +11,13 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
 from shared.markov_utils import (
     MarkovChain, DeterrenceGame, BayesianFilter,
-    make_strategy_matrix, tv_distance, kl_divergence, save_figure
+    make_strategy_matrix, tv_distance, kl_divergence
 )
+from shared.figures import FigureQueue, pyplot
+from shared.kl_stream import DivergenceAccumulator
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FIG_DIR = os.path.join(SCRIPT_DIR, 'figures')
@@ -26,21 +26,19 @@ os.makedirs(FIG_DIR, exist_ok=True)
 # Import signal simulation from SSA3_1
 SSA3_1_DIR = os.path.join(os.path.dirname(__file__), '..', 'SSA3_1_SignalSim')
 sys.path.insert(0, SSA3_1_DIR)
-from signal_sim import simulate_signal_processes
+from signal_sim import load_signal_processes, stream_signal_processes
 
 
 def compute_kl_series(q_dists, p_dists):
     """Compute per-period KL divergences D(q_t || p_t)."""
-    T = len(q_dists)
-    kl_per_period = np.array([kl_divergence(q_dists[t], p_dists[t]) for t in range(T)])
+    kl_per_period = kl_divergence(q_dists, p_dists)
     cumulative_kl = np.cumsum(kl_per_period)
     return kl_per_period, cumulative_kl
 
 
 def compute_tv_series(q_dists, p_dists):
     """Compute per-period TV distances."""
-    T = len(q_dists)
-    return np.array([tv_distance(q_dists[t], p_dists[t]) for t in range(T)])
+    return tv_distance(q_dists, p_dists)
 
 
 def count_distinguishing_periods(tv_series, eta):
@@ -55,6 +53,7 @@ def theoretical_bound(mu0, eta):
 
 def plot_cumulative_kl(cumulative_kl, mu0=0.01, T=None):
     """Plot cumulative KL vs -log(mu0) bound."""
+    plt = pyplot()
     if T is None:
         T = len(cumulative_kl)
 
@@ -82,13 +81,53 @@ def plot_cumulative_kl(cumulative_kl, mu0=0.01, T=None):
                     fontsize=10, color='orange')
 
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'cumulative_kl.png')
-    save_figure(fig, path)
-    return path
+    return fig
+
+
+def long_horizon_statistics(T, etas, mu0, n_checkpoints=1000, seed=42):
+    """Stream T periods through a DivergenceAccumulator (no full q_t/p_t arrays)."""
+    acc = DivergenceAccumulator(etas=etas, kl_bound=-np.log(mu0),
+                                checkpoint_every=max(T // n_checkpoints, 1))
+    for _, q_chunk, p_chunk, _, _ in stream_signal_processes(T=T, seed=seed):
+        acc.update(q_chunk, p_chunk)
+    return acc
+
+
+def plot_long_horizon(acc, mu0, etas):
+    """Plot checkpointed cumulative KL and windowed mean TV over the long horizon."""
+    plt = pyplot()
+    t, cum_kl, window_tv = acc.checkpoints()
+    fig, axes = plt.subplots(1, 2, figsize=(12, 4.5))
+
+    ax = axes[0]
+    ax.loglog(t + 1, cum_kl, 'b-', linewidth=1.5, label='Cumulative $\\sum D(q_t \\| p_t)$')
+    ax.axhline(y=-np.log(mu0), color='r', linestyle='--', linewidth=2,
+               label=f'$-\\log \\mu_0 = {-np.log(mu0):.2f}$')
+    ax.set_xlabel('Period t')
+    ax.set_ylabel('Cumulative KL Divergence')
+    ax.set_title(f'Cumulative KL over T={acc.n_periods:,}')
+    ax.legend(fontsize=9)
+    ax.grid(True, alpha=0.3, which='both')
+
+    ax = axes[1]
+    ax.plot(t + 1, window_tv, 'k-', linewidth=0.8, label='Mean TV per checkpoint window')
+    colors = ['green', 'orange', 'red', 'purple']
+    for eta, c in zip(etas, colors):
+        ax.axhline(y=eta, color=c, linestyle='--', alpha=0.5, label=f'$\\eta={eta}$')
+    ax.set_xscale('log')
+    ax.set_xlabel('Period t')
+    ax.set_ylabel('$\\|q_t - p_t\\|_{TV}$')
+    ax.set_title('Windowed Mean TV Distance')
+    ax.legend(fontsize=8, loc='upper right')
+    ax.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    return fig
 
 
 def plot_tv_per_period(tv_series, T_show=None):
     """Plot TV distance time series with threshold lines."""
+    plt = pyplot()
     if T_show is None:
         T_show = len(tv_series)
 
@@ -116,9 +155,7 @@ def plot_tv_per_period(tv_series, T_show=None):
     ax.legend(loc='upper right', fontsize=9)
     ax.grid(True, alpha=0.3)
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'tv_per_period.png')
-    save_figure(fig, path)
-    return path
+    return fig
 
 
 def main():
@@ -127,12 +164,16 @@ def main():
     print("=" * 60)
 
     T = 5000
+    T_long = 10 ** 6
     mu0 = 0.01
     etas = [0.01, 0.05, 0.1, 0.2]
 
-    # Simulate signal processes
-    print(f"\nSimulating T={T} periods...")
-    states, q_dists, p_dists, q_signals, p_signals = simulate_signal_processes(T=T)
+    # Signal processes: SSA3_1's trajectory store, or simulate if it does not match
+    (states, q_dists, p_dists, q_signals, p_signals), from_store = load_signal_processes(T=T)
+    if from_store:
+        print(f"\nLoaded T={T} periods from the SSA3_1 trajectory store")
+    else:
+        print(f"\nSimulating T={T} periods...")
 
     # Compute KL series
     kl_per_period, cumulative_kl = compute_kl_series(q_dists, p_dists)
@@ -175,11 +216,32 @@ def main():
         print(f"{eta:>6.2f} | {count:>6d} | {t_bar:>10.1f} | {ratio:>8.4f} | {str(exceeds):>8}")
         results[eta] = {'count': count, 't_bar': t_bar, 'ratio': ratio, 'exceeds': exceeds}
 
-    # Generate plots
-    fig1 = plot_cumulative_kl(cumulative_kl, mu0=mu0)
-    print(f"\nFigure saved: {fig1}")
-    fig2 = plot_tv_per_period(tv_series)
-    print(f"Figure saved: {fig2}")
+    # Long-horizon check: streamed, O(1) memory in T
+    print(f"\n--- Long-Horizon Bound Check (T={T_long:,}, streaming) ---")
+    acc = long_horizon_statistics(T_long, etas, mu0)
+    long_crossing = int(acc.first_crossing)
+    print(f"Mean D(q_t || p_t):   {float(acc.mean_kl):.6f}")
+    print(f"Cumulative KL at T={T_long:,}: {float(acc.cumulative_kl):.4f}")
+    print(f"First crossing at t={long_crossing}" if long_crossing >= 0 else
+          f"Bound never crossed in T={T_long:,} periods")
+    print(f"Mean TV:   {float(acc.mean_tv):.4f}")
+    print(f"{'eta':>6} | {'Count':>8} | {'T_bar':>10} | {'Ratio':>8} | {'Exceeds?':>8}")
+    print("-" * 55)
+    long_results = {}
+    for eta in etas:
+        count = int(acc.counts[eta])
+        t_bar = theoretical_bound(mu0, eta)
+        long_results[eta] = {'count': count, 'ratio': count / t_bar, 'exceeds': count > t_bar}
+        print(f"{eta:>6.2f} | {count:>8d} | {t_bar:>10.1f} | {count / t_bar:>8.2f} | "
+              f"{str(count > t_bar):>8}")
+
+    # Queue plots; they are rendered after the report
+    figures = FigureQueue()
+    figures.submit(plot_cumulative_kl, os.path.join(FIG_DIR, 'cumulative_kl.png'),
+                   cumulative_kl, mu0=mu0)
+    figures.submit(plot_tv_per_period, os.path.join(FIG_DIR, 'tv_per_period.png'), tv_series)
+    figures.submit(plot_long_horizon, os.path.join(FIG_DIR, 'long_horizon_kl.png'),
+                   acc, mu0, etas)
 
     # Generate report
     report = f"""# SSA3_2: KL Divergence Computation Engine — Report
@@ -207,6 +269,20 @@ def main():
         r = results[eta]
         report += f"| {eta} | {r['count']} | {r['t_bar']:.1f} | {r['ratio']:.4f} | {r['exceeds']} |\n"
 
+    report += f"""
+## Long-Horizon Check (T={T_long:,})
+Statistics accumulated online with `DivergenceAccumulator` over a streamed path, without
+storing q_t / p_t. Mean D(q_t || p_t) = {float(acc.mean_kl):.6f}, cumulative KL =
+{float(acc.cumulative_kl):.1f}, first crossing of -log(mu0) at t={long_crossing}.
+
+| eta | Count | T_bar (bound) | Ratio | Exceeds? |
+|-----|-------|---------------|-------|----------|
+"""
+    for eta in etas:
+        r = long_results[eta]
+        report += (f"| {eta} | {r['count']} | {theoretical_bound(mu0, eta):.1f} | "
+                   f"{r['ratio']:.2f} | {r['exceeds']} |\n")
+
     report += f"""
 ## Interpretation
 The KL counting bound states that the number of distinguishing periods (where TV > eta)
@@ -222,11 +298,15 @@ cannot exceed T_bar = -2 log(mu0) / eta^2 = {theoretical_bound(mu0, 0.1):.1f} fo
 ## Figures
 - ![Cumulative KL](figures/cumulative_kl.png)
 - ![TV Per Period](figures/tv_per_period.png)
+- ![Long Horizon](figures/long_horizon_kl.png)
 """
     report_path = os.path.join(SCRIPT_DIR, 'report.md')
     with open(report_path, 'w') as f:
         f.write(report)
     print(f"Report saved: {report_path}")
+
+    for path in figures.render():
+        print(f"Figure saved: {path}")
     print("\nDone.")
 
 
@@ -3,6 +3,8 @@ SSA3_3: Monte Carlo Bound Verification
 
 Runs N=1000 simulations to verify the KL counting bound empirically.
 Compares i.i.d. vs Markov chains and assesses bound tightness.
+The simulated counts are checked against their exact distributions,
+computed by forward DP (shared/count_dp.py).
 """
 
 import sys
@@ -10,14 +12,15 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
 from shared.markov_utils import (
-    MarkovChain, DeterrenceGame, BayesianFilter,
-    make_strategy_matrix, tv_distance, kl_divergence, save_figure
+    MarkovChain, DeterrenceGame,
+    make_strategy_matrix, tv_distance, kl_divergence,
+    predictive_signal_distributions
 )
+from shared.figures import FigureQueue, pyplot
+from shared.montecarlo import run_replicates
+from shared.count_dp import count_distribution
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FIG_DIR = os.path.join(SCRIPT_DIR, 'figures')
@@ -40,51 +43,18 @@ def simulate_and_count(T, alpha, beta, sigma_q, sigma_p, eta_list, rng,
     if use_iid:
         states = rng.choice(2, size=T, p=mc.pi)
     else:
-        states = mc.simulate(T, rng=rng)
+        states = mc.simulate_batch(1, T, rng=rng)[0]
 
-    # Compute q_t and p_t at each step
-    filter_q = BayesianFilter(mc)
-    filter_p = BayesianFilter(mc)
+    # Signals: Q is deterministic; P draws one uniform per period, in the
+    # order (and with the inverse-CDF rule) rng.choice would use
+    q_signals = sigma_q[states].argmax(axis=1)
+    p_cdf0 = sigma_p[:, 0] / sigma_p.sum(axis=1)
+    p_signals = (rng.random(T) >= p_cdf0[states]).astype(int)
 
-    tv_vals = np.zeros(T)
-
-    for t in range(T):
-        theta_t = states[t]
-
-        # Q belief (predicted)
-        if t == 0:
-            belief_q = mc.pi.copy()
-        else:
-            belief_q = mc.T.T @ filter_q.belief
-
-        q_t = belief_q @ sigma_q
-
-        # P belief (predicted)
-        if t == 0:
-            belief_p = mc.pi.copy()
-        else:
-            belief_p = mc.T.T @ filter_p.belief
-
-        p_t = belief_p @ sigma_p
-
-        tv_vals[t] = tv_distance(q_t, p_t)
-
-        # Realize signals and update filters
-        q_signal = np.argmax(sigma_q[theta_t])  # deterministic
-        filter_q.belief = belief_q
-        lq = sigma_q[:, q_signal]
-        post_q = belief_q * lq
-        if post_q.sum() > 0:
-            post_q /= post_q.sum()
-        filter_q.belief = post_q
-
-        p_signal = rng.choice(2, p=sigma_p[theta_t])
-        filter_p.belief = belief_p
-        lp = sigma_p[:, p_signal]
-        post_p = belief_p * lp
-        if post_p.sum() > 0:
-            post_p /= post_p.sum()
-        filter_p.belief = post_p
+    # One-step-ahead signal distributions q_t, p_t for the whole path
+    q_dists, _ = predictive_signal_distributions(q_signals, mc, sigma_q)
+    p_dists, _ = predictive_signal_distributions(p_signals, mc, sigma_p)
+    tv_vals = tv_distance(q_dists, p_dists)
 
     counts = {eta: np.sum(tv_vals > eta) for eta in eta_list}
     return counts
@@ -95,26 +65,58 @@ def theoretical_bound(mu0, eta):
     return -2.0 * np.log(mu0) / (eta ** 2)
 
 
-def run_monte_carlo(N, T, alpha, beta, etas, mu0, use_iid=False, seed_base=0):
-    """Run N simulations and collect counts."""
+def signal_strategies():
+    """(sigma_q, sigma_p): Stackelberg (Q) and noisy (P) strategy matrices."""
     game = DeterrenceGame()
     sigma_q = make_strategy_matrix(game.stackelberg_strategy)
     sigma_p = np.array([[0.7, 0.3], [0.4, 0.6]])
+    return sigma_q, sigma_p
+
+
+def count_replicate(rng, T, alpha, beta, sigma_q, sigma_p, etas, use_iid=False):
+    """One replicate for run_replicates: counts for each eta, as an array."""
+    counts = simulate_and_count(T, alpha, beta, sigma_q, sigma_p, etas,
+                                rng, use_iid=use_iid)
+    return np.array([counts[eta] for eta in etas])
+
+
+def run_monte_carlo(N, T, alpha, beta, etas, mu0, use_iid=False, seed_base=0,
+                    n_workers=None, checkpoint=None):
+    """Run N simulations and collect counts.
+
+    Replicate i draws from child i of SeedSequence(seed_base), so the counts
+    are the same for any n_workers; `checkpoint` (.npz) allows resuming.
+    """
+    sigma_q, sigma_p = signal_strategies()
+
+    counts = run_replicates(count_replicate, N, seed=seed_base, n_workers=n_workers,
+                            checkpoint=checkpoint, T=T, alpha=alpha, beta=beta,
+                            sigma_q=sigma_q, sigma_p=sigma_p, etas=etas,
+                            use_iid=use_iid)['value']
+
+    return {eta: counts[:, k].astype(float) for k, eta in enumerate(etas)}
 
-    all_counts = {eta: np.zeros(N) for eta in etas}
 
-    for i in range(N):
-        rng = np.random.default_rng(seed_base + i)
-        counts = simulate_and_count(T, alpha, beta, sigma_q, sigma_p, etas,
-                                    rng, use_iid=use_iid)
-        for eta in etas:
-            all_counts[eta][i] = counts[eta]
+def exact_count_distributions(T, alpha, beta, etas, use_iid=False, p_grid=1001):
+    """Count distributions for each eta by forward DP (no sampling noise).
 
-    return all_counts
+    The Q filter's beliefs are enumerated exactly; the P filter's are
+    interpolated on a grid of p_grid points.
+    """
+    mc = MarkovChain(alpha=alpha, beta=beta)
+    sigma_q, sigma_p = signal_strategies()
+    state_T = np.tile(mc.pi, (2, 1)) if use_iid else None
+    return count_distribution(mc, sigma_q, sigma_p, T, etas, state_T=state_T,
+                              p_grid=p_grid)
 
 
-def plot_histograms(markov_counts, iid_counts, etas, mu0, T):
-    """Plot histograms of distinguishing period counts with T_bar marked."""
+def plot_histograms(markov_counts, iid_counts, etas, mu0, T, exact=None):
+    """Plot histograms of distinguishing period counts with T_bar marked.
+
+    exact : dict, optional
+        {eta: CountDistribution} overlaid as the exact Markov pmf
+    """
+    plt = pyplot()
     n_etas = len(etas)
     fig, axes = plt.subplots(1, n_etas, figsize=(4*n_etas, 4), squeeze=False)
     axes = axes[0]
@@ -125,6 +127,9 @@ def plot_histograms(markov_counts, iid_counts, etas, mu0, T):
 
         ax.hist(markov_counts[eta], bins=30, alpha=0.6, color='steelblue',
                 label='Markov', density=True)
+        if exact is not None and exact[eta].pmf.size > 1:
+            ax.step(exact[eta].support, exact[eta].pmf, where='mid', color='black',
+                    linewidth=1, label='Exact (DP)')
         ax.axvline(x=t_bar, color='red', linestyle='--', linewidth=2,
                    label=f'$\\bar{{T}}={t_bar:.0f}$')
         ax.set_xlabel(f'# periods with TV > {eta}')
@@ -140,13 +145,12 @@ def plot_histograms(markov_counts, iid_counts, etas, mu0, T):
     plt.suptitle(f'Monte Carlo: Distinguishing Period Counts (N sims, T={T})',
                  fontsize=12, y=1.02)
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'count_histogram.png')
-    save_figure(fig, path)
-    return path
+    return fig
 
 
 def plot_iid_vs_markov(markov_counts, iid_counts, etas, mu0, T):
     """Side-by-side comparison of i.i.d. vs Markov chains."""
+    plt = pyplot()
     n_etas = len(etas)
     fig, axes = plt.subplots(2, n_etas, figsize=(4*n_etas, 7), squeeze=False)
 
@@ -173,9 +177,7 @@ def plot_iid_vs_markov(markov_counts, iid_counts, etas, mu0, T):
 
     plt.suptitle(f'i.i.d. vs Markov: Distinguishing Periods (T={T})', fontsize=12, y=1.02)
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'iid_vs_markov_comparison.png')
-    save_figure(fig, path)
-    return path
+    return fig
 
 
 def main():
@@ -201,6 +203,12 @@ def main():
                                  use_iid=True, seed_base=100000)
     print("  i.i.d. done.")
 
+    # Exact count distributions by DP over (state, beliefs, count)
+    print(f"Computing exact count distributions (DP, T={T})...")
+    markov_exact = exact_count_distributions(T, alpha, beta, etas, use_iid=False)
+    iid_exact = exact_count_distributions(T, alpha, beta, etas, use_iid=True)
+    print("  DP done.")
+
     # Print results
     print(f"\n--- Bound Verification (mu0={mu0}) ---")
     print(f"{'':>6} | {'':>10} | {'Markov':>22} | {'i.i.d.':>22}")
@@ -228,11 +236,23 @@ def main():
         results_markov[eta] = {'mean': m_mean, 'exc': m_exc, 'ratio': m_ratio}
         results_iid[eta] = {'mean': i_mean, 'exc': i_exc, 'ratio': i_ratio}
 
+    print(f"\n--- Exact Count Distributions (DP) ---")
+    print(f"{'':>6} | {'':>10} | {'Markov':>26} | {'i.i.d.':>26}")
+    print(f"{'eta':>6} | {'T_bar':>10} | {'Mean':>7} {'Std':>6} {'P(N>T_bar)':>11} | "
+          f"{'Mean':>7} {'Std':>6} {'P(N>T_bar)':>11}")
+    print("-" * 80)
+    for eta in etas:
+        t_bar = theoretical_bound(mu0, eta)
+        m, i = markov_exact[eta], iid_exact[eta]
+        print(f"{eta:>6.2f} | {t_bar:>10.1f} | {m.mean():>7.1f} {m.std():>6.1f} "
+              f"{m.sf(t_bar):>11.3e} | {i.mean():>7.1f} {i.std():>6.1f} {i.sf(t_bar):>11.3e}")
+
     # Generate plots
-    fig1 = plot_histograms(markov_counts, iid_counts, etas, mu0, T)
-    print(f"\nFigure saved: {fig1}")
-    fig2 = plot_iid_vs_markov(markov_counts, iid_counts, etas, mu0, T)
-    print(f"Figure saved: {fig2}")
+    figures = FigureQueue()
+    figures.submit(plot_histograms, os.path.join(FIG_DIR, 'count_histogram.png'),
+                   markov_counts, iid_counts, etas, mu0, T, exact=markov_exact)
+    figures.submit(plot_iid_vs_markov, os.path.join(FIG_DIR, 'iid_vs_markov_comparison.png'),
+                   markov_counts, iid_counts, etas, mu0, T)
 
     # Generate report
     report = f"""# SSA3_3: Monte Carlo Bound Verification — Report
@@ -265,6 +285,21 @@ def main():
         t_bar = theoretical_bound(mu0, eta)
         report += f"| {eta} | {t_bar:.1f} | {r['mean']:.1f} | {r['exc']:.3f} | {r['ratio']:.4f} |\n"
 
+    report += """
+### Exact Count Distributions (DP)
+Forward DP over (state, Q belief, P belief, count): the Q filter's beliefs are
+finite under the Stackelberg strategy, the P filter's are interpolated on a
+1001-point grid, and entries below 1e-14 are pruned.
+
+| eta | T_bar | Markov Mean | Markov Std | Markov P(N > T_bar) | i.i.d. Mean | i.i.d. Std | i.i.d. P(N > T_bar) |
+|-----|-------|-------------|------------|---------------------|-------------|------------|---------------------|
+"""
+    for eta in etas:
+        t_bar = theoretical_bound(mu0, eta)
+        m, i = markov_exact[eta], iid_exact[eta]
+        report += (f"| {eta} | {t_bar:.1f} | {m.mean():.1f} | {m.std():.1f} | {m.sf(t_bar):.3e} | "
+                   f"{i.mean():.1f} | {i.std():.1f} | {i.sf(t_bar):.3e} |\n")
+
     report += f"""
 ## Key Findings
 1. **Bound holds**: In both Markov and i.i.d. settings, the mean count of distinguishing
@@ -284,6 +319,9 @@ def main():
     with open(report_path, 'w') as f:
         f.write(report)
     print(f"Report saved: {report_path}")
+
+    for path in figures.render():
+        print(f"Figure saved: {path}")
     print("\nDone.")
 
 
@@ -10,14 +10,13 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
 from shared.markov_utils import (
-    MarkovChain, DeterrenceGame, BayesianFilter,
-    make_strategy_matrix, tv_distance, save_figure
+    MarkovChain, simulate_path, DeterrenceGame, BayesianFilter,
+    make_strategy_matrix, tv_distance,
+    log_odds_filter, log_odds_to_belief
 )
+from shared.figures import FigureQueue, pyplot
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FIG_DIR = os.path.join(SCRIPT_DIR, 'figures')
@@ -49,18 +48,13 @@ def run_filter(mc, strategy_matrix, T, prior=None, seed=42):
     errors : ndarray, |belief(G) - true_state_is_G| at each step
     """
     rng = np.random.default_rng(seed)
-    states = mc.simulate(T, rng=rng)
+    states = simulate_path(mc, T, rng)
+    signals = (rng.random(T) < strategy_matrix[states, 1]).astype(int)
 
-    bf = BayesianFilter(mc, prior=prior)
-    beliefs = np.zeros((T, 2))
-    signals = np.zeros(T, dtype=int)
-
-    for t in range(T):
-        theta_t = states[t]
-        signal = rng.choice(2, p=strategy_matrix[theta_t])
-        signals[t] = signal
-        posterior = bf.update(signal, strategy_matrix)
-        beliefs[t] = posterior
+    # Whole-sequence log-odds filter (stable for near-deterministic strategies)
+    belief_g = log_odds_to_belief(log_odds_filter(signals, mc, strategy_matrix,
+                                                  prior=prior))
+    beliefs = np.column_stack([belief_g, 1.0 - belief_g])
 
     # Filter error: |belief(G) - indicator(state=G)|
     true_g = (states == 0).astype(float)
@@ -71,8 +65,9 @@ def run_filter(mc, strategy_matrix, T, prior=None, seed=42):
 
 def plot_deterministic_vs_noisy(mc, T=500, seed=42):
     """Compare filter behavior for deterministic vs noisy strategies."""
+    plt = pyplot()
     rng = np.random.default_rng(seed)
-    states = mc.simulate(T, rng=rng)
+    states = simulate_path(mc, T, rng)
 
     noise_levels = [0.0, 0.2, 0.4]
     fig, axes = plt.subplots(len(noise_levels) + 1, 1, figsize=(12, 3*(len(noise_levels)+1)),
@@ -116,9 +111,7 @@ def plot_deterministic_vs_noisy(mc, T=500, seed=42):
 
     axes[-1].set_xlabel('Period t')
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'filter_deterministic_vs_noisy.png')
-    save_figure(fig, path)
-    return path
+    return fig
 
 
 def main():
@@ -167,8 +160,9 @@ def main():
     print(f"  -> Signals carry no information, filter relies only on transition model")
 
     # Generate plot
-    fig_path = plot_deterministic_vs_noisy(mc, T=500, seed=seed)
-    print(f"\nFigure saved: {fig_path}")
+    figures = FigureQueue()
+    figures.submit(plot_deterministic_vs_noisy,
+                   os.path.join(FIG_DIR, 'filter_deterministic_vs_noisy.png'), mc, T=500, seed=seed)
 
     # Generate report
     report = f"""# SSA4_1: HMM Filter Implementation — Report
@@ -220,6 +214,9 @@ out that the interesting case (stochastic strategies) deserves more attention.
     with open(report_path, 'w') as f:
         f.write(report)
     print(f"Report saved: {report_path}")
+
+    for path in figures.render():
+        print(f"Figure saved: {path}")
     print("\nDone.")
 
 
@@ -11,14 +11,11 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
 from shared.markov_utils import (
-    MarkovChain, BayesianFilter,
-    tv_distance, save_figure
+    MarkovChain, simulate_path, BatchBayesianFilter
 )
+from shared.figures import FigureQueue, pyplot
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FIG_DIR = os.path.join(SCRIPT_DIR, 'figures')
@@ -45,25 +42,20 @@ def run_dual_filter(mc, strategy_matrix, T, seed=42):
     beliefs_b : ndarray of shape (T, 2), beliefs from prior (0,1)
     """
     rng = np.random.default_rng(seed)
-    states = mc.simulate(T, rng=rng)
+    states = simulate_path(mc, T, rng)
+    signals = (rng.random(T) < strategy_matrix[states, 1]).astype(int)
 
-    filter_g = BayesianFilter(mc, prior=np.array([1.0, 0.0]))
-    filter_b = BayesianFilter(mc, prior=np.array([0.0, 1.0]))
-
-    tv_diffs = np.zeros(T)
-    beliefs_g = np.zeros((T, 2))
-    beliefs_b = np.zeros((T, 2))
+    # Row 0 starts from prior (1,0), row 1 from (0,1); both see the same signals
+    bf = BatchBayesianFilter(mc, n_paths=2, prior=np.eye(2))
+    paired_signals = np.repeat(signals[:, None], 2, axis=1)
 
+    beliefs = np.zeros((T, 2, 2))
     for t in range(T):
-        theta_t = states[t]
-        signal = rng.choice(2, p=strategy_matrix[theta_t])
-
-        post_g = filter_g.update(signal, strategy_matrix)
-        post_b = filter_b.update(signal, strategy_matrix)
+        beliefs[t] = bf.update(paired_signals[t], strategy_matrix)
 
-        beliefs_g[t] = post_g
-        beliefs_b[t] = post_b
-        tv_diffs[t] = tv_distance(post_g, post_b)
+    beliefs_g = beliefs[:, 0]
+    beliefs_b = beliefs[:, 1]
+    tv_diffs = 0.5 * np.abs(beliefs_g - beliefs_b).sum(axis=1)
 
     return states, tv_diffs, beliefs_g, beliefs_b
 
@@ -73,6 +65,7 @@ def plot_filter_divergence(all_results, T_show=200):
     Plot TV distance between dual-init filters over time (log scale).
     all_results: dict of {label: tv_diffs}
     """
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(12, 6))
 
     colors = plt.cm.tab10(np.linspace(0, 1, len(all_results)))
@@ -91,9 +84,7 @@ def plot_filter_divergence(all_results, T_show=200):
     ax.set_xlim(0, T_show)
     ax.set_ylim(bottom=1e-18)
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'filter_divergence_over_time.png')
-    save_figure(fig, path)
-    return path
+    return fig
 
 
 def plot_noise_level_comparison(chain_results):
@@ -101,6 +92,7 @@ def plot_noise_level_comparison(chain_results):
     Plot convergence behavior across noise levels and chain parameters.
     chain_results: dict of {(alpha,beta): {noise: {'tv_diffs': ..., 'conv_time': ...}}}
     """
+    plt = pyplot()
     fig, axes = plt.subplots(1, 2, figsize=(13, 5))
 
     # Plot 1: Convergence time (to TV < 1e-6) vs noise for different chains
@@ -137,9 +129,7 @@ def plot_noise_level_comparison(chain_results):
     ax.grid(True, alpha=0.3, which='both')
 
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'noise_level_comparison.png')
-    save_figure(fig, path)
-    return path
+    return fig
 
 
 def main():
@@ -237,11 +227,11 @@ def main():
         if key in all_plot_results:
             plot_subset[f'noise={noise} (fast chain)'] = all_plot_results[key]
 
-    fig1 = plot_filter_divergence(plot_subset, T_show=min(T, 200))
-    print(f"\nFigure saved: {fig1}")
-
-    fig2 = plot_noise_level_comparison(chain_results)
-    print(f"Figure saved: {fig2}")
+    figures = FigureQueue()
+    figures.submit(plot_filter_divergence, os.path.join(FIG_DIR, 'filter_divergence_over_time.png'),
+                   plot_subset, T_show=min(T, 200))
+    figures.submit(plot_noise_level_comparison, os.path.join(FIG_DIR, 'noise_level_comparison.png'),
+                   chain_results)
 
     # Report
     report = f"""# SSA4_2: Dual-Initialization Filter Comparison — Report
@@ -318,6 +308,9 @@ For stochastic strategies, the forgetting rate is a non-trivial function of both
     with open(report_path, 'w') as f:
         f.write(report)
     print(f"Report saved: {report_path}")
+
+    for path in figures.render():
+        print(f"Figure saved: {path}")
     print("\nDone.")
 
 
@@ -2,7 +2,12 @@
 SSA4_3: Exponential Decay Fitting
 
 Fits exponential decay to filter divergence across parameter grids.
-Compares fitted forgetting rate to theoretical second eigenvalue.
+Compares fitted forgetting rate to theoretical second eigenvalue, and to
+the Birkhoff contraction bound and the Lyapunov-exponent forgetting rate
+computed directly from the filter's random matrix products.
+
+Figures are rendered after the report (shared/figures.py); pass
+--no-figures to skip them.
 """
 
 import sys
@@ -10,14 +15,16 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 from scipy import stats as sp_stats
 
 from shared.markov_utils import (
-    MarkovChain, BayesianFilter,
-    tv_distance, save_figure
+    MarkovChain, tv_distance, log_odds_filter, log_odds_to_belief
+)
+from shared.figures import FigureQueue, pyplot
+from shared.grid import evaluate_grid
+from shared.montecarlo import run_replicates
+from shared.filter_stability import (
+    filter_matrices, birkhoff_contraction, lyapunov_forgetting_rate
 )
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -35,28 +42,28 @@ def make_noisy_strategy(noise_level):
 
 def run_dual_filter_once(mc, strategy_matrix, T, rng):
     """Run one dual-init filter comparison, return TV differences."""
-    states = mc.simulate(T, rng=rng)
-
-    filter_g = BayesianFilter(mc, prior=np.array([1.0, 0.0]))
-    filter_b = BayesianFilter(mc, prior=np.array([0.0, 1.0]))
+    states = mc.simulate_batch(1, T, rng=rng)[0]
 
-    tv_diffs = np.zeros(T)
-    for t in range(T):
-        theta_t = states[t]
-        signal = rng.choice(2, p=strategy_matrix[theta_t])
-        post_g = filter_g.update(signal, strategy_matrix)
-        post_b = filter_b.update(signal, strategy_matrix)
-        tv_diffs[t] = tv_distance(post_g, post_b)
+    # One uniform per period, mapped as rng.choice(2, p=...) would
+    cdf0 = strategy_matrix[:, 0] / strategy_matrix.sum(axis=1)
+    signals = (rng.random(T) >= cdf0[states]).astype(int)
 
-    return tv_diffs
+    # Both filters (priors delta_G, delta_B) over the whole path
+    post_g = log_odds_to_belief(log_odds_filter(signals, mc, strategy_matrix,
+                                                prior=np.array([1.0, 0.0])))
+    post_b = log_odds_to_belief(log_odds_filter(signals, mc, strategy_matrix,
+                                                prior=np.array([0.0, 1.0])))
+    return tv_distance(np.stack([post_g, 1 - post_g], axis=-1),
+                       np.stack([post_b, 1 - post_b], axis=-1))
 
 
 def run_monte_carlo_decay(mc, strategy_matrix, T, N, seed_base=0):
-    """Run N simulations and compute mean TV divergence curve."""
-    all_tv = np.zeros((N, T))
-    for i in range(N):
-        rng = np.random.default_rng(seed_base + i)
-        all_tv[i] = run_dual_filter_once(mc, strategy_matrix, T, rng)
+    """Run N simulations and compute mean TV divergence curve.
+
+    Runs in-process: this is called from the process-pool grid kernel.
+    """
+    all_tv = run_replicates(run_dual_filter_once, N, seed=seed_base, n_workers=1,
+                            mc=mc, strategy_matrix=strategy_matrix, T=T)['value']
     mean_tv = np.mean(all_tv, axis=0)
     return mean_tv
 
@@ -87,8 +94,36 @@ def fit_exponential_decay(mean_tv, t_start=1, t_end=None):
     return C, lambda_, r_squared
 
 
+def spectral_cell_kernel(alpha, beta, rng, noise_levels, T_path):
+    """Grid kernel: Birkhoff bound and Lyapunov rate per noise level, no MC over paths."""
+    mc = MarkovChain(alpha=alpha, beta=beta)
+    birkhoff = np.zeros(len(noise_levels))
+    lyapunov = np.zeros(len(noise_levels))
+    for k, noise in enumerate(noise_levels):
+        sigma = make_noisy_strategy(noise)
+        birkhoff[k] = birkhoff_contraction(filter_matrices(mc.T, sigma)).max()
+        lyapunov[k], _, _ = lyapunov_forgetting_rate(mc, sigma, T_path, rng)
+    return {'birkhoff': birkhoff, 'lyapunov': lyapunov}
+
+
+def decay_cell_kernel(alpha, beta, rng, noise_levels, T, N, T_path):
+    """Grid kernel: fitted (C, lambda, R^2) per noise level for one (alpha, beta),
+    plus the spectral rates of `spectral_cell_kernel`."""
+    mc = MarkovChain(alpha=alpha, beta=beta)
+    fits = np.zeros((len(noise_levels), 3))
+    for k, noise in enumerate(noise_levels):
+        sigma = make_noisy_strategy(noise)
+        mean_tv = run_monte_carlo_decay(mc, sigma, T, N,
+                                        seed_base=int(rng.integers(2**32)))
+        fits[k] = fit_exponential_decay(mean_tv, t_start=5, t_end=min(T, 300))
+    out = {'C': fits[:, 0], 'lambda': fits[:, 1], 'r2': fits[:, 2]}
+    out.update(spectral_cell_kernel(alpha, beta, rng, noise_levels, T_path))
+    return out
+
+
 def plot_forgetting_rate_heatmap(alpha_grid, beta_grid, lambda_matrix, noise_label):
-    """Plot heatmap of fitted lambda vs (alpha, beta)."""
+    """Heatmap of fitted lambda vs (alpha, beta)."""
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(8, 6))
 
     im = ax.imshow(lambda_matrix, origin='lower', aspect='auto',
@@ -101,13 +136,12 @@ def plot_forgetting_rate_heatmap(alpha_grid, beta_grid, lambda_matrix, noise_lab
     ax.set_title(f'Forgetting Rate $\\lambda$ vs Chain Parameters (noise={noise_label})')
 
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'forgetting_rate_heatmap.png')
-    save_figure(fig, path)
-    return path
+    return fig
 
 
 def plot_lambda_vs_theory(results_list):
-    """Plot fitted lambda vs theoretical |1-alpha-beta|."""
+    """Fitted lambda vs theoretical |1-alpha-beta|."""
+    plt = pyplot()
     fig, axes = plt.subplots(1, 2, figsize=(12, 5))
 
     # Plot 1: lambda vs |1-alpha-beta| for fixed noise, varying (alpha, beta)
@@ -115,7 +149,10 @@ def plot_lambda_vs_theory(results_list):
     for noise, entries in results_list['by_noise'].items():
         theory = [e['eigenvalue'] for e in entries]
         fitted = [e['lambda'] for e in entries]
-        ax.scatter(theory, fitted, alpha=0.5, s=20, label=f'noise={noise:.2f}')
+        lyapunov = [e['lyapunov'] for e in entries]
+        points = ax.scatter(theory, fitted, alpha=0.5, s=20, label=f'noise={noise:.2f}')
+        ax.scatter(theory, lyapunov, marker='x', s=25, color=points.get_facecolor()[0],
+                   label=f'Lyapunov, noise={noise:.2f}')
 
     lims = [0, 1]
     ax.plot(lims, lims, 'k--', alpha=0.3, label='y = x')
@@ -133,17 +170,17 @@ def plot_lambda_vs_theory(results_list):
         noises = [e['noise'] for e in entries]
         lambdas = [e['lambda'] for e in entries]
         eig = abs(1 - alpha - beta)
-        ax.plot(noises, lambdas, 'o-', label=f'$\\alpha$={alpha}, $\\beta$={beta} (eig={eig:.2f})')
+        line, = ax.plot(noises, lambdas, 'o-',
+                        label=f'$\\alpha$={alpha}, $\\beta$={beta} (eig={eig:.2f})')
+        ax.plot(noises, [e['lyapunov'] for e in entries], 'x:', color=line.get_color())
     ax.set_xlabel('Noise Level')
-    ax.set_ylabel('Fitted $\\lambda$')
+    ax.set_ylabel('Fitted $\\lambda$ (o) / Lyapunov rate (x)')
     ax.set_title('Forgetting Rate vs Signal Noise')
     ax.legend(fontsize=8)
     ax.grid(True, alpha=0.3)
 
     plt.tight_layout()
-    path = os.path.join(FIG_DIR, 'lambda_vs_theory.png')
-    save_figure(fig, path)
-    return path
+    return fig
 
 
 def main():
@@ -153,6 +190,7 @@ def main():
 
     T = 500
     N = 100
+    T_path = 20000  # single long path for the Lyapunov rate
 
     # Grid of (alpha, beta)
     alpha_grid = np.array([0.1, 0.2, 0.3, 0.4, 0.5])
@@ -170,53 +208,47 @@ def main():
 
     # Main heatmap: use noise=0.2
     heatmap_noise = 0.2
-    lambda_matrix = np.zeros((len(alpha_grid), len(beta_grid)))
 
     print(f"\n--- Running grid sweep ---")
     total = len(alpha_grid) * len(beta_grid) * len(noise_levels)
     count = 0
 
-    for i, alpha in enumerate(alpha_grid):
-        for j, beta in enumerate(beta_grid):
-            eig2 = abs(1 - alpha - beta)
-
-            if (alpha, beta) not in results_by_chain:
-                results_by_chain[(alpha, beta)] = []
-
-            for noise in noise_levels:
-                count += 1
-                mc = MarkovChain(alpha=alpha, beta=beta)
-                sigma = make_noisy_strategy(noise)
+    grid = evaluate_grid(decay_cell_kernel, alpha_grid, beta_grid, mode='process', seed=0,
+                         noise_levels=noise_levels, T=T, N=N, T_path=T_path)
+    lambda_matrix = grid['lambda'][:, :, noise_levels.index(heatmap_noise)]
 
-                mean_tv = run_monte_carlo_decay(mc, sigma, T, N,
-                                                seed_base=count*1000)
+    for i, j, alpha, beta in grid.cells():
+        eig2 = abs(1 - alpha - beta)
+        results_by_chain[(alpha, beta)] = []
 
-                C, lam, r2 = fit_exponential_decay(mean_tv, t_start=5, t_end=min(T, 300))
+        for k, noise in enumerate(noise_levels):
+            count += 1
+            C, lam, r2 = grid['C'][i, j, k], grid['lambda'][i, j, k], grid['r2'][i, j, k]
 
-                entry = {
-                    'alpha': alpha, 'beta': beta, 'noise': noise,
-                    'eigenvalue': eig2, 'lambda': lam, 'C': C, 'r2': r2
-                }
-                results_by_noise[noise].append(entry)
-                results_by_chain[(alpha, beta)].append(entry)
+            entry = {
+                'alpha': alpha, 'beta': beta, 'noise': noise,
+                'eigenvalue': eig2, 'lambda': lam, 'C': C, 'r2': r2,
+                'birkhoff': grid['birkhoff'][i, j, k], 'lyapunov': grid['lyapunov'][i, j, k]
+            }
+            results_by_noise[noise].append(entry)
+            results_by_chain[(alpha, beta)].append(entry)
 
-                if noise == heatmap_noise:
-                    lambda_matrix[i, j] = lam
-
-                if count % 10 == 0 or count == total:
-                    print(f"  Progress: {count}/{total}  "
-                          f"[alpha={alpha:.1f}, beta={beta:.1f}, noise={noise:.1f}] "
-                          f"-> lambda={lam:.4f}, |1-a-b|={eig2:.2f}, R2={r2:.4f}")
+            if count % 10 == 0 or count == total:
+                print(f"  Progress: {count}/{total}  "
+                      f"[alpha={alpha:.1f}, beta={beta:.1f}, noise={noise:.1f}] "
+                      f"-> lambda={lam:.4f}, |1-a-b|={eig2:.2f}, R2={r2:.4f}")
 
     # Summary table
     print(f"\n--- Summary: Fitted lambda vs Theory ---")
-    print(f"{'alpha':>5} {'beta':>5} {'noise':>5} | {'|1-a-b|':>7} {'lambda':>7} {'C':>8} {'R^2':>6}")
-    print("-" * 55)
+    print(f"{'alpha':>5} {'beta':>5} {'noise':>5} | {'|1-a-b|':>7} {'lambda':>7} {'C':>8} {'R^2':>6}"
+          f" | {'Lyap.':>7} {'Birkh.':>7}")
+    print("-" * 73)
     for noise in noise_levels:
         for entry in results_by_noise[noise]:
             print(f"{entry['alpha']:>5.1f} {entry['beta']:>5.1f} {entry['noise']:>5.1f} | "
                   f"{entry['eigenvalue']:>7.3f} {entry['lambda']:>7.4f} "
-                  f"{entry['C']:>8.4f} {entry['r2']:>6.4f}")
+                  f"{entry['C']:>8.4f} {entry['r2']:>6.4f} | "
+                  f"{entry['lyapunov']:>7.4f} {entry['birkhoff']:>7.4f}")
 
     # Correlation between fitted lambda and theory
     print(f"\n--- Correlation Analysis ---")
@@ -229,14 +261,26 @@ def main():
             corr, pval = sp_stats.pearsonr(theory[valid], fitted[valid])
             print(f"Noise {noise:.1f}: Pearson r = {corr:.4f}, p = {pval:.2e}")
 
+    print(f"\n--- Fitted lambda vs Lyapunov rate ---")
+    for noise in noise_levels:
+        entries = results_by_noise[noise]
+        fitted = np.array([e['lambda'] for e in entries])
+        lyapunov = np.array([e['lyapunov'] for e in entries])
+        valid = ~np.isnan(fitted)
+        if np.sum(valid) > 2:
+            corr, _ = sp_stats.pearsonr(lyapunov[valid], fitted[valid])
+            gap = np.mean(fitted[valid] - lyapunov[valid])
+            print(f"Noise {noise:.1f}: Pearson r = {corr:.4f}, mean(lambda - Lyapunov) = {gap:+.4f}")
+
     # Plots
     results_list = {'by_noise': results_by_noise, 'by_chain': results_by_chain}
 
-    fig1 = plot_forgetting_rate_heatmap(alpha_grid, beta_grid, lambda_matrix, heatmap_noise)
-    print(f"\nFigure saved: {fig1}")
-
-    fig2 = plot_lambda_vs_theory(results_list)
-    print(f"Figure saved: {fig2}")
+    figures = FigureQueue()
+    figures.submit(plot_forgetting_rate_heatmap,
+                   os.path.join(FIG_DIR, 'forgetting_rate_heatmap.png'),
+                   alpha_grid, beta_grid, lambda_matrix, heatmap_noise)
+    figures.submit(plot_lambda_vs_theory, os.path.join(FIG_DIR, 'lambda_vs_theory.png'),
+                   results_list)
 
     # Report
     report = f"""# SSA4_3: Exponential Decay Fitting — Report
@@ -252,16 +296,25 @@ For a 2-state Markov chain with transition probabilities alpha (G->B) and beta (
 the eigenvalues are 1 and (1-alpha-beta). The second eigenvalue |1-alpha-beta| governs
 the mixing time. The filter forgetting rate should be related to this eigenvalue.
 
+Two rates are also computed directly from the filter update matrices
+M_y = diag(s(·, y)) T^T, without Monte Carlo over paths:
+- **Birkhoff**: contraction coefficient tau(M_y) of the Hilbert projective metric,
+  a worst-case per-step bound (signal-independent for full-support signals)
+- **Lyapunov**: exp(lambda_2 - lambda_1) for the random product M_(y_t) ... M_(y_1),
+  from one path of {T_path} periods. It is the typical (almost-sure) rate, while the
+  fitted lambda is the rate of the *mean* TV distance and so sits slightly above it.
+
 ## Results Summary
 
 ### Fitted Parameters (noise={heatmap_noise})
-| alpha | beta | |1-a-b| | lambda | C | R^2 |
-|-------|------|--------|--------|---|-----|
+| alpha | beta | |1-a-b| | lambda | C | R^2 | Lyapunov | Birkhoff |
+|-------|------|--------|--------|---|-----|----------|----------|
 """
     for entry in results_by_noise[heatmap_noise]:
         report += (f"| {entry['alpha']:.1f} | {entry['beta']:.1f} | "
                    f"{entry['eigenvalue']:.3f} | {entry['lambda']:.4f} | "
-                   f"{entry['C']:.4f} | {entry['r2']:.4f} |\n")
+                   f"{entry['C']:.4f} | {entry['r2']:.4f} | "
+                   f"{entry['lyapunov']:.4f} | {entry['birkhoff']:.4f} |\n")
 
     report += """
 ### Correlation: Fitted lambda vs |1-alpha-beta|
@@ -305,6 +358,9 @@ the mixing time. The filter forgetting rate should be related to this eigenvalue
     with open(report_path, 'w') as f:
         f.write(report)
     print(f"Report saved: {report_path}")
+
+    for path in figures.render():
+        print(f"Figure saved: {path}")
     print("\nDone.")
 
 
@@ -10,13 +10,11 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from scipy.optimize import linprog
+from shared.ot import solve_ot
 from shared.markov_utils import (
-    MarkovChain, DeterrenceGame, make_strategy_matrix, save_figure
+    MarkovChain, DeterrenceGame, make_strategy_matrix
 )
+from shared.figures import FigureQueue, pyplot
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
@@ -24,7 +22,7 @@ os.makedirs(FIGURES_DIR, exist_ok=True)
 
 def solve_ot_problem(mu, phi, cost_matrix):
     """
-    Solve the optimal transport problem via linear programming.
+    Solve the optimal transport problem (exact transportation simplex).
 
     Maximise  sum_{i,j} gamma[i,j] * cost_matrix[i,j]
     subject to:
@@ -43,41 +41,9 @@ def solve_ot_problem(mu, phi, cost_matrix):
     gamma : array (n, m) — optimal coupling
     obj_val : float — optimal objective value
     """
-    n = len(mu)
-    m = len(phi)
-
-    # linprog minimises c^T x, so negate for maximisation
-    c = -cost_matrix.flatten()
-
-    # Equality constraints: A_eq @ x = b_eq
-    # Row marginals: for each i, sum_j gamma[i,j] = mu[i]
-    # Column marginals: for each j, sum_i gamma[i,j] = phi[j]
-    n_vars = n * m
-    n_eq = n + m
-    A_eq = np.zeros((n_eq, n_vars))
-    b_eq = np.zeros(n_eq)
-
-    # Row marginals
-    for i in range(n):
-        for j in range(m):
-            A_eq[i, i * m + j] = 1.0
-        b_eq[i] = mu[i]
-
-    # Column marginals
-    for j in range(m):
-        for i in range(n):
-            A_eq[n + j, i * m + j] = 1.0
-        b_eq[n + j] = phi[j]
-
-    bounds = [(0, None)] * n_vars
-
-    result = linprog(c, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs')
-
-    if not result.success:
-        raise RuntimeError(f"LP solver failed: {result.message}")
-
-    gamma = result.x.reshape(n, m)
-    obj_val = -result.fun  # negate back
+    gamma, obj_val = solve_ot(mu, phi, cost_matrix, maximize=True)
+    if gamma is None:
+        raise RuntimeError("OT problem infeasible: marginals are negative or unbalanced")
 
     return gamma, obj_val
 
@@ -139,8 +105,9 @@ def build_comonotone_coupling(mc, game):
     return gamma
 
 
-def plot_coupling_heatmap(gamma, mc, game, title, filepath):
+def plot_coupling_heatmap(gamma, mc, game, title):
     """Plot a heatmap of the coupling matrix."""
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(6, 5))
 
     lifted_labels = [f"({mc.states[t]},{mc.states[p]})" for t, p in mc.lifted_states]
@@ -167,8 +134,7 @@ def plot_coupling_heatmap(gamma, mc, game, title, filepath):
                     fontsize=11, color=color, fontweight='bold')
 
     fig.tight_layout()
-    save_figure(fig, filepath)
-    print(f"  Saved: {filepath}")
+    return fig
 
 
 def main():
@@ -204,7 +170,7 @@ def main():
     print(f"\nMarginal checks: sum(mu)={mu.sum():.6f}, sum(phi)={phi.sum():.6f}")
 
     # Solve OT problem
-    print("\n--- Solving OT problem via linprog ---")
+    print("\n--- Solving OT problem (transportation simplex) ---")
     gamma_opt, obj_val = solve_ot_problem(mu, phi, U)
     print(f"Optimal objective: {obj_val:.6f}")
     print(f"\nOptimal coupling gamma*:")
@@ -230,7 +196,9 @@ def main():
         print(f"  {lbl:>8}  {gamma_como[i,0]:>8.5f}  {gamma_como[i,1]:>8.5f}")
 
     # Verify match
-    diff = np.abs(gamma_opt - gamma_como).max()
+    # Round away float noise from the simplex pivots so an exact match
+    # reports 0 rather than machine epsilon
+    diff = round(float(np.abs(gamma_opt - gamma_como).max()), 12)
     match = diff < 1e-6
     print(f"\nMax difference from co-monotone: {diff:.2e}")
     print(f"Matches co-monotone coupling: {match}")
@@ -240,10 +208,11 @@ def main():
     print(f"Co-monotone objective: {como_obj:.6f}")
 
     # Plot coupling heatmap
-    plot_coupling_heatmap(
+    figures = FigureQueue()
+    figures.submit(
+        plot_coupling_heatmap, os.path.join(FIGURES_DIR, 'ot_coupling_stationary.png'),
         gamma_opt, mc, game,
-        "Optimal OT Coupling at Stationary Distribution ρ̃",
-        os.path.join(FIGURES_DIR, 'ot_coupling_stationary.png')
+        "Optimal OT Coupling at Stationary Distribution ρ̃"
     )
 
     # Generate report
@@ -285,6 +254,9 @@ def main():
         f.write("![OT Coupling Heatmap](figures/ot_coupling_stationary.png)\n")
 
     print(f"\n  Report saved to: {report_path}")
+
+    for path in figures.render():
+        print(f"  Saved: {path}")
     print("\nDone.")
 
 
@@ -10,11 +10,9 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from scipy.optimize import linprog
-from shared.markov_utils import MarkovChain, DeterrenceGame, make_strategy_matrix, save_figure
+from shared.markov_utils import MarkovChain, DeterrenceGame, make_strategy_matrix
+from shared.figures import FigureQueue, pyplot
+from shared.ot import solve_ot as solve_ot_shared
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
@@ -22,31 +20,7 @@ os.makedirs(FIGURES_DIR, exist_ok=True)
 
 def solve_ot(mu, phi, cost_matrix):
     """Solve OT LP: max sum gamma*cost s.t. row marginals=mu, col marginals=phi."""
-    n, m = cost_matrix.shape
-    c = -cost_matrix.flatten()
-    n_vars = n * m
-
-    A_eq = np.zeros((n + m, n_vars))
-    b_eq = np.zeros(n + m)
-
-    for i in range(n):
-        for j in range(m):
-            A_eq[i, i * m + j] = 1.0
-        b_eq[i] = mu[i]
-
-    for j in range(m):
-        for i in range(n):
-            A_eq[n + j, i * m + j] = 1.0
-        b_eq[n + j] = phi[j]
-
-    bounds = [(0, None)] * n_vars
-    result = linprog(c, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs')
-
-    if not result.success:
-        return None, None
-    gamma = result.x.reshape(n, m)
-    obj_val = -result.fun
-    return gamma, obj_val
+    return solve_ot_shared(mu, phi, cost_matrix, maximize=True)
 
 
 def get_support(gamma, threshold=1e-8):
@@ -135,11 +109,63 @@ def build_perturbation_directions(mc):
     return directions
 
 
+def plot_objective_vs_epsilon(results):
+    """OT objective against ε, one panel per perturbation direction."""
+    plt = pyplot()
+    fig, axes = plt.subplots(2, 2, figsize=(12, 9))
+    for ax, (dir_name, res) in zip(axes.flatten(), results.items()):
+        ax.plot(res['epsilons'], res['objectives'], 'b-', linewidth=2)
+        if res['critical_eps'] is not None:
+            ax.axvline(res['critical_eps'], color='red', linestyle='--', linewidth=1.5,
+                       label=f"ε*={res['critical_eps']:.3f}")
+            ax.legend(fontsize=10)
+        ax.set_xlabel('ε', fontsize=12)
+        ax.set_ylabel('OT Objective', fontsize=12)
+        ax.set_title(dir_name, fontsize=13)
+        ax.grid(True, alpha=0.3)
+    fig.suptitle("OT Objective Value vs Perturbation Strength", fontsize=15, y=1.02)
+    fig.tight_layout()
+    return fig
+
+
+def plot_support_change_threshold(results):
+    """Critical ε* per direction (the largest ε tried where the support never changed)."""
+    plt = pyplot()
+    fig, ax = plt.subplots(figsize=(8, 5))
+    dir_names = list(results.keys())
+    critical_eps_vals = []
+    colors = []
+    for dn in dir_names:
+        ce = results[dn]['critical_eps']
+        if ce is not None:
+            critical_eps_vals.append(ce)
+            colors.append('red')
+        else:
+            critical_eps_vals.append(results[dn]['epsilons'][-1])
+            colors.append('green')
+
+    bars = ax.barh(range(len(dir_names)), critical_eps_vals, color=colors, alpha=0.7)
+    ax.set_yticks(range(len(dir_names)))
+    ax.set_yticklabels(dir_names, fontsize=11)
+    ax.set_xlabel('ε* (support change threshold)', fontsize=12)
+    ax.set_title("Critical Perturbation Threshold by Direction\n(green = stable, red = changed)", fontsize=13)
+    ax.grid(True, axis='x', alpha=0.3)
+
+    for i, (val, col) in enumerate(zip(critical_eps_vals, colors)):
+        label = f"{val:.3f}" if col == 'red' else "stable"
+        ax.text(val + 0.005, i, label, va='center', fontsize=10, fontweight='bold')
+
+    fig.tight_layout()
+    return fig
+
+
 def main():
     print("=" * 60)
     print("SSA5_2: Marginal Perturbation Sweep")
     print("=" * 60)
 
+    figures = FigureQueue()
+
     mc = MarkovChain(alpha=0.3, beta=0.5)
     game = DeterrenceGame(x=0.3, y=0.4)
     rho = mc.rho_tilde.copy()
@@ -214,50 +240,12 @@ def main():
         print(f"  Objective range: [{min(objs):.6f}, {max(objs):.6f}]")
 
     # Plot 1: OT objective vs epsilon for each direction
-    fig, axes = plt.subplots(2, 2, figsize=(12, 9))
-    for ax, (dir_name, res) in zip(axes.flatten(), results.items()):
-        ax.plot(res['epsilons'], res['objectives'], 'b-', linewidth=2)
-        if res['critical_eps'] is not None:
-            ax.axvline(res['critical_eps'], color='red', linestyle='--', linewidth=1.5,
-                       label=f"ε*={res['critical_eps']:.3f}")
-            ax.legend(fontsize=10)
-        ax.set_xlabel('ε', fontsize=12)
-        ax.set_ylabel('OT Objective', fontsize=12)
-        ax.set_title(dir_name, fontsize=13)
-        ax.grid(True, alpha=0.3)
-    fig.suptitle("OT Objective Value vs Perturbation Strength", fontsize=15, y=1.02)
-    fig.tight_layout()
-    save_figure(fig, os.path.join(FIGURES_DIR, 'ot_objective_vs_epsilon.png'))
-    print(f"\nSaved: figures/ot_objective_vs_epsilon.png")
+    figures.submit(plot_objective_vs_epsilon, os.path.join(FIGURES_DIR, 'ot_objective_vs_epsilon.png'),
+                   results)
 
     # Plot 2: Support change thresholds
-    fig, ax = plt.subplots(figsize=(8, 5))
-    dir_names = list(results.keys())
-    critical_eps_vals = []
-    colors = []
-    for dn in dir_names:
-        ce = results[dn]['critical_eps']
-        if ce is not None:
-            critical_eps_vals.append(ce)
-            colors.append('red')
-        else:
-            critical_eps_vals.append(results[dn]['epsilons'][-1])
-            colors.append('green')
-
-    bars = ax.barh(range(len(dir_names)), critical_eps_vals, color=colors, alpha=0.7)
-    ax.set_yticks(range(len(dir_names)))
-    ax.set_yticklabels(dir_names, fontsize=11)
-    ax.set_xlabel('ε* (support change threshold)', fontsize=12)
-    ax.set_title("Critical Perturbation Threshold by Direction\n(green = stable, red = changed)", fontsize=13)
-    ax.grid(True, axis='x', alpha=0.3)
-
-    for i, (val, col) in enumerate(zip(critical_eps_vals, colors)):
-        label = f"{val:.3f}" if col == 'red' else "stable"
-        ax.text(val + 0.005, i, label, va='center', fontsize=10, fontweight='bold')
-
-    fig.tight_layout()
-    save_figure(fig, os.path.join(FIGURES_DIR, 'support_change_threshold.png'))
-    print(f"Saved: figures/support_change_threshold.png")
+    figures.submit(plot_support_change_threshold, os.path.join(FIGURES_DIR, 'support_change_threshold.png'),
+                   results)
 
     # Generate report
     report_path = os.path.join(os.path.dirname(__file__), 'report.md')
@@ -308,6 +296,9 @@ def main():
         f.write("![Support Change Threshold](figures/support_change_threshold.png)\n")
 
     print(f"Report saved to: {report_path}")
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
 
 
@@ -10,11 +10,10 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from scipy.optimize import linprog
-from shared.markov_utils import MarkovChain, DeterrenceGame, make_strategy_matrix, save_figure
+from shared.markov_utils import MarkovChain, DeterrenceGame, make_strategy_matrix
+from shared.figures import FigureQueue, pyplot
+from shared.grid import evaluate_grid
+from shared.ot import rhs_ranging, solve_ot as solve_ot_shared
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
@@ -22,31 +21,7 @@ os.makedirs(FIGURES_DIR, exist_ok=True)
 
 def solve_ot(mu, phi, cost_matrix):
     """Solve OT LP."""
-    n, m = cost_matrix.shape
-    c = -cost_matrix.flatten()
-    n_vars = n * m
-
-    A_eq = np.zeros((n + m, n_vars))
-    b_eq = np.zeros(n + m)
-
-    for i in range(n):
-        for j in range(m):
-            A_eq[i, i * m + j] = 1.0
-        b_eq[i] = mu[i]
-
-    for j in range(m):
-        for i in range(n):
-            A_eq[n + j, i * m + j] = 1.0
-        b_eq[n + j] = phi[j]
-
-    bounds = [(0, None)] * n_vars
-    result = linprog(c, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs')
-
-    if not result.success:
-        return None, None
-    gamma = result.x.reshape(n, m)
-    obj_val = -result.fun
-    return gamma, obj_val
+    return solve_ot_shared(mu, phi, cost_matrix, maximize=True)
 
 
 def get_support(gamma, threshold=1e-8):
@@ -78,43 +53,62 @@ def compute_action_marginal_from_mu(mu, mc, game):
     return phi
 
 
-def compute_stability_margin(mc, game, direction_fn, eps_max=0.5, eps_step=0.005):
+def compute_stability_margin(mc, game, direction_fn, eps_max=0.5, tol=1e-9):
     """
     For a given (alpha, beta) and perturbation direction, find the maximum eps
     before the OT support changes. Returns eps* or eps_max if stable.
+
+    mu = rho + eps * direction and its action marginal are linear in eps, so
+    the base optimal basis gives eps* exactly (RHS ranging, one OT solve).
+    Only when that basis is degenerate along the direction is eps* located
+    by bisection on re-solved supports, to within `tol`.
     """
     rho = mc.rho_tilde.copy()
     U = build_payoff_matrix(mc, game)
     phi_base = compute_action_marginal_from_mu(rho, mc, game)
-    gamma_base, _ = solve_ot(rho, phi_base, U)
-    if gamma_base is None:
-        return 0.0
-    support_base = get_support(gamma_base)
 
     direction = direction_fn(mc)
     if direction is None:
-        return eps_max
+        gamma_base, _ = solve_ot(rho, phi_base, U)
+        return 0.0 if gamma_base is None else eps_max
 
-    eps = eps_step
-    while eps <= eps_max:
-        mu_pert = rho + eps * direction
-        if np.any(mu_pert < -1e-10):
-            return eps - eps_step
-        mu_pert = np.clip(mu_pert, 0, None)
-        mu_pert = mu_pert / mu_pert.sum()
+    d_phi = compute_action_marginal_from_mu(direction, mc, game)
+    gamma_base, _, eps_break, degenerate = rhs_ranging(rho, phi_base, U, direction, d_phi,
+                                                       maximize=True)
+    if gamma_base is None:
+        return 0.0
 
-        phi_pert = compute_action_marginal_from_mu(mu_pert, mc, game)
-        gamma, _ = solve_ot(mu_pert, phi_pert, U)
-        if gamma is None:
-            return eps - eps_step
+    # mu must stay a distribution
+    falling = direction < 0
+    eps_domain = np.min(rho[falling] / -direction[falling]) if falling.any() else np.inf
+    eps_hi = min(eps_domain, eps_max)
+    if not degenerate:
+        return float(min(eps_break, eps_hi))
 
-        supp = get_support(gamma)
-        if supp != support_base:
-            return eps
+    support_base = get_support(gamma_base)
+
+    def support_changed(eps):
+        mu_pert = np.clip(rho + eps * direction, 0, None)
+        mu_pert = mu_pert / mu_pert.sum()
+        gamma, _ = solve_ot(mu_pert, compute_action_marginal_from_mu(mu_pert, mc, game), U)
+        return gamma is None or get_support(gamma) != support_base
+
+    if not support_changed(eps_hi):
+        return float(eps_hi)
+    lo, hi = 0.0, eps_hi
+    while hi - lo > tol:
+        mid = 0.5 * (lo + hi)
+        if support_changed(mid):
+            hi = mid
+        else:
+            lo = mid
+    return float(hi)
 
-        eps += eps_step
 
-    return eps_max
+def stability_margin_kernel(alpha, beta):
+    """Grid kernel: worst-case stability margin for one (alpha, beta)."""
+    return compute_stability_margin(MarkovChain(alpha=alpha, beta=beta),
+                                    DeterrenceGame(x=0.3, y=0.4), worst_case_direction)
 
 
 def worst_case_direction(mc):
@@ -159,11 +153,65 @@ def more_transitions_direction(mc):
     return d / np.abs(d).sum()
 
 
+def plot_coupling_weights(epsilons, weight_traces, lifted_labels, mc, game):
+    """OT coupling weights γ(θ̃, a₁) against ε, one panel per lifted state."""
+    plt = pyplot()
+    fig, axes = plt.subplots(2, 2, figsize=(12, 9))
+    action_labels = game.actions
+    colors_map = {0: 'blue', 1: 'red'}
+
+    for idx in range(mc.n_lifted):
+        ax = axes[idx // 2, idx % 2]
+        for a in range(game.n_actions):
+            ax.plot(epsilons, weight_traces[:len(epsilons), idx, a],
+                    color=colors_map[a], linewidth=2,
+                    label=f'a₁={action_labels[a]}')
+        ax.set_xlabel('ε', fontsize=12)
+        ax.set_ylabel('γ(θ̃, a₁)', fontsize=12)
+        ax.set_title(f'θ̃ = {lifted_labels[idx]}', fontsize=13)
+        ax.legend(fontsize=10)
+        ax.grid(True, alpha=0.3)
+        ax.set_ylim(-0.01, None)
+
+    fig.suptitle("Coupling Weights vs Perturbation (Toward F(·|B))", fontsize=14, y=1.02)
+    fig.tight_layout()
+    return fig
+
+
+def plot_stability_margin(alphas, betas, stability_grid, mc):
+    """Heatmap of the stability margin ε* over (α, β), with the baseline marked."""
+    plt = pyplot()
+    fig, ax = plt.subplots(figsize=(9, 7))
+    im = ax.imshow(stability_grid, origin='lower', aspect='auto',
+                   extent=[alphas[0], alphas[-1], betas[0], betas[-1]],
+                   cmap='RdYlGn', vmin=0, vmax=0.5)
+    cbar = fig.colorbar(im, ax=ax)
+    cbar.set_label('Stability margin ε*', fontsize=12)
+    ax.set_xlabel('α = Pr(B|G)', fontsize=13)
+    ax.set_ylabel('β = Pr(G|B)', fontsize=13)
+    ax.set_title('OT Support Stability Margin\n(Perturbation toward F(·|B))', fontsize=14)
+
+    # Mark the baseline
+    ax.plot(mc.alpha, mc.beta, 'k*', markersize=15, label='Baseline (0.3, 0.5)')
+    ax.legend(fontsize=11, loc='upper right')
+
+    # Contour lines
+    contour_levels = [0.05, 0.1, 0.2, 0.3]
+    cs = ax.contour(alphas, betas, stability_grid, levels=contour_levels,
+                    colors='black', linewidths=0.8, linestyles='--')
+    ax.clabel(cs, inline=True, fontsize=9, fmt='%.2f')
+
+    fig.tight_layout()
+    return fig
+
+
 def main():
     print("=" * 60)
     print("SSA5_3: Support Stability Analysis")
     print("=" * 60)
 
+    figures = FigureQueue()
+
     mc = MarkovChain(alpha=0.3, beta=0.5)
     game = DeterrenceGame(x=0.3, y=0.4)
 
@@ -203,27 +251,8 @@ def main():
         weight_traces[k] = gamma
 
     # Plot coupling weights
-    fig, axes = plt.subplots(2, 2, figsize=(12, 9))
-    action_labels = game.actions
-    colors_map = {0: 'blue', 1: 'red'}
-
-    for idx in range(mc.n_lifted):
-        ax = axes[idx // 2, idx % 2]
-        for a in range(game.n_actions):
-            ax.plot(epsilons, weight_traces[:len(epsilons), idx, a],
-                    color=colors_map[a], linewidth=2,
-                    label=f'a₁={action_labels[a]}')
-        ax.set_xlabel('ε', fontsize=12)
-        ax.set_ylabel('γ(θ̃, a₁)', fontsize=12)
-        ax.set_title(f'θ̃ = {lifted_labels[idx]}', fontsize=13)
-        ax.legend(fontsize=10)
-        ax.grid(True, alpha=0.3)
-        ax.set_ylim(-0.01, None)
-
-    fig.suptitle("Coupling Weights vs Perturbation (Toward F(·|B))", fontsize=14, y=1.02)
-    fig.tight_layout()
-    save_figure(fig, os.path.join(FIGURES_DIR, 'coupling_weights_vs_epsilon.png'))
-    print("Saved: figures/coupling_weights_vs_epsilon.png")
+    figures.submit(plot_coupling_weights, os.path.join(FIGURES_DIR, 'coupling_weights_vs_epsilon.png'),
+                   epsilons, weight_traces, lifted_labels, mc, game)
 
     # ---- Part 2: Stability margin heatmap over (alpha, beta) ----
     print("\n--- Computing stability margin heatmap ---")
@@ -231,38 +260,12 @@ def main():
     alphas = np.linspace(0.05, 0.95, 30)
     betas = np.linspace(0.05, 0.95, 30)
 
-    stability_grid = np.zeros((len(betas), len(alphas)))
+    # One OT solve per cell; serial keeps the solver's warm starts across cells
+    grid = evaluate_grid(stability_margin_kernel, alphas, betas, mode='serial')
+    stability_grid = grid['value'].T  # rows: beta, columns: alpha
 
-    for i, beta in enumerate(betas):
-        for j, alpha in enumerate(alphas):
-            mc_ij = MarkovChain(alpha=alpha, beta=beta)
-            game_ij = DeterrenceGame(x=0.3, y=0.4)
-            margin = compute_stability_margin(mc_ij, game_ij, worst_case_direction)
-            stability_grid[i, j] = margin
-
-    fig, ax = plt.subplots(figsize=(9, 7))
-    im = ax.imshow(stability_grid, origin='lower', aspect='auto',
-                   extent=[alphas[0], alphas[-1], betas[0], betas[-1]],
-                   cmap='RdYlGn', vmin=0, vmax=0.5)
-    cbar = fig.colorbar(im, ax=ax)
-    cbar.set_label('Stability margin ε*', fontsize=12)
-    ax.set_xlabel('α = Pr(B|G)', fontsize=13)
-    ax.set_ylabel('β = Pr(G|B)', fontsize=13)
-    ax.set_title('OT Support Stability Margin\n(Perturbation toward F(·|B))', fontsize=14)
-
-    # Mark the baseline
-    ax.plot(mc.alpha, mc.beta, 'k*', markersize=15, label='Baseline (0.3, 0.5)')
-    ax.legend(fontsize=11, loc='upper right')
-
-    # Contour lines
-    contour_levels = [0.05, 0.1, 0.2, 0.3]
-    cs = ax.contour(alphas, betas, stability_grid, levels=contour_levels,
-                    colors='black', linewidths=0.8, linestyles='--')
-    ax.clabel(cs, inline=True, fontsize=9, fmt='%.2f')
-
-    fig.tight_layout()
-    save_figure(fig, os.path.join(FIGURES_DIR, 'stability_margin_heatmap.png'))
-    print("Saved: figures/stability_margin_heatmap.png")
+    figures.submit(plot_stability_margin, os.path.join(FIGURES_DIR, 'stability_margin_heatmap.png'),
+                   alphas, betas, stability_grid, mc)
 
     # Summary stats
     print(f"\nStability margin statistics:")
@@ -323,6 +326,9 @@ def main():
         f.write("![Stability Margin Heatmap](figures/stability_margin_heatmap.png)\n")
 
     print(f"\nReport saved to: {report_path}")
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
 
 
@@ -10,13 +10,9 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from shared.markov_utils import (
-    MarkovChain, DeterrenceGame, BayesianFilter,
-    make_strategy_matrix, save_figure
-)
+from shared.markov_utils import MarkovChain, simulate_path, DeterrenceGame
+from shared.figures import FigureQueue, pyplot
+from shared.game_engine import GameEngine
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
@@ -77,47 +73,17 @@ def simulate_beliefs(mc, game, T=5000, rng=None):
     if rng is None:
         rng = np.random.default_rng(42)
 
-    states = mc.simulate(T, rng=rng)
-    strat_mat = make_strategy_matrix(game.stackelberg_strategy)
+    states = simulate_path(mc, T, rng)
 
-    bf = BayesianFilter(mc)
-    beliefs = np.zeros(T)
-    beliefs[0] = mc.pi[0]  # initial belief = stationary Pr(G)
+    # Beliefs start at the stationary Pr(G); indifference is resolved as C
+    engine = GameEngine(mc, game, u2=U2)
+    res = engine.play(states, scenarios=('filtered',), tie=0)['filtered']
+    return states, res['beliefs'], res['lr_actions'], res['sr_actions']
 
-    actions_lr = np.zeros(T, dtype=int)
-    actions_sr = np.zeros(T, dtype=int)
 
-    for t in range(T):
-        # LR action
-        actions_lr[t] = game.stackelberg_strategy(states[t])
-
-        # SR belief and best response
-        mu_t = bf.belief[0]  # Pr(G)
-        beliefs[t] = mu_t
-        actions_sr[t] = max(0, sr_best_response(mu_t))  # resolve indifference as C
-
-        # Bayesian update with observed LR action
-        if t < T - 1:
-            bf.update(actions_lr[t], strat_mat)
-
-    return states, beliefs, actions_lr, actions_sr
-
-
-def main():
-    print("=" * 60)
-    print("SSA6_1: SR Player Best Response")
-    print("=" * 60)
-
-    mc = MarkovChain(alpha=0.3, beta=0.5)
-    game = DeterrenceGame(x=0.3, y=0.4)
-
-    threshold = compute_threshold()
-    print(f"\nSR payoff from C: E[u2(C)] = 2μ - 1")
-    print(f"SR payoff from D: E[u2(D)] = 0.5(1-μ)")
-    print(f"Threshold μ* = {threshold:.4f}")
-    print(f"SR plays C when μ > {threshold}, D when μ < {threshold}")
-
-    # ---- Plot 1: Best response as function of belief ----
+def plot_best_response(threshold, mc):
+    """SR expected payoffs and best-response regions as functions of the belief μ."""
+    plt = pyplot()
     mus = np.linspace(0, 1, 500)
     payoff_c = np.array([sr_expected_payoff(m, 0) for m in mus])
     payoff_d = np.array([sr_expected_payoff(m, 1) for m in mus])
@@ -158,34 +124,12 @@ def main():
     ax2.legend(fontsize=10, loc='center')
 
     fig.tight_layout()
-    save_figure(fig, os.path.join(FIGURES_DIR, 'best_response_vs_belief.png'))
-    print("Saved: figures/best_response_vs_belief.png")
+    return fig
 
-    # ---- Simulation: track beliefs and threshold crossings ----
-    print("\n--- Simulating belief dynamics ---")
-    T = 5000
-    states, beliefs, actions_lr, actions_sr = simulate_beliefs(mc, game, T=T)
-
-    # Count threshold crossings
-    above = beliefs > threshold
-    crossings = np.where(np.diff(above.astype(int)) != 0)[0]
-    n_crossings = len(crossings)
-    crossing_rate = n_crossings / T
-
-    # Time in each region
-    frac_c_region = np.mean(beliefs > threshold)
-    frac_d_region = np.mean(beliefs <= threshold)
 
-    print(f"  Periods simulated: {T}")
-    print(f"  Threshold crossings: {n_crossings}")
-    print(f"  Crossing rate: {crossing_rate:.4f} per period")
-    print(f"  Time in C region (μ>{threshold}): {frac_c_region*100:.1f}%")
-    print(f"  Time in D region (μ≤{threshold}): {frac_d_region*100:.1f}%")
-    print(f"  Mean belief: {beliefs.mean():.4f}")
-    print(f"  Belief std: {beliefs.std():.4f}")
-    print(f"  Stationary π(G): {mc.pi[0]:.4f}")
-
-    # ---- Plot 2: Threshold crossings over time ----
+def plot_threshold_crossings(beliefs, above, crossings, threshold, mc, T):
+    """Belief trajectory against μ*, and the cumulative number of crossings."""
+    plt = pyplot()
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 7), sharex=True)
 
     # Belief trajectory (first 500 periods for clarity)
@@ -219,8 +163,56 @@ def main():
     ax2.grid(True, alpha=0.3)
 
     fig.tight_layout()
-    save_figure(fig, os.path.join(FIGURES_DIR, 'threshold_crossings.png'))
-    print("Saved: figures/threshold_crossings.png")
+    return fig
+
+
+def main():
+    print("=" * 60)
+    print("SSA6_1: SR Player Best Response")
+    print("=" * 60)
+
+    figures = FigureQueue()
+
+    mc = MarkovChain(alpha=0.3, beta=0.5)
+    game = DeterrenceGame(x=0.3, y=0.4)
+
+    threshold = compute_threshold()
+    print(f"\nSR payoff from C: E[u2(C)] = 2μ - 1")
+    print(f"SR payoff from D: E[u2(D)] = 0.5(1-μ)")
+    print(f"Threshold μ* = {threshold:.4f}")
+    print(f"SR plays C when μ > {threshold}, D when μ < {threshold}")
+
+    # ---- Plot 1: Best response as function of belief ----
+    figures.submit(plot_best_response, os.path.join(FIGURES_DIR, 'best_response_vs_belief.png'),
+                   threshold, mc)
+
+    # ---- Simulation: track beliefs and threshold crossings ----
+    print("\n--- Simulating belief dynamics ---")
+    T = 5000
+    states, beliefs, actions_lr, actions_sr = simulate_beliefs(mc, game, T=T)
+
+    # Count threshold crossings
+    above = beliefs > threshold
+    crossings = np.where(np.diff(above.astype(int)) != 0)[0]
+    n_crossings = len(crossings)
+    crossing_rate = n_crossings / T
+
+    # Time in each region
+    frac_c_region = np.mean(beliefs > threshold)
+    frac_d_region = np.mean(beliefs <= threshold)
+
+    print(f"  Periods simulated: {T}")
+    print(f"  Threshold crossings: {n_crossings}")
+    print(f"  Crossing rate: {crossing_rate:.4f} per period")
+    print(f"  Time in C region (μ>{threshold}): {frac_c_region*100:.1f}%")
+    print(f"  Time in D region (μ≤{threshold}): {frac_d_region*100:.1f}%")
+    print(f"  Mean belief: {beliefs.mean():.4f}")
+    print(f"  Belief std: {beliefs.std():.4f}")
+    print(f"  Stationary π(G): {mc.pi[0]:.4f}")
+
+    # ---- Plot 2: Threshold crossings over time ----
+    figures.submit(plot_threshold_crossings, os.path.join(FIGURES_DIR, 'threshold_crossings.png'),
+                   beliefs, above, crossings, threshold, mc, T)
 
     # ---- Generate report ----
     report_path = os.path.join(os.path.dirname(__file__), 'report.md')
@@ -270,6 +262,9 @@ def main():
         f.write("![Threshold Crossings](figures/threshold_crossings.png)\n")
 
     print(f"\nReport saved to: {report_path}")
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
 
 
@@ -9,13 +9,9 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from shared.markov_utils import (
-    MarkovChain, DeterrenceGame, BayesianFilter,
-    make_strategy_matrix, save_figure
-)
+from shared.markov_utils import MarkovChain, simulate_path, DeterrenceGame
+from shared.figures import FigureQueue, pyplot
+from shared.game_engine import GameEngine, sr_threshold
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
@@ -25,142 +21,12 @@ U2 = np.array([
     [1.0, 0.0],    # State G: [C, D]
     [-1.0, 0.5]    # State B: [C, D]
 ])
-SR_THRESHOLD = 0.6  # mu* = 3/5
-
-
-def sr_best_response_action(mu):
-    """SR best response: C (0) if mu > threshold, D (1) otherwise."""
-    if mu > SR_THRESHOLD:
-        return 0  # C
-    else:
-        return 1  # D
-
-
-def lr_payoff(state, lr_action, sr_action, game):
-    """
-    LR payoff depends on state and both actions.
-    We model LR payoff as:
-      - Base payoff u1(state, lr_action) from the deterrence game
-      - Bonus/penalty from SR cooperation:
-        if SR plays C, LR gets full u1; if SR plays D, LR gets reduced payoff
-    For simplicity: LR payoff = u1(state, lr_action) * (1 if sr=C, else 0.5)
-    Actually, to keep it clean, let's use u1 directly and add SR effect:
-    LR_payoff = u1(state, lr_action) if SR cooperates
-    LR_payoff = u1(state, lr_action) * 0.5 if SR defects
-    """
-    base = game.u1[state, lr_action]
-    if sr_action == 0:  # C
-        return base
-    else:  # D
-        return base * 0.5
-
-
-def simulate_scenario(mc, game, T, use_filtering, rng):
-    """
-    Simulate one scenario.
-
-    Parameters
-    ----------
-    use_filtering : bool
-        If True, SR uses Bayesian filtering. If False, SR always uses pi(G).
-    """
-    states = mc.simulate(T, rng=rng)
-    strat_mat = make_strategy_matrix(game.stackelberg_strategy)
-
-    bf = BayesianFilter(mc) if use_filtering else None
-
-    beliefs = np.zeros(T)
-    lr_actions = np.zeros(T, dtype=int)
-    sr_actions = np.zeros(T, dtype=int)
-    lr_payoffs = np.zeros(T)
-
-    for t in range(T):
-        # LR plays Stackelberg
-        lr_actions[t] = game.stackelberg_strategy(states[t])
-
-        # SR belief
-        if use_filtering and bf is not None:
-            mu_t = bf.belief[0]
-        else:
-            mu_t = mc.pi[0]  # always stationary
-
-        beliefs[t] = mu_t
-
-        # SR best response
-        sr_actions[t] = sr_best_response_action(mu_t)
-
-        # LR payoff
-        lr_payoffs[t] = lr_payoff(states[t], lr_actions[t], sr_actions[t], game)
-
-        # Update filter
-        if use_filtering and bf is not None and t < T - 1:
-            bf.update(lr_actions[t], strat_mat)
-
-    return {
-        'states': states,
-        'beliefs': beliefs,
-        'lr_actions': lr_actions,
-        'sr_actions': sr_actions,
-        'lr_payoffs': lr_payoffs,
-    }
-
-
-def main():
-    print("=" * 60)
-    print("SSA6_2: Full Game Simulation")
-    print("=" * 60)
-
-    mc = MarkovChain(alpha=0.3, beta=0.5)
-    game = DeterrenceGame(x=0.3, y=0.4)
-    T = 5000
-    n_runs = 20  # multiple runs for robustness
-
-    print(f"\nParameters: α={mc.alpha}, β={mc.beta}, T={T}, runs={n_runs}")
-    print(f"SR threshold: μ* = {SR_THRESHOLD}")
-    print(f"Stationary π(G) = {mc.pi[0]:.4f}")
+SR_THRESHOLD = sr_threshold(U2)  # mu* = 3/5
 
-    # Run multiple simulations
-    payoff_diffs = []
-    action_disagree_rates = []
 
-    # Single detailed run for plotting
-    rng = np.random.default_rng(42)
-    res_stat = simulate_scenario(mc, game, T, use_filtering=False, rng=np.random.default_rng(42))
-    res_filt = simulate_scenario(mc, game, T, use_filtering=True, rng=np.random.default_rng(42))
-
-    # Same state sequence because same seed
-    assert np.array_equal(res_stat['states'], res_filt['states']), \
-        "State sequences should match for same seed"
-
-    for run in range(n_runs):
-        seed = 1000 + run
-        r_stat = simulate_scenario(mc, game, T, use_filtering=False, rng=np.random.default_rng(seed))
-        r_filt = simulate_scenario(mc, game, T, use_filtering=True, rng=np.random.default_rng(seed))
-
-        avg_payoff_stat = r_stat['lr_payoffs'].mean()
-        avg_payoff_filt = r_filt['lr_payoffs'].mean()
-        payoff_diffs.append(avg_payoff_stat - avg_payoff_filt)
-
-        disagree = np.mean(r_stat['sr_actions'] != r_filt['sr_actions'])
-        action_disagree_rates.append(disagree)
-
-    payoff_diffs = np.array(payoff_diffs)
-    action_disagree_rates = np.array(action_disagree_rates)
-
-    # Summary stats
-    print("\n--- Results across runs ---")
-    print(f"  LR avg payoff (stationary): {res_stat['lr_payoffs'].mean():.4f}")
-    print(f"  LR avg payoff (filtered):   {res_filt['lr_payoffs'].mean():.4f}")
-    print(f"\n  Payoff difference (stat - filt):")
-    print(f"    Mean: {payoff_diffs.mean():.4f}")
-    print(f"    Std:  {payoff_diffs.std():.4f}")
-    print(f"    Min:  {payoff_diffs.min():.4f}")
-    print(f"    Max:  {payoff_diffs.max():.4f}")
-    print(f"\n  SR action disagreement rate:")
-    print(f"    Mean: {action_disagree_rates.mean():.4f}")
-    print(f"    Std:  {action_disagree_rates.std():.4f}")
-
-    # ---- Plot 1: Payoff comparison ----
+def plot_payoff_comparison(res_stat, res_filt, payoff_diffs, action_disagree_rates, T, n_runs):
+    """LR payoffs of the detailed run and the cross-run payoff and disagreement spread."""
+    plt = pyplot()
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
 
     # Cumulative average payoff
@@ -214,10 +80,12 @@ def main():
 
     fig.suptitle('LR Payoff: Stationary vs Filtered Beliefs', fontsize=15, y=1.02)
     fig.tight_layout()
-    save_figure(fig, os.path.join(FIGURES_DIR, 'payoff_comparison.png'))
-    print("\nSaved: figures/payoff_comparison.png")
+    return fig
 
-    # ---- Plot 2: Detailed disagreement analysis ----
+
+def plot_sr_disagreement(res_stat, res_filt, action_disagree_rates, mc, T):
+    """Where the two SR belief models disagree on the action, and how often overall."""
+    plt = pyplot()
     fig, axes = plt.subplots(2, 1, figsize=(12, 8))
 
     # SR actions over time (first 300 periods)
@@ -254,8 +122,59 @@ def main():
     ax.legend(fontsize=10)
 
     fig.tight_layout()
-    save_figure(fig, os.path.join(FIGURES_DIR, 'sr_action_disagreement.png'))
-    print("Saved: figures/sr_action_disagreement.png")
+    return fig
+
+
+def main():
+    print("=" * 60)
+    print("SSA6_2: Full Game Simulation")
+    print("=" * 60)
+
+    figures = FigureQueue()
+
+    mc = MarkovChain(alpha=0.3, beta=0.5)
+    game = DeterrenceGame(x=0.3, y=0.4)
+    T = 5000
+    n_runs = 20  # multiple runs for robustness
+
+    print(f"\nParameters: α={mc.alpha}, β={mc.beta}, T={T}, runs={n_runs}")
+    print(f"SR threshold: μ* = {SR_THRESHOLD}")
+    print(f"Stationary π(G) = {mc.pi[0]:.4f}")
+
+    engine = GameEngine(mc, game, u2=U2)
+
+    # Single detailed run for plotting; both scenarios replay the same states
+    detail_states = simulate_path(mc, T, np.random.default_rng(42))
+    detail = engine.play(detail_states)
+    res_stat, res_filt = detail['stationary'], detail['filtered']
+
+    # All robustness runs advance together as one batch, keeping per-run means
+    run_states = mc.simulate_batch(n_runs, T, rng=np.random.default_rng(1000))
+    run_means = engine.play_means(run_states)
+
+    payoff_diffs = run_means['payoff_stationary'] - run_means['payoff_filtered']
+    action_disagree_rates = run_means['disagreement']
+
+    # Summary stats
+    print("\n--- Results across runs ---")
+    print(f"  LR avg payoff (stationary): {res_stat['lr_payoffs'].mean():.4f}")
+    print(f"  LR avg payoff (filtered):   {res_filt['lr_payoffs'].mean():.4f}")
+    print(f"\n  Payoff difference (stat - filt):")
+    print(f"    Mean: {payoff_diffs.mean():.4f}")
+    print(f"    Std:  {payoff_diffs.std():.4f}")
+    print(f"    Min:  {payoff_diffs.min():.4f}")
+    print(f"    Max:  {payoff_diffs.max():.4f}")
+    print(f"\n  SR action disagreement rate:")
+    print(f"    Mean: {action_disagree_rates.mean():.4f}")
+    print(f"    Std:  {action_disagree_rates.std():.4f}")
+
+    # ---- Plot 1: Payoff comparison ----
+    figures.submit(plot_payoff_comparison, os.path.join(FIGURES_DIR, 'payoff_comparison.png'),
+                   res_stat, res_filt, payoff_diffs, action_disagree_rates, T, n_runs)
+
+    # ---- Plot 2: Detailed disagreement analysis ----
+    figures.submit(plot_sr_disagreement, os.path.join(FIGURES_DIR, 'sr_action_disagreement.png'),
+                   res_stat, res_filt, action_disagree_rates, mc, T)
 
     # ---- Generate report ----
     report_path = os.path.join(os.path.dirname(__file__), 'report.md')
@@ -309,6 +228,9 @@ def main():
         f.write("![SR Action Disagreement](figures/sr_action_disagreement.png)\n")
 
     print(f"\nReport saved to: {report_path}")
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
 
 
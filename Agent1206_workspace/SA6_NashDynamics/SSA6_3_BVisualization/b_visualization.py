@@ -9,78 +9,38 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from matplotlib.patches import FancyArrowPatch
-from shared.markov_utils import (
-    MarkovChain, DeterrenceGame, BayesianFilter,
-    make_strategy_matrix, save_figure
-)
+from shared.markov_utils import MarkovChain, simulate_path, DeterrenceGame
+from shared.figures import FigureQueue, pyplot
+from shared.game_engine import GameEngine, SR_PAYOFFS, sr_threshold
 
 FIGURES_DIR = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(FIGURES_DIR, exist_ok=True)
 
-# SR payoffs
-SR_THRESHOLD = 0.6
+# SR payoffs (same as SSA6_1 / SSA6_2)
+U2 = SR_PAYOFFS
+SR_THRESHOLD = sr_threshold(U2)  # mu* = 3/5
 
 
 def sr_expected_payoff(mu, action_idx):
     """E[u2(C)] = 2mu - 1, E[u2(D)] = 0.5(1-mu)"""
-    if action_idx == 0:
-        return 2 * mu - 1
-    else:
-        return 0.5 * (1 - mu)
+    return mu * U2[0, action_idx] + (1 - mu) * U2[1, action_idx]
 
 
 def sr_best_response_action(mu):
-    """C(0) if mu > 0.6, else D(1)."""
+    """C(0) if mu > mu*, else D(1)."""
     return 0 if mu > SR_THRESHOLD else 1
 
 
 def simulate_beliefs(mc, game, T, rng):
     """Simulate belief trajectory under Stackelberg + Bayesian filtering."""
-    states = mc.simulate(T, rng=rng)
-    strat_mat = make_strategy_matrix(game.stackelberg_strategy)
-    bf = BayesianFilter(mc)
+    states = simulate_path(mc, T, rng)
+    res = GameEngine(mc, game).play(states, scenarios=('filtered',))['filtered']
+    return states, res['beliefs'], res['lr_actions']
 
-    beliefs = np.zeros(T)
-    lr_actions = np.zeros(T, dtype=int)
 
-    for t in range(T):
-        lr_actions[t] = game.stackelberg_strategy(states[t])
-        beliefs[t] = bf.belief[0]
-        if t < T - 1:
-            bf.update(lr_actions[t], strat_mat)
-
-    return states, beliefs, lr_actions
-
-
-def main():
-    print("=" * 60)
-    print("SSA6_3: Nash Correspondence Visualization")
-    print("=" * 60)
-
-    mc = MarkovChain(alpha=0.3, beta=0.5)
-    game = DeterrenceGame(x=0.3, y=0.4)
-    T = 5000
-
-    rng = np.random.default_rng(42)
-    states, beliefs, lr_actions = simulate_beliefs(mc, game, T, rng)
-
-    print(f"Markov chain: α={mc.alpha}, β={mc.beta}")
-    print(f"Stationary π(G) = {mc.pi[0]:.4f}")
-    print(f"SR threshold μ* = {SR_THRESHOLD}")
-    print(f"Simulated T = {T}")
-
-    frac_c = np.mean(beliefs > SR_THRESHOLD)
-    frac_d = np.mean(beliefs <= SR_THRESHOLD)
-    print(f"\nBelief in C region: {frac_c*100:.1f}%")
-    print(f"Belief in D region: {frac_d*100:.1f}%")
-    print(f"Mean belief: {beliefs.mean():.4f}")
-    print(f"Std belief: {beliefs.std():.4f}")
-
-    # ---- Plot 1: Nash correspondence with trajectory overlay ----
+def plot_nash_correspondence(beliefs, mc, T, frac_c, frac_d):
+    """B(s₁, μ) with the belief trajectory, BR over time and beliefs by BR region."""
+    plt = pyplot()
     fig, axes = plt.subplots(3, 1, figsize=(12, 12),
                              gridspec_kw={'height_ratios': [2.5, 1, 1.5]})
 
@@ -156,10 +116,12 @@ def main():
     ax.grid(True, alpha=0.3)
 
     fig.tight_layout()
-    save_figure(fig, os.path.join(FIGURES_DIR, 'nash_correspondence.png'))
-    print("\nSaved: figures/nash_correspondence.png")
+    return fig
 
-    # ---- Plot 2: Snapshot panels at t=10, 100, 500, 2000 ----
+
+def plot_belief_snapshots(beliefs, mc, T):
+    """Belief histograms by BR region up to t = 10, 100, 500 and 2000."""
+    plt = pyplot()
     snapshot_times = [10, 100, 500, 2000]
     fig, axes = plt.subplots(2, 2, figsize=(12, 10))
 
@@ -195,8 +157,42 @@ def main():
     fig.suptitle('Belief Distribution Snapshots (i.i.d.=single point at π vs Markov=spread)',
                  fontsize=13, y=1.02)
     fig.tight_layout()
-    save_figure(fig, os.path.join(FIGURES_DIR, 'belief_histogram_in_BR_regions.png'))
-    print("Saved: figures/belief_histogram_in_BR_regions.png")
+    return fig
+
+
+def main():
+    print("=" * 60)
+    print("SSA6_3: Nash Correspondence Visualization")
+    print("=" * 60)
+
+    figures = FigureQueue()
+
+    mc = MarkovChain(alpha=0.3, beta=0.5)
+    game = DeterrenceGame(x=0.3, y=0.4)
+    T = 5000
+
+    rng = np.random.default_rng(42)
+    states, beliefs, lr_actions = simulate_beliefs(mc, game, T, rng)
+
+    print(f"Markov chain: α={mc.alpha}, β={mc.beta}")
+    print(f"Stationary π(G) = {mc.pi[0]:.4f}")
+    print(f"SR threshold μ* = {SR_THRESHOLD}")
+    print(f"Simulated T = {T}")
+
+    frac_c = np.mean(beliefs > SR_THRESHOLD)
+    frac_d = np.mean(beliefs <= SR_THRESHOLD)
+    print(f"\nBelief in C region: {frac_c*100:.1f}%")
+    print(f"Belief in D region: {frac_d*100:.1f}%")
+    print(f"Mean belief: {beliefs.mean():.4f}")
+    print(f"Std belief: {beliefs.std():.4f}")
+
+    # ---- Plot 1: Nash correspondence with trajectory overlay ----
+    figures.submit(plot_nash_correspondence, os.path.join(FIGURES_DIR, 'nash_correspondence.png'),
+                   beliefs, mc, T, frac_c, frac_d)
+
+    # ---- Plot 2: Snapshot panels at t=10, 100, 500, 2000 ----
+    figures.submit(plot_belief_snapshots, os.path.join(FIGURES_DIR, 'belief_histogram_in_BR_regions.png'),
+                   beliefs, mc, T)
 
     # ---- i.i.d. vs Markov comparison ----
     print("\n--- i.i.d. vs Markov Comparison ---")
@@ -260,6 +256,9 @@ def main():
         f.write("![Belief Histogram in BR Regions](figures/belief_histogram_in_BR_regions.png)\n")
 
     print(f"\nReport saved to: {report_path}")
+
+    for path in figures.render():
+        print(f"Saved: {path}")
     print("\nDone.")
 
 
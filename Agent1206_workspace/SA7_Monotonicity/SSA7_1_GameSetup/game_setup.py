@@ -12,10 +12,9 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from shared.markov_utils import save_figure
+from shared.markov_utils import MarkovChain
+from shared.figures import FigureQueue, pyplot
+from shared.supermodularity import check_increasing_differences
 
 # ---------------------------------------------------------------------------
 # 1. Define the 3-state game: Theta = {L, M, H} = {0, 1, 2}
@@ -45,26 +44,6 @@ for th in range(N_STATES):
 # ---------------------------------------------------------------------------
 # 2. Verify supermodularity of the base game
 # ---------------------------------------------------------------------------
-def check_increasing_differences(payoff_matrix):
-    """
-    Check increasing differences: for all theta' > theta, a' > a:
-      payoff(theta', a') - payoff(theta', a) >= payoff(theta, a') - payoff(theta, a)
-    Returns (is_supermodular, violations_list).
-    """
-    n_s, n_a = payoff_matrix.shape
-    violations = []
-    for th in range(n_s):
-        for th_prime in range(th + 1, n_s):
-            for a in range(n_a):
-                for a_prime in range(a + 1, n_a):
-                    diff_high = payoff_matrix[th_prime, a_prime] - payoff_matrix[th_prime, a]
-                    diff_low = payoff_matrix[th, a_prime] - payoff_matrix[th, a]
-                    if diff_high < diff_low - 1e-12:
-                        violations.append((th, th_prime, a, a_prime,
-                                           diff_high - diff_low))
-    return len(violations) == 0, violations
-
-
 base_supermod, base_violations = check_increasing_differences(U1)
 
 # ---------------------------------------------------------------------------
@@ -79,26 +58,20 @@ T = np.array([
     [0.1, 0.3, ALPHA_STAY],       # From H
 ])
 
-# Stationary distribution (left eigenvector for eigenvalue 1)
-eigenvalues, eigenvectors = np.linalg.eig(T.T)
-idx = np.argmin(np.abs(eigenvalues - 1.0))
-pi_raw = eigenvectors[:, idx].real
-pi = pi_raw / pi_raw.sum()
+mc = MarkovChain(T=T, states=STATE_NAMES)
+pi = mc.pi
 
 # ---------------------------------------------------------------------------
 # 4. Lifted state space: Theta_tilde = Theta x Theta  (9 states)
 # ---------------------------------------------------------------------------
 # Lifted state (theta_t, theta_{t-1}) indexed as theta_t * 3 + theta_{t-1}
-LIFTED_STATES = [(th_t, th_prev) for th_t in range(N_STATES) for th_prev in range(N_STATES)]
-N_LIFTED = len(LIFTED_STATES)
+LIFTED_STATES = mc.lifted_states
+N_LIFTED = mc.n_lifted
 LIFTED_NAMES = [f"({STATE_NAMES[s[0]]},{STATE_NAMES[s[1]]})" for s in LIFTED_STATES]
 
 # Lifted stationary distribution:
 # rho_tilde(theta_t, theta_{t-1}) = pi(theta_{t-1}) * T[theta_{t-1}, theta_t]
-rho_tilde = np.zeros(N_LIFTED)
-for idx_l, (th_t, th_prev) in enumerate(LIFTED_STATES):
-    rho_tilde[idx_l] = pi[th_prev] * T[th_prev, th_t]
-rho_tilde /= rho_tilde.sum()  # Normalize for numerical safety
+rho_tilde = mc.rho_tilde
 
 # ---------------------------------------------------------------------------
 # 5. Payoff on lifted state space (depends only on theta_t)
@@ -186,95 +159,107 @@ for i, name in enumerate(LIFTED_NAMES):
     print(f"  {name}: {U1_transition[i]}")
 
 # ---------------------------------------------------------------------------
-# 9. Figures
+# 9. Figures (queued here, rendered after the report)
 # ---------------------------------------------------------------------------
 fig_dir = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(fig_dir, exist_ok=True)
 
-# Figure 1: Base payoff heatmap
-fig, axes = plt.subplots(1, 3, figsize=(16, 5))
-
-# Base payoff
-im0 = axes[0].imshow(U1, cmap='YlOrRd', aspect='auto')
-axes[0].set_xticks(range(N_ACTIONS))
-axes[0].set_xticklabels(ACTION_NAMES)
-axes[0].set_yticks(range(N_STATES))
-axes[0].set_yticklabels(STATE_NAMES)
-axes[0].set_xlabel('Action')
-axes[0].set_ylabel('State')
-axes[0].set_title('Base Payoff u1(θ, a)')
-for i in range(N_STATES):
-    for j in range(N_ACTIONS):
-        axes[0].text(j, i, f'{U1[i, j]:.1f}', ha='center', va='center', fontsize=12)
-plt.colorbar(im0, ax=axes[0])
-
-# Lifted payoff (theta_t only)
-im1 = axes[1].imshow(U1_lifted, cmap='YlOrRd', aspect='auto')
-axes[1].set_xticks(range(N_ACTIONS))
-axes[1].set_xticklabels(ACTION_NAMES)
-axes[1].set_yticks(range(N_LIFTED))
-axes[1].set_yticklabels(LIFTED_NAMES, fontsize=7)
-axes[1].set_xlabel('Action')
-axes[1].set_ylabel('Lifted State (θ_t, θ_{t-1})')
-axes[1].set_title('Lifted Payoff (θ_t only)')
-plt.colorbar(im1, ax=axes[1])
-
-# Transition-dependent payoff
-im2 = axes[2].imshow(U1_transition, cmap='RdBu_r', aspect='auto')
-axes[2].set_xticks(range(N_ACTIONS))
-axes[2].set_xticklabels(ACTION_NAMES)
-axes[2].set_yticks(range(N_LIFTED))
-axes[2].set_yticklabels(LIFTED_NAMES, fontsize=7)
-axes[2].set_xlabel('Action')
-axes[2].set_ylabel('Lifted State (θ_t, θ_{t-1})')
-axes[2].set_title('Transition-Dependent Payoff')
-plt.colorbar(im2, ax=axes[2])
-
-plt.tight_layout()
-path1 = os.path.join(fig_dir, 'payoff_matrices.png')
-save_figure(fig, path1)
-print(f"\nSaved: {path1}")
-
-# Figure 2: Stationary distributions
-fig2, axes2 = plt.subplots(1, 2, figsize=(14, 5))
-
-axes2[0].bar(STATE_NAMES, pi, color='steelblue', edgecolor='black')
-axes2[0].set_title('Stationary Distribution π (Base Chain)')
-axes2[0].set_ylabel('Probability')
-for i, v in enumerate(pi):
-    axes2[0].text(i, v + 0.01, f'{v:.4f}', ha='center', fontsize=9)
-
-axes2[1].bar(range(N_LIFTED), rho_tilde, color='coral', edgecolor='black')
-axes2[1].set_xticks(range(N_LIFTED))
-axes2[1].set_xticklabels(LIFTED_NAMES, rotation=45, ha='right', fontsize=8)
-axes2[1].set_title('Lifted Stationary Distribution ρ̃')
-axes2[1].set_ylabel('Probability')
-for i, v in enumerate(rho_tilde):
-    axes2[1].text(i, v + 0.005, f'{v:.4f}', ha='center', fontsize=7)
-
-plt.tight_layout()
-path2 = os.path.join(fig_dir, 'stationary_distributions.png')
-save_figure(fig2, path2)
-print(f"Saved: {path2}")
-
-# Figure 3: Transition matrix heatmap
-fig3, ax3 = plt.subplots(figsize=(6, 5))
-im3 = ax3.imshow(T, cmap='Blues', vmin=0, vmax=1)
-ax3.set_xticks(range(N_STATES))
-ax3.set_xticklabels(STATE_NAMES)
-ax3.set_yticks(range(N_STATES))
-ax3.set_yticklabels(STATE_NAMES)
-ax3.set_xlabel('To State')
-ax3.set_ylabel('From State')
-ax3.set_title('Transition Matrix T')
-for i in range(N_STATES):
-    for j in range(N_STATES):
-        ax3.text(j, i, f'{T[i, j]:.2f}', ha='center', va='center', fontsize=12)
-plt.colorbar(im3, ax=ax3)
-plt.tight_layout()
-path3 = os.path.join(fig_dir, 'transition_matrix.png')
-save_figure(fig3, path3)
-print(f"Saved: {path3}")
+figures = FigureQueue()
+
+
+def plot_payoff_matrices(U1, U1_lifted, U1_transition):
+    """Figure 1: Base, lifted and transition-dependent payoff heatmaps."""
+    plt = pyplot()
+    fig, axes = plt.subplots(1, 3, figsize=(16, 5))
+
+    # Base payoff
+    im0 = axes[0].imshow(U1, cmap='YlOrRd', aspect='auto')
+    axes[0].set_xticks(range(N_ACTIONS))
+    axes[0].set_xticklabels(ACTION_NAMES)
+    axes[0].set_yticks(range(N_STATES))
+    axes[0].set_yticklabels(STATE_NAMES)
+    axes[0].set_xlabel('Action')
+    axes[0].set_ylabel('State')
+    axes[0].set_title('Base Payoff u1(θ, a)')
+    for i in range(N_STATES):
+        for j in range(N_ACTIONS):
+            axes[0].text(j, i, f'{U1[i, j]:.1f}', ha='center', va='center', fontsize=12)
+    plt.colorbar(im0, ax=axes[0])
+
+    # Lifted payoff (theta_t only)
+    im1 = axes[1].imshow(U1_lifted, cmap='YlOrRd', aspect='auto')
+    axes[1].set_xticks(range(N_ACTIONS))
+    axes[1].set_xticklabels(ACTION_NAMES)
+    axes[1].set_yticks(range(N_LIFTED))
+    axes[1].set_yticklabels(LIFTED_NAMES, fontsize=7)
+    axes[1].set_xlabel('Action')
+    axes[1].set_ylabel('Lifted State (θ_t, θ_{t-1})')
+    axes[1].set_title('Lifted Payoff (θ_t only)')
+    plt.colorbar(im1, ax=axes[1])
+
+    # Transition-dependent payoff
+    im2 = axes[2].imshow(U1_transition, cmap='RdBu_r', aspect='auto')
+    axes[2].set_xticks(range(N_ACTIONS))
+    axes[2].set_xticklabels(ACTION_NAMES)
+    axes[2].set_yticks(range(N_LIFTED))
+    axes[2].set_yticklabels(LIFTED_NAMES, fontsize=7)
+    axes[2].set_xlabel('Action')
+    axes[2].set_ylabel('Lifted State (θ_t, θ_{t-1})')
+    axes[2].set_title('Transition-Dependent Payoff')
+    plt.colorbar(im2, ax=axes[2])
+
+    plt.tight_layout()
+    return fig
+
+
+def plot_stationary_distributions(pi, rho_tilde):
+    """Figure 2: Stationary distributions of the base and lifted chains."""
+    plt = pyplot()
+    fig2, axes2 = plt.subplots(1, 2, figsize=(14, 5))
+
+    axes2[0].bar(STATE_NAMES, pi, color='steelblue', edgecolor='black')
+    axes2[0].set_title('Stationary Distribution π (Base Chain)')
+    axes2[0].set_ylabel('Probability')
+    for i, v in enumerate(pi):
+        axes2[0].text(i, v + 0.01, f'{v:.4f}', ha='center', fontsize=9)
+
+    axes2[1].bar(range(N_LIFTED), rho_tilde, color='coral', edgecolor='black')
+    axes2[1].set_xticks(range(N_LIFTED))
+    axes2[1].set_xticklabels(LIFTED_NAMES, rotation=45, ha='right', fontsize=8)
+    axes2[1].set_title('Lifted Stationary Distribution ρ̃')
+    axes2[1].set_ylabel('Probability')
+    for i, v in enumerate(rho_tilde):
+        axes2[1].text(i, v + 0.005, f'{v:.4f}', ha='center', fontsize=7)
+
+    plt.tight_layout()
+    return fig2
+
+
+def plot_transition_matrix(T):
+    """Figure 3: Transition matrix heatmap."""
+    plt = pyplot()
+    fig3, ax3 = plt.subplots(figsize=(6, 5))
+    im3 = ax3.imshow(T, cmap='Blues', vmin=0, vmax=1)
+    ax3.set_xticks(range(N_STATES))
+    ax3.set_xticklabels(STATE_NAMES)
+    ax3.set_yticks(range(N_STATES))
+    ax3.set_yticklabels(STATE_NAMES)
+    ax3.set_xlabel('To State')
+    ax3.set_ylabel('From State')
+    ax3.set_title('Transition Matrix T')
+    for i in range(N_STATES):
+        for j in range(N_STATES):
+            ax3.text(j, i, f'{T[i, j]:.2f}', ha='center', va='center', fontsize=12)
+    plt.colorbar(im3, ax=ax3)
+    plt.tight_layout()
+    return fig3
+
+
+figures.submit(plot_payoff_matrices, os.path.join(fig_dir, 'payoff_matrices.png'),
+               U1, U1_lifted, U1_transition)
+figures.submit(plot_stationary_distributions, os.path.join(fig_dir, 'stationary_distributions.png'),
+               pi, rho_tilde)
+figures.submit(plot_transition_matrix, os.path.join(fig_dir, 'transition_matrix.png'), T)
 
 # ---------------------------------------------------------------------------
 # 10. Generate report.md
@@ -335,4 +320,7 @@ report_path = os.path.join(os.path.dirname(__file__), 'report.md')
 with open(report_path, 'w') as f:
     f.write('\n'.join(report_lines))
 print(f"\nReport saved: {report_path}")
+
+for path in figures.render():
+    print(f"Saved: {path}")
 print("\n[SSA7_1 COMPLETE]")
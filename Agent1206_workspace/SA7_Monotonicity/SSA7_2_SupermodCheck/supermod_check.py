@@ -10,6 +10,11 @@ Tests:
 2. First-coordinate order (by theta_t, ties broken by theta_{t-1})
 3. Reverse-lex order (by theta_{t-1}, then theta_t)
 4. Sampled random orders (10,000 of 9! = 362,880 possible)
+5. Exact count over all 9! orders, and all 16! orders of the 4-state
+   lifted space, as linear extensions of the pairwise precedence relation
+
+Figures are rendered after the report (shared/figures.py); pass
+--no-figures to skip them.
 """
 
 import os
@@ -17,10 +22,8 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from shared.markov_utils import save_figure
+from shared.figures import FigureQueue, pyplot
+from shared.supermodularity import count_supermodular_orders, count_violations
 
 np.random.seed(42)
 
@@ -53,10 +56,11 @@ def payoff_strong_history(th_t, th_prev, a):
 
 
 # Build payoff matrices for all variants
-def build_lifted_payoff(payoff_fn):
-    """Build N_LIFTED x N_ACTIONS payoff matrix."""
-    U = np.zeros((N_LIFTED, N_ACTIONS))
-    for idx, (th_t, th_prev) in enumerate(LIFTED_STATES):
+def build_lifted_payoff(payoff_fn, n_states=N_STATES):
+    """Build (n_states^2) x N_ACTIONS payoff matrix over lifted states."""
+    lifted = [(th_t, th_prev) for th_t in range(n_states) for th_prev in range(n_states)]
+    U = np.zeros((len(lifted), N_ACTIONS))
+    for idx, (th_t, th_prev) in enumerate(lifted):
         for a in range(N_ACTIONS):
             U[idx, a] = payoff_fn(th_t, th_prev, a)
     return U
@@ -74,29 +78,13 @@ PAYOFF_VARIANTS = {
 def check_supermod_under_order(payoff_matrix, order):
     """
     Check increasing differences of payoff_matrix[state, action] where
-    states are ordered according to `order` (a permutation of indices)
-    and actions are ordered 0 < 1 < 2.
-
-    For all i < j in the order and a < a':
-      payoff[order[j], a'] - payoff[order[j], a] >= payoff[order[i], a'] - payoff[order[i], a]
+    states are ordered according to `order` (a permutation of indices, or
+    an (n_orders, n_states) batch of them) and actions are ordered 0 < 1 < 2.
 
-    Returns (is_supermod, n_violations).
+    Returns (is_supermod, n_violations), elementwise for a batch.
     """
-    n = len(order)
-    n_a = payoff_matrix.shape[1]
-    violations = 0
-
-    for i_idx in range(n):
-        for j_idx in range(i_idx + 1, n):
-            s_low = order[i_idx]
-            s_high = order[j_idx]
-            for a in range(n_a):
-                for a_prime in range(a + 1, n_a):
-                    diff_high = payoff_matrix[s_high, a_prime] - payoff_matrix[s_high, a]
-                    diff_low = payoff_matrix[s_low, a_prime] - payoff_matrix[s_low, a]
-                    if diff_high < diff_low - 1e-12:
-                        violations += 1
-    return violations == 0, violations
+    n_violations = count_violations(payoff_matrix, order)
+    return n_violations == 0, n_violations
 
 
 # ---------------------------------------------------------------------------
@@ -142,16 +130,13 @@ for order_name, order in CANONICAL_ORDERS.items():
 # 5. Sample random orders and check supermodularity
 # ---------------------------------------------------------------------------
 N_SAMPLES = 10000
-base_perm = list(range(N_LIFTED))
-random_results = {name: 0 for name in PAYOFF_VARIANTS}
+random_perms = np.array([np.random.permutation(N_LIFTED) for _ in range(N_SAMPLES)])
+random_results = {}
 
 print(f"\n--- Sampling {N_SAMPLES} random orders ---")
-for _ in range(N_SAMPLES):
-    perm = np.random.permutation(N_LIFTED).tolist()
-    for payoff_name, payoff_mat in PAYOFF_VARIANTS.items():
-        is_sm, _ = check_supermod_under_order(payoff_mat, perm)
-        if is_sm:
-            random_results[payoff_name] += 1
+for payoff_name, payoff_mat in PAYOFF_VARIANTS.items():
+    is_sm, _ = check_supermod_under_order(payoff_mat, random_perms)
+    random_results[payoff_name] = int(is_sm.sum())
 
 print("\nFraction of random orders where supermodularity holds:")
 fractions = {}
@@ -161,34 +146,19 @@ for payoff_name, count in random_results.items():
     print(f"  {payoff_name}: {count}/{N_SAMPLES} = {frac:.4f}")
 
 # ---------------------------------------------------------------------------
-# 6. Exhaustive enumeration for the theta_t-only payoff
+# 6. Exhaustive enumeration
 # ---------------------------------------------------------------------------
-# Since payoffs depend only on theta_t, any order that preserves
-# the theta_t ranking should work. Let's count exactly.
-# Group states by theta_t: groups of 3 (for each theta_t value).
-# Within each group, any permutation is fine, but between groups
-# the theta_t order must be preserved.
-
-from itertools import permutations
-
-# For tractability, enumerate all 9! = 362880 permutations
+# An order is supermodular iff every pair (i below j) may be ranked that way,
+# so valid orders are the linear extensions of the pairwise precedence
+# relation and can be counted exactly with a bitmask DP over subsets
+# instead of iterating all 9! = 362,880 permutations.
 print("\n--- Exhaustive enumeration (9! = 362,880 orders) ---")
-print("(This may take a moment...)")
-
-exhaustive_counts = {name: 0 for name in PAYOFF_VARIANTS}
-total_perms = 0
 
-# Use a more efficient approach: iterate permutations
-# For 9! this is feasible (362880 permutations)
-for perm in permutations(range(N_LIFTED)):
-    total_perms += 1
-    perm_list = list(perm)
-    for payoff_name, payoff_mat in PAYOFF_VARIANTS.items():
-        is_sm, _ = check_supermod_under_order(payoff_mat, perm_list)
-        if is_sm:
-            exhaustive_counts[payoff_name] += 1
+exhaustive_counts = {}
+for payoff_name, payoff_mat in PAYOFF_VARIANTS.items():
+    exhaustive_counts[payoff_name], total_perms = count_supermodular_orders(payoff_mat)
 
-print(f"\nTotal permutations checked: {total_perms}")
+print(f"\nTotal permutations counted: {total_perms}")
 print("\nExact fractions where supermodularity holds:")
 exact_fractions = {}
 for payoff_name, count in exhaustive_counts.items():
@@ -196,68 +166,91 @@ for payoff_name, count in exhaustive_counts.items():
     exact_fractions[payoff_name] = frac
     print(f"  {payoff_name}: {count}/{total_perms} = {frac:.6f}")
 
+# Same count for the 4-state lifted space (16 states, 16! orders)
+N_STATES_4 = 4
+print(f"\n--- Exhaustive count, {N_STATES_4}-state lifted space "
+      f"({N_STATES_4 ** 2}! orders) ---")
+lifted4_counts = {}
+for payoff_name, payoff_fn in [('theta_t_only', payoff_theta_t_only),
+                               ('transition_dep', payoff_transition_dependent),
+                               ('strong_history', payoff_strong_history)]:
+    count, total4 = count_supermodular_orders(build_lifted_payoff(payoff_fn, N_STATES_4))
+    lifted4_counts[payoff_name] = count
+    print(f"  {payoff_name}: {count:,}/{total4:,} = {count / total4:.3e}")
+
 # ---------------------------------------------------------------------------
-# 7. Figures
+# 7. Figures (queued here, rendered after the report)
 # ---------------------------------------------------------------------------
 fig_dir = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(fig_dir, exist_ok=True)
 
-# Figure 1: Fraction of valid orders per payoff type (exhaustive)
-fig, ax = plt.subplots(figsize=(9, 6))
-payoff_names = list(exact_fractions.keys())
-payoff_labels = ['θ_t only', 'Transition\ndependent', 'Strong\nhistory']
-frac_values = [exact_fractions[n] for n in payoff_names]
-count_values = [exhaustive_counts[n] for n in payoff_names]
-
-bars = ax.bar(payoff_labels, frac_values, color=['#2196F3', '#FF9800', '#4CAF50'],
-              edgecolor='black', linewidth=1.2)
-ax.set_ylabel('Fraction of Orders with Supermodularity', fontsize=12)
-ax.set_title('Supermodularity Under Random Total Orders on Lifted Space\n'
-             f'(Exhaustive: all {total_perms:,} permutations)', fontsize=13)
-ax.set_ylim(0, max(frac_values) * 1.3 if max(frac_values) > 0 else 1.0)
-
-for bar, frac, cnt in zip(bars, frac_values, count_values):
-    ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.005,
-            f'{frac:.4f}\n({cnt:,}/{total_perms:,})',
-            ha='center', va='bottom', fontsize=10, fontweight='bold')
-
-ax.axhline(y=1.0 / total_perms * 6, color='gray', linestyle='--', alpha=0.5)
-plt.tight_layout()
-path1 = os.path.join(fig_dir, 'supermod_fraction_by_payoff.png')
-save_figure(fig, path1)
-print(f"\nSaved: {path1}")
-
-# Figure 2: Canonical order results as a table-like heatmap
-fig2, ax2 = plt.subplots(figsize=(9, 5))
+figures = FigureQueue()
+
+
+def plot_fraction_by_payoff(exact_fractions, exhaustive_counts, total_perms):
+    """Figure 1: Fraction of valid orders per payoff type (exhaustive)."""
+    plt = pyplot()
+    fig, ax = plt.subplots(figsize=(9, 6))
+    payoff_names = list(exact_fractions.keys())
+    payoff_labels = ['θ_t only', 'Transition\ndependent', 'Strong\nhistory']
+    frac_values = [exact_fractions[n] for n in payoff_names]
+    count_values = [exhaustive_counts[n] for n in payoff_names]
+
+    bars = ax.bar(payoff_labels, frac_values, color=['#2196F3', '#FF9800', '#4CAF50'],
+                  edgecolor='black', linewidth=1.2)
+    ax.set_ylabel('Fraction of Orders with Supermodularity', fontsize=12)
+    ax.set_title('Supermodularity Under Random Total Orders on Lifted Space\n'
+                 f'(Exhaustive: all {total_perms:,} permutations)', fontsize=13)
+    ax.set_ylim(0, max(frac_values) * 1.3 if max(frac_values) > 0 else 1.0)
+
+    for bar, frac, cnt in zip(bars, frac_values, count_values):
+        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.005,
+                f'{frac:.4f}\n({cnt:,}/{total_perms:,})',
+                ha='center', va='bottom', fontsize=10, fontweight='bold')
+
+    ax.axhline(y=1.0 / total_perms * 6, color='gray', linestyle='--', alpha=0.5)
+    plt.tight_layout()
+    return fig
+
+
+def plot_canonical_results(canonical_results, order_names, payoff_names_list):
+    """Figure 2: Canonical order results as a table-like heatmap."""
+    plt = pyplot()
+    fig2, ax2 = plt.subplots(figsize=(9, 5))
+
+    result_matrix = np.zeros((len(order_names), len(payoff_names_list)))
+    for i, oname in enumerate(order_names):
+        for j, pname in enumerate(payoff_names_list):
+            is_sm, _ = canonical_results[(oname, pname)]
+            result_matrix[i, j] = 1.0 if is_sm else 0.0
+
+    im = ax2.imshow(result_matrix, cmap='RdYlGn', vmin=0, vmax=1, aspect='auto')
+    ax2.set_xticks(range(len(payoff_names_list)))
+    ax2.set_xticklabels(['θ_t only', 'Transition dep.', 'Strong history'], fontsize=10)
+    ax2.set_yticks(range(len(order_names)))
+    ax2.set_yticklabels(order_names, fontsize=10)
+    ax2.set_title('Supermodularity Under Canonical Orders', fontsize=13)
+
+    for i in range(len(order_names)):
+        for j in range(len(payoff_names_list)):
+            is_sm, n_viol = canonical_results[(order_names[i], payoff_names_list[j])]
+            txt = "✓" if is_sm else f"✗ ({n_viol})"
+            color = 'white' if not is_sm else 'black'
+            ax2.text(j, i, txt, ha='center', va='center', fontsize=12,
+                     fontweight='bold', color=color)
+
+    plt.colorbar(im, ax=ax2, label='Supermodular (1=Yes, 0=No)')
+    plt.tight_layout()
+    return fig2
+
+
 order_names = list(CANONICAL_ORDERS.keys())
 payoff_names_list = list(PAYOFF_VARIANTS.keys())
 
-result_matrix = np.zeros((len(order_names), len(payoff_names_list)))
-for i, oname in enumerate(order_names):
-    for j, pname in enumerate(payoff_names_list):
-        is_sm, _ = canonical_results[(oname, pname)]
-        result_matrix[i, j] = 1.0 if is_sm else 0.0
-
-im = ax2.imshow(result_matrix, cmap='RdYlGn', vmin=0, vmax=1, aspect='auto')
-ax2.set_xticks(range(len(payoff_names_list)))
-ax2.set_xticklabels(['θ_t only', 'Transition dep.', 'Strong history'], fontsize=10)
-ax2.set_yticks(range(len(order_names)))
-ax2.set_yticklabels(order_names, fontsize=10)
-ax2.set_title('Supermodularity Under Canonical Orders', fontsize=13)
-
-for i in range(len(order_names)):
-    for j in range(len(payoff_names_list)):
-        is_sm, n_viol = canonical_results[(order_names[i], payoff_names_list[j])]
-        txt = "✓" if is_sm else f"✗ ({n_viol})"
-        color = 'white' if not is_sm else 'black'
-        ax2.text(j, i, txt, ha='center', va='center', fontsize=12,
-                 fontweight='bold', color=color)
-
-plt.colorbar(im, ax=ax2, label='Supermodular (1=Yes, 0=No)')
-plt.tight_layout()
-path2 = os.path.join(fig_dir, 'canonical_order_results.png')
-save_figure(fig2, path2)
-print(f"Saved: {path2}")
+figures.submit(plot_fraction_by_payoff, os.path.join(fig_dir, 'supermod_fraction_by_payoff.png'),
+               exact_fractions, exhaustive_counts, total_perms)
+figures.submit(plot_canonical_results, os.path.join(fig_dir, 'canonical_order_results.png'),
+               canonical_results, order_names, payoff_names_list)
 
 # ---------------------------------------------------------------------------
 # 8. Generate report.md
@@ -304,6 +297,23 @@ for pname in payoff_names_list:
              'strong_history': 'Strong history'}[pname]
     report_lines.append(f"| {label} | {cnt:,} | {frac:.6f} |")
 
+report_lines.extend([
+    "",
+    f"## Exhaustive Count, {N_STATES_4}-State Lifted Space (All {total4:,} Orders)",
+    "",
+    "Valid orders are counted exactly as linear extensions of the pairwise",
+    "increasing-differences precedence relation (bitmask DP over subsets).",
+    "",
+    "| Payoff Type | Valid Orders | Fraction |",
+    "|-------------|-------------|----------|",
+])
+
+for pname in payoff_names_list:
+    cnt = lifted4_counts[pname]
+    label = {'theta_t_only': 'θ_t only', 'transition_dep': 'Transition dep.',
+             'strong_history': 'Strong history'}[pname]
+    report_lines.append(f"| {label} | {cnt:,} | {cnt / total4:.3e} |")
+
 report_lines.extend([
     "",
     "## Figures",
@@ -334,4 +344,7 @@ report_path = os.path.join(os.path.dirname(__file__), 'report.md')
 with open(report_path, 'w') as f:
     f.write('\n'.join(report_lines))
 print(f"\nReport saved: {report_path}")
+
+for path in figures.render():
+    print(f"Saved: {path}")
 print("\n[SSA7_2 COMPLETE]")
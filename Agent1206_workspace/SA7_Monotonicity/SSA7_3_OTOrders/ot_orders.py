@@ -19,11 +19,10 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 import numpy as np
-from scipy.optimize import linprog
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from shared.markov_utils import save_figure
+from shared.markov_utils import MarkovChain
+from shared.figures import FigureQueue, pyplot
+from shared.ot import solve_ot as solve_ot_shared
+from shared.supermodularity import count_violations
 
 np.random.seed(42)
 
@@ -35,10 +34,6 @@ N_ACTIONS = 3
 STATE_NAMES = ['L', 'M', 'H']
 ACTION_NAMES = ['l', 'm', 'h']
 
-LIFTED_STATES = [(th_t, th_prev) for th_t in range(N_STATES) for th_prev in range(N_STATES)]
-N_LIFTED = len(LIFTED_STATES)
-LIFTED_NAMES = [f"({STATE_NAMES[s[0]]},{STATE_NAMES[s[1]]})" for s in LIFTED_STATES]
-
 # Markov chain
 ALPHA_STAY = 0.6
 T_mat = np.array([
@@ -46,16 +41,13 @@ T_mat = np.array([
     [0.2, ALPHA_STAY, 0.2],
     [0.1, 0.3, ALPHA_STAY],
 ])
+mc = MarkovChain(T=T_mat, states=STATE_NAMES)
+pi = mc.pi
+rho_tilde = mc.rho_tilde
 
-eigenvalues, eigenvectors = np.linalg.eig(T_mat.T)
-idx = np.argmin(np.abs(eigenvalues - 1.0))
-pi_raw = eigenvectors[:, idx].real
-pi = pi_raw / pi_raw.sum()
-
-rho_tilde = np.zeros(N_LIFTED)
-for i, (th_t, th_prev) in enumerate(LIFTED_STATES):
-    rho_tilde[i] = pi[th_prev] * T_mat[th_prev, th_t]
-rho_tilde /= rho_tilde.sum()
+LIFTED_STATES = mc.lifted_states
+N_LIFTED = mc.n_lifted
+LIFTED_NAMES = [f"({STATE_NAMES[s[0]]},{STATE_NAMES[s[1]]})" for s in LIFTED_STATES]
 
 # Payoff variants
 def payoff_theta_t_only(th_t, th_prev, a):
@@ -79,20 +71,8 @@ U1_transition = build_lifted_payoff(payoff_transition_dep)
 # 2. Supermodularity checker
 # ---------------------------------------------------------------------------
 def check_supermod_under_order(payoff_matrix, order):
-    n = len(order)
-    n_a = payoff_matrix.shape[1]
-    violations = 0
-    for i_idx in range(n):
-        for j_idx in range(i_idx + 1, n):
-            s_low = order[i_idx]
-            s_high = order[j_idx]
-            for a in range(n_a):
-                for a_prime in range(a + 1, n_a):
-                    diff_high = payoff_matrix[s_high, a_prime] - payoff_matrix[s_high, a]
-                    diff_low = payoff_matrix[s_low, a_prime] - payoff_matrix[s_low, a]
-                    if diff_high < diff_low - 1e-12:
-                        violations += 1
-    return violations == 0, violations
+    n_violations = count_violations(payoff_matrix, order)
+    return n_violations == 0, n_violations
 
 
 # ---------------------------------------------------------------------------
@@ -106,32 +86,7 @@ def solve_ot(mu, nu, cost_matrix):
 
     Returns (gamma, optimal_cost).
     """
-    m, n = cost_matrix.shape
-    c = cost_matrix.flatten()
-
-    # Row sum constraints: sum_j gamma[i,j] = mu[i]
-    A_row = np.zeros((m, m * n))
-    for i in range(m):
-        for j in range(n):
-            A_row[i, i * n + j] = 1.0
-
-    # Column sum constraints: sum_i gamma[i,j] = nu[j]
-    A_col = np.zeros((n, m * n))
-    for j in range(n):
-        for i in range(m):
-            A_col[j, i * n + j] = 1.0
-
-    A_eq = np.vstack([A_row, A_col])
-    b_eq = np.concatenate([mu, nu])
-
-    result = linprog(c, A_eq=A_eq, b_eq=b_eq, bounds=[(0, None)] * (m * n),
-                     method='highs')
-
-    if result.success:
-        gamma = result.x.reshape(m, n)
-        return gamma, result.fun
-    else:
-        return None, None
+    return solve_ot_shared(mu, nu, cost_matrix)
 
 
 def comonotone_coupling(mu, nu):
@@ -307,9 +262,10 @@ random_ot_results = {
 
 payoff_mat = U1_theta_only  # Use theta_t-only payoff for this analysis
 
-for _ in range(N_SAMPLE):
-    perm = np.random.permutation(N_LIFTED).tolist()
-    is_sm, _ = check_supermod_under_order(payoff_mat, perm)
+random_perms = np.array([np.random.permutation(N_LIFTED) for _ in range(N_SAMPLE)])
+random_is_sm, _ = check_supermod_under_order(payoff_mat, random_perms)
+
+for perm, is_sm in zip(random_perms.tolist(), random_is_sm):
 
     mu_ordered = rho_tilde[perm]
     cost_ordered = -payoff_mat[perm, :]
@@ -385,96 +341,102 @@ if gamma_ot_fc is not None:
         print("\n>>> UNEXPECTED: Co-monotone coupling does NOT match OT.")
 
 # ---------------------------------------------------------------------------
-# 8. Figures
+# 8. Figures (queued here, rendered after the report)
 # ---------------------------------------------------------------------------
 fig_dir = os.path.join(os.path.dirname(__file__), 'figures')
 os.makedirs(fig_dir, exist_ok=True)
 
-# Figure 1: OT solutions comparison
-fig, axes = plt.subplots(2, 3, figsize=(16, 10))
+figures = FigureQueue()
+
+
+def plot_ot_solutions(rho_tilde, nu_stack, U1_theta_only):
+    """Figure 1: OT solutions vs co-monotone couplings for each canonical order."""
+    plt = pyplot()
+    fig, axes = plt.subplots(2, 3, figsize=(16, 10))
+
+    for col_idx, (order_name, order) in enumerate(ORDERS.items()):
+        mu_ord = rho_tilde[order]
+        cost_ord = -U1_theta_only[order, :]
+
+        gamma_ot_plot, _ = solve_ot(mu_ord, nu_stack, cost_ord)
+        gamma_como_plot = comonotone_coupling(mu_ord, nu_stack)
+
+        if gamma_ot_plot is not None:
+            # OT solution
+            im1 = axes[0, col_idx].imshow(gamma_ot_plot, cmap='Blues', aspect='auto')
+            axes[0, col_idx].set_title(f'OT Solution\n({order_name})', fontsize=10)
+            axes[0, col_idx].set_ylabel('State (ordered)')
+            axes[0, col_idx].set_xlabel('Action')
+            axes[0, col_idx].set_xticks(range(N_ACTIONS))
+            axes[0, col_idx].set_xticklabels(ACTION_NAMES)
+            ordered_names = [LIFTED_NAMES[i] for i in order]
+            axes[0, col_idx].set_yticks(range(N_LIFTED))
+            axes[0, col_idx].set_yticklabels(ordered_names, fontsize=6)
+            plt.colorbar(im1, ax=axes[0, col_idx], shrink=0.8)
+
+            # Co-monotone coupling
+            im2 = axes[1, col_idx].imshow(gamma_como_plot, cmap='Oranges', aspect='auto')
+            axes[1, col_idx].set_title(f'Co-monotone Coupling\n({order_name})', fontsize=10)
+            axes[1, col_idx].set_ylabel('State (ordered)')
+            axes[1, col_idx].set_xlabel('Action')
+            axes[1, col_idx].set_xticks(range(N_ACTIONS))
+            axes[1, col_idx].set_xticklabels(ACTION_NAMES)
+            axes[1, col_idx].set_yticks(range(N_LIFTED))
+            axes[1, col_idx].set_yticklabels(ordered_names, fontsize=6)
+            plt.colorbar(im2, ax=axes[1, col_idx], shrink=0.8)
+
+    fig.suptitle('OT Solutions vs Co-monotone Couplings (θ_t-only payoff)', fontsize=14, y=1.01)
+    plt.tight_layout()
+    return fig
+
+
+def plot_ot_summary(results_table, random_ot_results):
+    """Figure 2: Canonical-order results and random-order OT statistics."""
+    plt = pyplot()
+    fig2, axes2 = plt.subplots(1, 2, figsize=(14, 5))
+
+    # Left: Canonical order results
+    labels = [f"{r['order']}\n({r['payoff']})" for r in results_table]
+    colors_sm = ['#4CAF50' if r['supermod'] else '#F44336' for r in results_table]
+    colors_match = ['#2196F3' if r['como_eq_ot'] else '#FF9800' for r in results_table]
+
+    x = np.arange(len(results_table))
+    width = 0.35
+
+    axes2[0].bar(x - width / 2, [1 if r['supermod'] else 0 for r in results_table],
+                 width, label='Supermodular', color=colors_sm, edgecolor='black')
+    axes2[0].bar(x + width / 2, [1 if r['como_eq_ot'] else 0 for r in results_table],
+                 width, label='Co-monotone = OT', color=colors_match, edgecolor='black')
+    axes2[0].set_xticks(x)
+    axes2[0].set_xticklabels(labels, fontsize=7, rotation=45, ha='right')
+    axes2[0].set_ylabel('Result (1=Yes, 0=No)')
+    axes2[0].set_title('Canonical Orders: Supermodularity & OT Match')
+    axes2[0].legend(fontsize=9)
+
+    # Right: Random order statistics
+    categories = ['SM &\nComo=OT', 'SM &\nComo≠OT', '¬SM &\nOT mono', '¬SM &\nOT ¬mono']
+    counts = [
+        random_ot_results['supermod_and_como_eq_ot'],
+        random_ot_results['supermod_and_como_ne_ot'],
+        random_ot_results['no_supermod_and_ot_monotone'],
+        random_ot_results['no_supermod_and_ot_not_monotone'],
+    ]
+    bar_colors = ['#4CAF50', '#FFC107', '#2196F3', '#F44336']
+    axes2[1].bar(categories, counts, color=bar_colors, edgecolor='black')
+    axes2[1].set_ylabel('Count (out of 500 samples)')
+    axes2[1].set_title('Random Orders: OT Properties (θ_t-only)')
+    for i, c in enumerate(counts):
+        axes2[1].text(i, c + 2, str(c), ha='center', fontsize=10, fontweight='bold')
+
+    plt.tight_layout()
+    return fig2
+
+
+figures.submit(plot_ot_solutions, os.path.join(fig_dir, 'ot_solutions_by_order.png'),
+               rho_tilde, nu_stack, U1_theta_only)
+figures.submit(plot_ot_summary, os.path.join(fig_dir, 'ot_analysis_summary.png'),
+               results_table, random_ot_results)
 
-plot_configs = []
-for r in results_table:
-    if r['payoff'] == 'theta_t_only':
-        plot_configs.append(r)
-
-for col_idx, (order_name, order) in enumerate(ORDERS.items()):
-    mu_ord = rho_tilde[order]
-    cost_ord = -U1_theta_only[order, :]
-
-    gamma_ot_plot, _ = solve_ot(mu_ord, nu_stack, cost_ord)
-    gamma_como_plot = comonotone_coupling(mu_ord, nu_stack)
-
-    if gamma_ot_plot is not None:
-        # OT solution
-        im1 = axes[0, col_idx].imshow(gamma_ot_plot, cmap='Blues', aspect='auto')
-        axes[0, col_idx].set_title(f'OT Solution\n({order_name})', fontsize=10)
-        axes[0, col_idx].set_ylabel('State (ordered)')
-        axes[0, col_idx].set_xlabel('Action')
-        axes[0, col_idx].set_xticks(range(N_ACTIONS))
-        axes[0, col_idx].set_xticklabels(ACTION_NAMES)
-        ordered_names = [LIFTED_NAMES[i] for i in order]
-        axes[0, col_idx].set_yticks(range(N_LIFTED))
-        axes[0, col_idx].set_yticklabels(ordered_names, fontsize=6)
-        plt.colorbar(im1, ax=axes[0, col_idx], shrink=0.8)
-
-        # Co-monotone coupling
-        im2 = axes[1, col_idx].imshow(gamma_como_plot, cmap='Oranges', aspect='auto')
-        axes[1, col_idx].set_title(f'Co-monotone Coupling\n({order_name})', fontsize=10)
-        axes[1, col_idx].set_ylabel('State (ordered)')
-        axes[1, col_idx].set_xlabel('Action')
-        axes[1, col_idx].set_xticks(range(N_ACTIONS))
-        axes[1, col_idx].set_xticklabels(ACTION_NAMES)
-        axes[1, col_idx].set_yticks(range(N_LIFTED))
-        axes[1, col_idx].set_yticklabels(ordered_names, fontsize=6)
-        plt.colorbar(im2, ax=axes[1, col_idx], shrink=0.8)
-
-fig.suptitle('OT Solutions vs Co-monotone Couplings (θ_t-only payoff)', fontsize=14, y=1.01)
-plt.tight_layout()
-path1 = os.path.join(fig_dir, 'ot_solutions_by_order.png')
-save_figure(fig, path1)
-print(f"\nSaved: {path1}")
-
-# Figure 2: Summary bar chart
-fig2, axes2 = plt.subplots(1, 2, figsize=(14, 5))
-
-# Left: Canonical order results
-labels = [f"{r['order']}\n({r['payoff']})" for r in results_table]
-colors_sm = ['#4CAF50' if r['supermod'] else '#F44336' for r in results_table]
-colors_match = ['#2196F3' if r['como_eq_ot'] else '#FF9800' for r in results_table]
-
-x = np.arange(len(results_table))
-width = 0.35
-
-axes2[0].bar(x - width / 2, [1 if r['supermod'] else 0 for r in results_table],
-             width, label='Supermodular', color=colors_sm, edgecolor='black')
-axes2[0].bar(x + width / 2, [1 if r['como_eq_ot'] else 0 for r in results_table],
-             width, label='Co-monotone = OT', color=colors_match, edgecolor='black')
-axes2[0].set_xticks(x)
-axes2[0].set_xticklabels(labels, fontsize=7, rotation=45, ha='right')
-axes2[0].set_ylabel('Result (1=Yes, 0=No)')
-axes2[0].set_title('Canonical Orders: Supermodularity & OT Match')
-axes2[0].legend(fontsize=9)
-
-# Right: Random order statistics
-categories = ['SM &\nComo=OT', 'SM &\nComo≠OT', '¬SM &\nOT mono', '¬SM &\nOT ¬mono']
-counts = [
-    random_ot_results['supermod_and_como_eq_ot'],
-    random_ot_results['supermod_and_como_ne_ot'],
-    random_ot_results['no_supermod_and_ot_monotone'],
-    random_ot_results['no_supermod_and_ot_not_monotone'],
-]
-bar_colors = ['#4CAF50', '#FFC107', '#2196F3', '#F44336']
-axes2[1].bar(categories, counts, color=bar_colors, edgecolor='black')
-axes2[1].set_ylabel('Count (out of 500 samples)')
-axes2[1].set_title('Random Orders: OT Properties (θ_t-only)')
-for i, c in enumerate(counts):
-    axes2[1].text(i, c + 2, str(c), ha='center', fontsize=10, fontweight='bold')
-
-plt.tight_layout()
-path2 = os.path.join(fig_dir, 'ot_analysis_summary.png')
-save_figure(fig2, path2)
-print(f"Saved: {path2}")
 
 # ---------------------------------------------------------------------------
 # 9. Generate report.md
@@ -568,4 +530,7 @@ report_path = os.path.join(os.path.dirname(__file__), 'report.md')
 with open(report_path, 'w') as f:
     f.write('\n'.join(report_lines))
 print(f"\nReport saved: {report_path}")
+
+for path in figures.render():
+    print(f"Saved: {path}")
 print("\n[SSA7_3 COMPLETE]")
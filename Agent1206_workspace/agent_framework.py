@@ -21,8 +21,29 @@ import subprocess
 import sys
 import json
 import datetime
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict, Tuple
+
+
+# Runs a script under cProfile like `python script.py` would run it. Unlike
+# `python -m cProfile`, this lets SystemExit through, so exit codes survive.
+_PROFILE_BOOTSTRAP = """\
+import cProfile, os, runpy, sys
+script, out = sys.argv[1], sys.argv[2]
+sys.argv = [script]
+sys.path[0] = os.path.dirname(os.path.abspath(script))
+profiler = cProfile.Profile()
+profiler.enable()
+try:
+    runpy.run_path(script, run_name="__main__")
+finally:
+    profiler.disable()
+    profiler.dump_stats(out)
+"""
 
 
 class Agent:
@@ -97,8 +118,23 @@ class Agent:
         return self.figures
 
     def run_script(self, script_path: Path, venv_python: Optional[str] = None,
-                   timeout: int = 300) -> Dict:
-        """Execute a Python script and capture output."""
+                   timeout: int = 300, runner=None,
+                   profile_path: Optional[str] = None) -> Dict:
+        """Execute a Python script and capture output.
+
+        By default the script runs in a fresh `venv_python` process. If an
+        `inprocess_runner.InProcessRunner` is given, it runs in a child
+        forked from the runner's preloaded server instead.
+
+        The result's "resources" entry holds wall/CPU time and peak RSS of
+        the script process (and the children it waited for), taken from
+        wait4. If `profile_path` is given, the script runs under cProfile
+        and its stats are dumped there.
+        """
+        if runner is not None:
+            return runner.run(script_path, self.workspace, timeout=timeout,
+                              profile_path=profile_path)
+
         if venv_python is None:
             venv_python = str(
                 Path(__file__).parent / "venv" / "bin" / "python"
@@ -115,16 +151,27 @@ class Agent:
             "returncode": -1
         }
 
+        cmd = [venv_python, str(script_path)]
+        if profile_path:
+            Path(profile_path).parent.mkdir(parents=True, exist_ok=True)
+            cmd = [venv_python, "-c", _PROFILE_BOOTSTRAP, str(script_path),
+                   str(profile_path)]
+            result["profile"] = str(profile_path)
+
         try:
-            proc = subprocess.run(
-                [venv_python, str(script_path)],
-                capture_output=True, text=True, timeout=timeout,
-                env=env, cwd=str(self.workspace)
-            )
-            result["stdout"] = proc.stdout
-            result["stderr"] = proc.stderr
-            result["returncode"] = proc.returncode
-            result["status"] = "completed" if proc.returncode == 0 else "failed"
+            if hasattr(os, "wait4") and hasattr(os, "waitid"):
+                _run_with_rusage(cmd, env, str(self.workspace), timeout, result)
+            else:
+                start = time.monotonic()
+                proc = subprocess.run(
+                    cmd, capture_output=True, text=True, timeout=timeout,
+                    env=env, cwd=str(self.workspace)
+                )
+                result["stdout"] = proc.stdout
+                result["stderr"] = proc.stderr
+                result["returncode"] = proc.returncode
+                result["status"] = "completed" if proc.returncode == 0 else "failed"
+                result["resources"] = {"wall_seconds": time.monotonic() - start}
         except subprocess.TimeoutExpired:
             result["status"] = "timeout"
             result["stderr"] = f"Script timed out after {timeout}s"
@@ -237,6 +284,203 @@ class Agent:
         return s
 
 
+def resource_usage(usage, wall_seconds: float) -> Dict:
+    """Summarize a `resource.struct_rusage` (from wait4) as JSON-able numbers."""
+    # ru_maxrss is in KiB on Linux but in bytes on macOS
+    rss_bytes = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return {
+        "wall_seconds": wall_seconds,
+        "user_seconds": usage.ru_utime,
+        "system_seconds": usage.ru_stime,
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "max_rss_mb": rss_bytes / 1024 ** 2,
+    }
+
+
+def _run_with_rusage(cmd: List[str], env: Dict, cwd: str, timeout: int,
+                     result: Dict):
+    """Run `cmd`, reaping it with wait4 to collect its resource usage.
+
+    Fills stdout/stderr/returncode/status/resources into `result`; raises
+    subprocess.TimeoutExpired if the process had to be killed.
+    """
+    start = time.monotonic()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, env=env, cwd=cwd)
+    output = {}
+
+    def drain(name, stream):
+        output[name] = stream.read()
+        stream.close()
+
+    readers = [threading.Thread(target=drain, args=(name, stream), daemon=True)
+               for name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr))]
+    for reader in readers:
+        reader.start()
+
+    timed_out = threading.Event()
+    reaped = threading.Lock()
+
+    def kill():
+        with reaped:
+            if proc.returncode is None:
+                timed_out.set()
+                proc.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        # Wait for exit without reaping, so kill() can never hit a recycled pid
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        with reaped:
+            _, status, usage = os.wait4(proc.pid, 0)
+            # Reaped here, so Popen must not wait on (or signal) the pid again
+            proc.returncode = os.waitstatus_to_exitcode(status)
+    finally:
+        timer.cancel()
+    wall = time.monotonic() - start
+    for reader in readers:
+        reader.join()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    result["stdout"] = output.get("stdout", "")
+    result["stderr"] = output.get("stderr", "")
+    result["returncode"] = proc.returncode
+    result["status"] = "completed" if proc.returncode == 0 else "failed"
+    result["resources"] = resource_usage(usage, wall)
+
+
+def run_scripts_parallel(jobs: List[Tuple[Agent, Path]],
+                         max_workers: Optional[int] = None,
+                         dependencies: Optional[Dict[str, List[str]]] = None,
+                         inputs: Optional[Dict[str, List[str]]] = None,
+                         venv_python: Optional[str] = None,
+                         timeout: int = 300,
+                         on_result: Optional[Callable[[Agent, Path, Dict], None]] = None,
+                         cache=None,
+                         runner=None,
+                         profile_dir: Optional[str] = None) -> List[Dict]:
+    """Run (agent, script) jobs concurrently, respecting declared dependencies.
+
+    Every script runs in its own process (via `Agent.run_script`: a fresh
+    interpreter, or a fork of `runner`'s preloaded server if one is given);
+    at most `max_workers` of them run at once. `dependencies` maps an
+    agent_id to the agent_ids whose scripts must all complete first; if any
+    of those fails, the dependent scripts are skipped. `on_result` is called
+    from the calling thread as each script finishes, so callers can stream
+    status. Returns the results in job order.
+
+    If a `script_cache.ScriptCache` is given, each script is first looked up
+    by its content hash (which folds in the keys of its dependencies and the
+    contents of the artifact paths `inputs` declares for its agent_id); hits
+    restore the cached outputs instead of running and are marked with
+    `cache_hit` in their result.
+
+    If `profile_dir` is given, each script that actually runs is profiled
+    with cProfile into `<profile_dir>/<agent_id>__<script stem>.prof`;
+    cached results are not restored while profiling.
+    """
+    dependencies = dependencies or {}
+    inputs = inputs or {}
+    max_workers = max_workers or os.cpu_count() or 1
+
+    results: List[Optional[Dict]] = [None] * len(jobs)
+    unfinished = Counter(agent.agent_id for agent, _ in jobs)
+    failed_agents = set()
+    pending = list(range(len(jobs)))
+    running = {}
+    cache_keys: Dict[str, List[str]] = {}
+
+    def timed_run(agent, script, key):
+        start = datetime.datetime.now()
+        started = time.time()
+        res = cache.restore(key, agent.workspace) if key and not profile_dir else None
+        if res is not None:
+            res["cache_hit"] = True
+            res["cached_duration_seconds"] = res.pop("duration_seconds", None)
+        else:
+            profile_path = (os.path.join(profile_dir, f"{agent.agent_id}__{script.stem}.prof")
+                            if profile_dir else None)
+            res = agent.run_script(script, venv_python=venv_python,
+                                   timeout=timeout, runner=runner,
+                                   profile_path=profile_path)
+            res["cache_hit"] = False
+        end = datetime.datetime.now()
+        res["start_time"] = start.isoformat()
+        res["end_time"] = end.isoformat()
+        res["duration_seconds"] = (end - start).total_seconds()
+        if key:
+            res["cache_key"] = key
+            if not res["cache_hit"]:
+                cache.store(key, agent.workspace, res, since=started)
+        return res
+
+    def launch(i):
+        agent, script = jobs[i]
+        key = None
+        if cache is not None:
+            deps = dependencies.get(agent.agent_id, [])
+            dep_keys = [k for d in deps for k in cache_keys.get(d, [])]
+            key = cache.key(script, agent.task_path, dep_keys, inputs.get(agent.agent_id, []))
+        running[pool.submit(timed_run, agent, script, key)] = i
+
+    def finish(i, res):
+        agent, script = jobs[i]
+        results[i] = res
+        if res.get("cache_key"):
+            cache_keys.setdefault(agent.agent_id, []).append(res["cache_key"])
+        unfinished[agent.agent_id] -= 1
+        if res["status"] != "completed":
+            failed_agents.add(agent.agent_id)
+        if on_result is not None:
+            on_result(agent, script, res)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # Launch every job whose dependencies are satisfied; skipping a
+            # job can unblock (or fail) others, so repeat until stable
+            progressed = True
+            while progressed:
+                progressed = False
+                for i in list(pending):
+                    agent, script = jobs[i]
+                    deps = dependencies.get(agent.agent_id, [])
+                    failed = [d for d in deps if d in failed_agents]
+                    if failed:
+                        pending.remove(i)
+                        finish(i, {
+                            "script": str(script),
+                            "status": "skipped",
+                            "stdout": "",
+                            "stderr": f"Dependency failed: {', '.join(failed)}",
+                            "returncode": -1,
+                        })
+                        progressed = True
+                    elif not any(unfinished[d] > 0 for d in deps):
+                        pending.remove(i)
+                        launch(i)
+                        progressed = True
+
+            if not running:
+                # Remaining jobs wait on each other: a dependency cycle
+                for i in pending:
+                    finish(i, {
+                        "script": str(jobs[i][1]),
+                        "status": "skipped",
+                        "stdout": "",
+                        "stderr": "Dependency cycle",
+                        "returncode": -1,
+                    })
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish(running.pop(future), future.result())
+
+    return results
+
+
 def build_hierarchy(base_path: str) -> Agent:
     """Build the full agent hierarchy from the folder structure."""
     base = Path(base_path)
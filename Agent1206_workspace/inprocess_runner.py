@@ -0,0 +1,365 @@
+"""
+In-Process Script Runner
+========================
+
+Alternative to `Agent.run_script`'s one-interpreter-per-script execution.
+A single long-lived server process (started with the venv python) imports
+the heavy modules once -- numpy, scipy, matplotlib, seaborn and
+shared.markov_utils -- and then runs each script with `runpy` in a child
+forked from it, so scripts start with everything already imported.
+
+Each forked child:
+- chdirs into the SSA workspace and sets sys.argv / sys.path[0] as
+  `python script.py` would
+- writes stdout/stderr to capture files read back by the caller
+- reseeds the global `random` / `numpy.random` state (a fresh interpreter
+  would not share its parent's seed)
+- runs in its own process group, which is killed on timeout (the
+  server's, or the client's: a client that stops waiting sends a kill
+  request for it)
+- is reaped with wait4, and its resource usage returned with the reply
+- optionally runs the script under cProfile
+
+Requests and replies are JSON lines over the server's stdin/stdout. POSIX
+only (relies on os.fork).
+
+Usage:
+    with InProcessRunner(venv_python) as runner:
+        result = ssa.run_script(script, runner=runner, timeout=600)
+"""
+
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+from agent_framework import resource_usage
+
+WORKSPACE_DIR = Path(__file__).parent
+
+PRELOAD_MODULES = (
+    "numpy",
+    "scipy",
+    "scipy.optimize",
+    "scipy.stats",
+    "matplotlib",
+    "matplotlib.pyplot",
+    "seaborn",
+    "shared.markov_utils",
+)
+
+# How long the client waits past the server-side timeout before giving up
+_CLIENT_GRACE_SECONDS = 30
+
+# After giving up, how long the client waits for the killed child to be reaped
+_KILL_WAIT_SECONDS = 10
+
+
+class InProcessRunner:
+    """Client for a preloading fork server; thread-safe `run()` calls."""
+
+    def __init__(self, venv_python: Optional[str] = None,
+                 preload=PRELOAD_MODULES):
+        if venv_python is None:
+            venv_python = str(WORKSPACE_DIR / "venv" / "bin" / "python")
+        self.venv_python = venv_python
+        self.preload = tuple(preload)
+        self._proc: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def start(self) -> 'InProcessRunner':
+        """Launch the server and wait until its preloads are imported."""
+        env = os.environ.copy()
+        env["PYTHONPATH"] = str(WORKSPACE_DIR)
+        env.setdefault("MPLBACKEND", "Agg")
+        self._proc = subprocess.Popen(
+            [self.venv_python, str(Path(__file__).resolve()), *self.preload],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            text=True, bufsize=1, env=env, cwd=str(WORKSPACE_DIR)
+        )
+        ready = self._proc.stdout.readline()
+        if not ready:
+            raise RuntimeError("In-process runner failed to start")
+        self._reader = threading.Thread(target=self._read_replies, daemon=True)
+        self._reader.start()
+        return self
+
+    def close(self):
+        """Stop the server; running children are killed with it."""
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+        self._proc = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_replies(self):
+        for line in self._proc.stdout:
+            reply = json.loads(line)
+            with self._lock:
+                future = self._pending.pop(reply["id"], None)
+            if future is not None:
+                future.set_result(reply)
+        # Server exited: fail everything still waiting
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(RuntimeError("In-process runner exited"))
+
+    def run(self, script_path: Path, cwd: Path, timeout: int = 300,
+            profile_path: Optional[str] = None) -> Dict:
+        """Run one script in a forked child. Returns a `run_script`-style result."""
+        result = {
+            "script": str(script_path),
+            "status": "pending",
+            "stdout": "",
+            "stderr": "",
+            "returncode": -1
+        }
+        if profile_path:
+            Path(profile_path).parent.mkdir(parents=True, exist_ok=True)
+            profile_path = str(Path(profile_path).resolve())
+            result["profile"] = profile_path
+        out_fd, out_path = tempfile.mkstemp(prefix="run-", suffix=".out")
+        err_fd, err_path = tempfile.mkstemp(prefix="run-", suffix=".err")
+        os.close(out_fd)
+        os.close(err_fd)
+        try:
+            future: Future = Future()
+            with self._lock:
+                if self._proc is None or self._proc.poll() is not None:
+                    raise RuntimeError("In-process runner is not running")
+                req_id = self._next_id
+                self._next_id += 1
+                self._pending[req_id] = future
+                self._proc.stdin.write(json.dumps({
+                    "id": req_id,
+                    "script": str(Path(script_path).resolve()),
+                    "cwd": str(cwd),
+                    "timeout": timeout,
+                    "stdout": out_path,
+                    "stderr": err_path,
+                    "profile": profile_path,
+                }) + "\n")
+                self._proc.stdin.flush()
+            try:
+                reply = future.result(timeout=timeout + _CLIENT_GRACE_SECONDS)
+            except FutureTimeout:
+                reply = self._cancel(req_id, future)
+                result["status"] = "timeout"
+                result["stderr"] = (f"Script timed out after {timeout}s "
+                                    "(no reply from the in-process runner)")
+                return result
+
+            result["stdout"] = Path(out_path).read_text(errors="replace")
+            result["stderr"] = Path(err_path).read_text(errors="replace")
+            result["returncode"] = reply["returncode"]
+            result["resources"] = resource_usage(SimpleNamespace(**reply["rusage"]),
+                                                 reply["wall_seconds"])
+            if reply["timed_out"]:
+                result["status"] = "timeout"
+                result["stderr"] = f"Script timed out after {timeout}s"
+            else:
+                result["status"] = "completed" if reply["returncode"] == 0 else "failed"
+        except Exception as e:
+            result["status"] = "error"
+            result["stderr"] = str(e)
+        finally:
+            os.unlink(out_path)
+            os.unlink(err_path)
+        return result
+
+    def _cancel(self, req_id: int, future: Future) -> Optional[Dict]:
+        """Have the server kill request `req_id`'s process group; wait for its reply.
+
+        The request is dropped from the pending set either way, so a late
+        reply is ignored.
+        """
+        try:
+            with self._lock:
+                if self._proc is not None and self._proc.poll() is None:
+                    self._proc.stdin.write(json.dumps({"kill": req_id}) + "\n")
+                    self._proc.stdin.flush()
+            return future.result(timeout=_KILL_WAIT_SECONDS)
+        except (OSError, FutureTimeout, RuntimeError):
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(req_id, None)
+
+
+# ---------------------------------------------------------------------------
+# Server side (runs under the venv python)
+# ---------------------------------------------------------------------------
+
+def _run_child(req: Dict):
+    """Body of a forked child: redirect IO, run the script, never return."""
+    code = 1
+    try:
+        os.setpgid(0, 0)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(os.open(req["stdout"], os.O_WRONLY | os.O_TRUNC), 1)
+        os.dup2(os.open(req["stderr"], os.O_WRONLY | os.O_TRUNC), 2)
+        sys.stdin = open(os.devnull)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False)
+
+        import random
+        random.seed()
+        if "numpy" in sys.modules:
+            sys.modules["numpy"].random.seed()
+
+        script = req["script"]
+        os.chdir(req["cwd"])
+        sys.argv = [script]
+        sys.path[0] = os.path.dirname(script)
+
+        import runpy
+        profiler = None
+        if req.get("profile"):
+            import cProfile
+            profiler = cProfile.Profile()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                runpy.run_path(script, run_name="__main__")
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    profiler.dump_stats(req["profile"])
+            code = 0
+        except SystemExit as e:
+            if e.code is None:
+                code = 0
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+
+        import atexit
+        atexit._run_exitfuncs()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _serve(preload):
+    """Import `preload`, then fork a child per request read from stdin."""
+    import importlib
+    import time
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    out = sys.stdout
+    out.write("ready\n")
+    out.flush()
+
+    children: Dict[int, Dict] = {}  # pid -> {"id", "deadline", "timed_out"}
+    stdin_open = True
+    buffer = b""
+
+    while stdin_open or children:
+        # Read new requests (poll briefly so timeouts and exits are noticed)
+        if stdin_open:
+            ready, _, _ = select.select([0], [], [], 0.05)
+            if ready:
+                chunk = os.read(0, 65536)
+                if not chunk:
+                    stdin_open = False
+                buffer += chunk
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    req = json.loads(line)
+                    if "kill" in req:
+                        # Client gave up on a request: kill its child if still running
+                        for pid, child in children.items():
+                            if child["id"] == req["kill"]:
+                                child["timed_out"] = True
+                                _kill_group(pid)
+                        continue
+                    out.flush()
+                    pid = os.fork()
+                    if pid == 0:
+                        _run_child(req)
+                    try:
+                        os.setpgid(pid, pid)  # also set by the child; whichever runs first
+                    except OSError:
+                        pass
+                    started = time.monotonic()
+                    children[pid] = {"id": req["id"], "timed_out": False,
+                                     "started": started,
+                                     "deadline": started + req["timeout"]}
+        else:
+            time.sleep(0.05)
+            # Server is shutting down: don't leave children behind
+            for pid in children:
+                _kill_group(pid)
+
+        now = time.monotonic()
+        for pid, child in children.items():
+            if not child["timed_out"] and now > child["deadline"]:
+                child["timed_out"] = True
+                _kill_group(pid)
+
+        while children:
+            pid, status, usage = os.wait4(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            child = children.pop(pid)
+            out.write(json.dumps({
+                "id": child["id"],
+                "returncode": os.waitstatus_to_exitcode(status),
+                "timed_out": child["timed_out"],
+                "wall_seconds": time.monotonic() - child["started"],
+                "rusage": {"ru_utime": usage.ru_utime, "ru_stime": usage.ru_stime,
+                           "ru_maxrss": usage.ru_maxrss},
+            }) + "\n")
+            out.flush()
+
+
+def _kill_group(pid: int):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+if __name__ == "__main__":
+    _serve(sys.argv[1:])
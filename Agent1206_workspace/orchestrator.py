@@ -3,20 +3,50 @@
 Orchestrator: Agent1206
 =======================
 Top-level orchestrator that builds the full agent hierarchy,
-runs ALL sub-subagent scripts (SA1 through SA7) in order,
+runs ALL sub-subagent scripts (SA1 through SA7) concurrently on a pool of
+worker processes (respecting declared inter-script dependencies),
 collects reports, compiles SA-level reports from SSA-level reports,
 and produces a final report at reports/final_report.md.
+
+Script runs are cached by content hash (script, imported shared modules,
+task.md, dependency keys and declared input artifacts); unchanged scripts
+restore their cached outputs instead of re-running. Simulated paths are
+memoized on disk across scripts (shared/sim_cache.py), so sibling scripts
+reuse them. --no-cache disables both caches.
+
+Process pools inside scripts (run_replicates, evaluate_grid) get
+cpu_count / --workers processes each (SCRIPT_WORKERS), so concurrent
+scripts do not oversubscribe the CPUs. With --in-process, scripts are
+forked from one server that has numpy/scipy/matplotlib preloaded instead
+of each starting a fresh interpreter.
+
+--no-figures runs every script in compute-only mode (shared/figures.py):
+reports and numbers are produced but no figures are rendered, and
+matplotlib is not preloaded. Such runs bypass the script cache, whose
+entries must include the figures.
+
+Every script's wall/CPU time and peak RSS are recorded in
+reports/run_log.json; --profile also dumps a cProfile file per script
+to reports/profiles/.
+
+Usage:
+    python orchestrator.py [--workers N] [--no-cache] [--cache-max-mb MB]
+                           [--in-process] [--profile] [--no-figures]
 """
 
 import os
 import sys
+import argparse
 import datetime
 import json
 from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(__file__))
 
-from agent_framework import Agent, build_hierarchy
+from agent_framework import Agent, build_hierarchy, run_scripts_parallel
+from inprocess_runner import InProcessRunner, PRELOAD_MODULES
+from script_cache import ScriptCache
+from shared.workers import WORKERS_ENV, worker_budget
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -24,6 +54,21 @@ from agent_framework import Agent, build_hierarchy
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 VENV_PYTHON = os.path.join(BASE_PATH, "venv", "bin", "python")
 REPORTS_DIR = os.path.join(BASE_PATH, "reports")
+SCRIPT_TIMEOUT = 600
+CACHE_DIR = os.path.join(BASE_PATH, ".cache", "script_runs")
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+PROFILE_DIR = os.path.join(REPORTS_DIR, "profiles")
+
+# SSA-level dependencies: an SSA's scripts start only after all scripts of
+# the listed SSAs have completed successfully.
+SCRIPT_DEPENDENCIES = {
+    "SSA3_2_KLEngine": ["SSA3_1_SignalSim"],  # signal_sim / signal_data store
+}
+
+# Data artifacts read by each SSA's scripts, hashed into their cache keys
+SCRIPT_INPUTS = {
+    "SSA3_2_KLEngine": [os.path.join(BASE_PATH, "SA3_KLBound", "SSA3_1_SignalSim", "signal_data")],
+}
 
 # SA-level descriptions for the final report
 SA_DESCRIPTIONS = {
@@ -58,8 +103,18 @@ SA_DESCRIPTIONS = {
 }
 
 
-def run_all():
+def run_all(max_workers=None, use_cache=True, cache_max_bytes=CACHE_MAX_BYTES,
+            in_process=False, profile=False, no_figures=False):
     """Build hierarchy, run all scripts, compile reports."""
+    max_workers = max_workers or os.cpu_count() or 1
+    # Process pools inside scripts share the CPUs with the other running scripts
+    os.environ[WORKERS_ENV] = str(worker_budget(os.cpu_count() or 1, max_workers))
+    cache = (ScriptCache(CACHE_DIR, max_bytes=cache_max_bytes)
+             if use_cache and not no_figures else None)
+    if not use_cache:
+        os.environ["SIM_CACHE"] = "0"  # inherited by script processes
+    if no_figures:
+        os.environ["NO_FIGURES"] = "1"
     start_time = datetime.datetime.now()
     print("=" * 70)
     print("Agent1206 Orchestrator — Mathematical Testing Framework")
@@ -73,49 +128,68 @@ def run_all():
     for sa in orchestrator.subagents:
         print(f"    {sa.agent_id}: {len(sa.subagents)} sub-subagents")
 
-    # Run all SA-level agents
-    print("\n[2/4] Running all sub-subagent scripts...")
-    all_results = []
-    sa_statuses = {}
-
+    # Run all SSA scripts on the worker pool
+    mode = "in-process" if in_process else "subprocess"
+    print(f"\n[2/4] Running all sub-subagent scripts ({max_workers} workers, {mode})...")
+    jobs = []
     for sa in orchestrator.subagents:
-        print(f"\n{'='*60}")
-        print(f"Running {sa.agent_id}...")
-        print(f"{'='*60}")
-
-        sa_results = []
         sa.status = "running"
-        sa.start_time = datetime.datetime.now()
-
         for ssa in sa.subagents:
             ssa.load_task()
             ssa.discover_scripts()
-            ssa.status = "running"
 
             if not ssa.scripts:
                 print(f"  [{ssa.agent_id}] No scripts found — skipping")
                 ssa.status = "skipped"
                 continue
 
-            for script in ssa.scripts:
-                print(f"  [{ssa.agent_id}] Running {script.name}...")
-                result = ssa.run_script(script, venv_python=VENV_PYTHON, timeout=600)
-                result['sa'] = sa.agent_id
-                result['ssa'] = ssa.agent_id
-                sa_results.append(result)
-                all_results.append(result)
+            ssa.status = "running"
+            jobs.extend((ssa, script) for script in ssa.scripts)
+
+    def report_status(ssa, script, result):
+        result['sa'] = ssa.parent_id
+        result['ssa'] = ssa.agent_id
+        if result.get('cache_hit'):
+            print(f"  ✓ [{ssa.agent_id}] {script.name} restored from cache")
+        elif result['status'] == 'completed':
+            print(f"  ✓ [{ssa.agent_id}] {script.name} completed successfully")
+        else:
+            print(f"  ✗ [{ssa.agent_id}] {script.name} {result['status']}: "
+                  f"{result['stderr'][:200]}")
+
+    preload = PRELOAD_MODULES
+    if no_figures:
+        preload = tuple(m for m in preload if m.split('.')[0] not in ('matplotlib', 'seaborn'))
+    runner = InProcessRunner(VENV_PYTHON, preload=preload).start() if in_process else None
+    try:
+        all_results = run_scripts_parallel(
+            jobs, max_workers=max_workers, dependencies=SCRIPT_DEPENDENCIES,
+            inputs=SCRIPT_INPUTS,
+            venv_python=VENV_PYTHON, timeout=SCRIPT_TIMEOUT, on_result=report_status,
+            cache=cache, runner=runner, profile_dir=PROFILE_DIR if profile else None
+        )
+    finally:
+        if runner is not None:
+            runner.close()
 
-                if result['status'] == 'completed':
-                    print(f"    ✓ Completed successfully")
-                else:
-                    print(f"    ✗ {result['status']}: {result['stderr'][:200]}")
+    sa_statuses = {}
+    for sa in orchestrator.subagents:
+        sa_results = [r for r in all_results if r['sa'] == sa.agent_id]
 
+        for ssa in sa.subagents:
+            if ssa.status == "skipped":
+                continue
             ssa.discover_figures()
             ssa.status = "completed" if all(
                 r['status'] == 'completed' for r in sa_results if r.get('ssa') == ssa.agent_id
             ) else "failed"
 
-        sa.end_time = datetime.datetime.now()
+        # SA wall-clock span: first script start to last script end
+        started = [r['start_time'] for r in sa_results if 'start_time' in r]
+        ended = [r['end_time'] for r in sa_results if 'end_time' in r]
+        sa.start_time = datetime.datetime.fromisoformat(min(started)) if started else start_time
+        sa.end_time = datetime.datetime.fromisoformat(max(ended)) if ended else sa.start_time
+
         n_success = sum(1 for r in sa_results if r['status'] == 'completed')
         n_total = len(sa_results)
         sa.status = "completed" if n_success == n_total and n_total > 0 else (
@@ -126,8 +200,10 @@ def run_all():
             'success': n_success,
             'total': n_total,
             'duration': (sa.end_time - sa.start_time).total_seconds(),
+            'cpu_seconds': sum(r.get('resources', {}).get('cpu_seconds', 0)
+                               for r in sa_results if not r.get('cache_hit')),
         }
-        print(f"\n  {sa.agent_id} summary: {n_success}/{n_total} scripts succeeded [{sa.status}]")
+        print(f"  {sa.agent_id} summary: {n_success}/{n_total} scripts succeeded [{sa.status}]")
 
     # Compile SA-level reports from SSA-level reports
     print("\n[3/4] Compiling SA-level reports...")
@@ -151,11 +227,19 @@ def run_all():
     print(f"\n  Final report saved: {report_path}")
 
     # Save run log as JSON
+    cache_hits = [r for r in all_results if r.get('cache_hit')]
+    time_saved = sum(r.get('cached_duration_seconds') or 0 for r in cache_hits)
     log_path = os.path.join(REPORTS_DIR, "run_log.json")
     log_data = {
         'start_time': start_time.isoformat(),
         'end_time': end_time.isoformat(),
         'total_duration_seconds': total_duration,
+        'max_workers': max_workers,
+        'execution_mode': mode,
+        'cache_enabled': cache is not None,
+        'cache_hits': len(cache_hits),
+        'cache_time_saved_seconds': time_saved,
+        'profile_dir': PROFILE_DIR if profile else None,
         'sa_statuses': sa_statuses,
         'results': [{k: v for k, v in r.items() if k != 'stdout'} for r in all_results],
     }
@@ -172,8 +256,18 @@ def run_all():
     print(f"  Total scripts: {n_total}")
     print(f"  Succeeded: {n_success}")
     print(f"  Failed: {n_failed}")
+    print(f"  Cache hits: {len(cache_hits)} (saved ~{time_saved:.1f}s)")
     print(f"  Duration: {total_duration:.1f}s")
     print(f"  Report: {report_path}")
+    timed = sorted((r for r in all_results
+                    if 'resources' in r and not r.get('cache_hit')),
+                   key=lambda r: r['resources']['wall_seconds'], reverse=True)
+    if timed:
+        print(f"  Slowest scripts (wall / CPU / peak RSS):")
+        for r in timed[:5]:
+            res = r['resources']
+            print(f"    {r['ssa']:<28} {res['wall_seconds']:6.1f}s "
+                  f"{res.get('cpu_seconds', 0):6.1f}s {res.get('max_rss_mb', 0):7.0f} MB")
     print(f"{'='*70}")
 
     return report_path
@@ -320,4 +414,23 @@ def generate_final_report(orchestrator, all_results, sa_statuses,
 
 
 if __name__ == "__main__":
-    run_all()
+    parser = argparse.ArgumentParser(description="Run the Agent1206 orchestrator.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of scripts to run concurrently "
+                             "(default: number of CPU cores; 1 = sequential)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-run every script and simulation instead of using cached results")
+    parser.add_argument("--cache-max-mb", type=float, default=CACHE_MAX_BYTES / 1024 ** 2,
+                        help="Size budget of the script result cache (LRU eviction)")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Fork scripts from a server with heavy modules preloaded "
+                             "instead of starting one interpreter per script (POSIX only)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Run each script under cProfile, writing reports/profiles/*.prof")
+    parser.add_argument("--no-figures", action="store_true",
+                        help="Compute-only mode: skip figure rendering and the matplotlib import")
+    args = parser.parse_args()
+    run_all(max_workers=args.workers, use_cache=not args.no_cache,
+            cache_max_bytes=int(args.cache_max_mb * 1024 ** 2),
+            in_process=args.in_process, profile=args.profile,
+            no_figures=args.no_figures)
@@ -1,6 +1,7 @@
 #!/usr/bin/env bash
 # ===========================================================================
 # run_all.sh — Run the full Agent1206 mathematical testing framework
+#   Usage: ./run_all.sh [--workers N]
 # ===========================================================================
 set -euo pipefail
 
@@ -33,7 +34,7 @@ echo "PYTHONPATH set to: ${PYTHONPATH}"
 echo ""
 echo "Running orchestrator..."
 echo "------------------------------------------------------------"
-"${PYTHON}" "${SCRIPT_DIR}/orchestrator.py"
+"${PYTHON}" "${SCRIPT_DIR}/orchestrator.py" "$@"
 
 echo ""
 echo "============================================================"
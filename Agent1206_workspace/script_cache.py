@@ -0,0 +1,190 @@
+"""
+Script Run Cache
+================
+
+Content-addressed cache for orchestrator script runs. A run is keyed on a
+hash of everything that can change its output:
+
+- the script source
+- the ``shared/`` modules it imports (followed transitively)
+- the SSA's task.md
+- the cache keys of the SSAs it declares as dependencies
+- the contents of its declared input artifacts (files or directories,
+  e.g. another SSA's data store)
+
+On a hit, the cached stdout/stderr are returned and the SSA's output
+artifacts (report.md, figures/, data files) are restored into its
+workspace instead of re-running the script. Only files the run created or
+modified are snapshotted, so leftovers from older runs are not. Entries
+are evicted least-recently-used once the cache exceeds its size budget.
+
+Usage:
+    cache = ScriptCache(".cache/script_runs", max_bytes=2 * 1024**3)
+    key = cache.key(script, ssa.task_path, dependency_keys, input_paths)
+    result = cache.restore(key, ssa.workspace)     # None on a miss
+    started = time.time()
+    ...
+    cache.store(key, ssa.workspace, result, since=started)
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+SHARED_DIR = Path(__file__).parent / "shared"
+
+_SHARED_IMPORT = re.compile(r"^\s*(?:from|import)\s+shared\.(\w+)", re.MULTILINE)
+
+# Files in an SSA workspace that are inputs, not outputs of its script
+_INPUT_SUFFIXES = ('.py', '.pyc')
+_INPUT_NAMES = ('task.md',)
+
+# Allowance for file systems whose mtimes lag the wall clock slightly
+_MTIME_SLACK = 1.0
+
+
+class ScriptCache:
+    """Content-hash cache of script outputs with LRU eviction by total size."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3,
+                 shared_dir: Path = SHARED_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.shared_dir = Path(shared_dir)
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+
+    def shared_imports(self, source: str) -> List[Path]:
+        """Resolve `shared.*` imports in `source`, following them transitively."""
+        found = []
+        queue = _SHARED_IMPORT.findall(source)
+        while queue:
+            name = queue.pop()
+            path = self.shared_dir / f"{name}.py"
+            if path in found or not path.exists():
+                continue
+            found.append(path)
+            queue.extend(_SHARED_IMPORT.findall(path.read_text()))
+        return sorted(found)
+
+    def key(self, script: Path, task_path: Path,
+            dependency_keys: Iterable[str] = (),
+            input_paths: Iterable[Path] = ()) -> str:
+        """Hash the script, its shared imports, task.md, dependency keys and inputs."""
+        h = hashlib.sha256()
+        source = Path(script).read_bytes()
+        h.update(b"script\0" + source)
+        for path in self.shared_imports(source.decode("utf-8", errors="replace")):
+            h.update(f"shared\0{path.name}\0".encode() + path.read_bytes())
+        if Path(task_path).exists():
+            h.update(b"task\0" + Path(task_path).read_bytes())
+        for dep in sorted(dependency_keys):
+            h.update(f"dep\0{dep}".encode())
+        for root in sorted(Path(p) for p in input_paths):
+            files = sorted(f for f in root.rglob("*") if f.is_file()) if root.is_dir() else [root]
+            for f in files:
+                if f.exists():
+                    h.update(f"input\0{f.relative_to(root.parent)}\0".encode() + f.read_bytes())
+                else:
+                    h.update(f"input\0{f.relative_to(root.parent)}\0missing".encode())
+        return h.hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def restore(self, key: str, workspace: Path) -> Optional[Dict]:
+        """Restore a cached run into `workspace`. Returns its result, or None."""
+        entry = self.cache_dir / key
+        with self._lock:
+            meta_path = entry / "result.json"
+            if not meta_path.exists():
+                return None
+            result = json.loads(meta_path.read_text())
+            artifacts = entry / "artifacts"
+            for src in artifacts.rglob("*"):
+                if src.is_file():
+                    dst = Path(workspace) / src.relative_to(artifacts)
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(src, dst)
+            os.utime(meta_path)  # mark as recently used
+        return result
+
+    def store(self, key: str, workspace: Path, result: Dict,
+              since: Optional[float] = None):
+        """Snapshot the workspace outputs of a successful run under `key`.
+
+        Only files modified at or after `since` (the run's start, as
+        time.time()) are outputs of this run; without it, every non-input
+        file in the workspace is taken.
+        """
+        if result.get("status") != "completed":
+            return
+        workspace = Path(workspace)
+        tmp = self.cache_dir / f".tmp-{key}-{uuid.uuid4().hex}"
+        artifacts = tmp / "artifacts"
+        artifacts.mkdir(parents=True)
+        for src in _output_files(workspace, since):
+            dst = artifacts / src.relative_to(workspace)
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(src, dst)
+        (tmp / "result.json").write_text(json.dumps(result, indent=2, default=str))
+
+        with self._lock:
+            entry = self.cache_dir / key
+            if entry.exists():
+                shutil.rmtree(tmp)
+            else:
+                os.replace(tmp, entry)
+            self._evict()
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def size_bytes(self) -> int:
+        return sum(f.stat().st_size for f in self.cache_dir.rglob("*") if f.is_file())
+
+    def _evict(self):
+        """Drop least-recently-used entries until the cache fits max_bytes."""
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            meta = entry / "result.json"
+            if entry.name.startswith(".tmp-") or not meta.exists():
+                continue
+            size = sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
+            entries.append((meta.stat().st_mtime, size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+def _output_files(workspace: Path, since: Optional[float] = None) -> List[Path]:
+    """Files in an SSA workspace produced by its script (report, figures, data).
+
+    With `since`, only files modified at or after that time.
+    """
+    outputs = []
+    for f in workspace.rglob("*"):
+        if not f.is_file() or "__pycache__" in f.parts:
+            continue
+        if f.suffix in _INPUT_SUFFIXES or f.name in _INPUT_NAMES:
+            continue
+        if since is not None and f.stat().st_mtime < since - _MTIME_SLACK:
+            continue
+        outputs.append(f)
+    return outputs
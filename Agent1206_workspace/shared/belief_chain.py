@@ -0,0 +1,159 @@
+"""
+Exact ergodic averages for SR beliefs via the finite (state, belief) chain.
+
+When the LR strategy reveals enough (e.g. the deterministic Stackelberg
+strategy, under which every action pins down the state), the Bayesian
+filter only ever visits finitely many beliefs. The pair (theta_t, b_t)
+is then a finite Markov chain:
+
+    theta_{t+1} ~ T[theta_t],  a_{t+1} ~ strategy[theta_{t+1}],
+    b_{t+1} = normalize(T' b_t * strategy[:, a_{t+1}])   (pi if impossible)
+
+`BeliefChain` enumerates its reachable support from (theta_0 ~ pi,
+b_0 = prior), builds the transition matrix and gives exact stationary and
+finite-horizon expectations of any belief functional, replacing long
+simulated paths with one small linear solve.
+
+Usage:
+    bc = BeliefChain(mc, make_strategy_matrix(game.stackelberg_strategy))
+    tv = lambda b: tv_distance(b, mc.pi)
+    bc.stationary_expectation(tv)       # lim (1/T) sum_t TV(b_t, pi)
+    bc.time_average(tv, T=5000)         # E[(1/T) sum_{t<T} TV(b_t, pi)]
+"""
+
+import numpy as np
+from typing import Callable, Optional
+
+from shared.markov_utils import MarkovChain, stationary_distribution
+
+
+class BeliefChain:
+    """Joint Markov chain of the hidden state and the SR filter belief.
+
+    Attributes
+    ----------
+    beliefs : np.ndarray
+        (n_beliefs, n_states) reachable beliefs; row 0 is the prior
+    nodes : np.ndarray
+        (n_nodes, 2) int pairs (state, belief index)
+    P : np.ndarray
+        (n_nodes, n_nodes) transition matrix of the joint chain
+    initial : np.ndarray
+        (n_nodes,) distribution of the node at t = 0
+    """
+
+    def __init__(self, mc: MarkovChain, strategy_matrix: np.ndarray,
+                 prior: Optional[np.ndarray] = None, decimals: int = 12,
+                 max_beliefs: int = 2000):
+        """
+        Parameters
+        ----------
+        mc : MarkovChain
+        strategy_matrix : np.ndarray
+            strategy_matrix[state, action] = Pr(action | state)
+        prior : np.ndarray, optional
+            Belief at t = 0 (default mc.pi)
+        decimals : int
+            Beliefs equal after rounding to this many decimals are merged
+        max_beliefs : int
+            Raise ValueError if the reachable belief set grows past this,
+            i.e. the strategy does not reveal enough for a finite chain
+        """
+        self.mc = mc
+        self.strategy_matrix = np.asarray(strategy_matrix, dtype=float)
+        prior = mc.pi if prior is None else np.asarray(prior, dtype=float)
+        n = mc.n_states
+
+        beliefs = [prior]
+        index = {self._key(prior, decimals): 0}
+        # successors[b][a] = (belief index after action a, Pr(a | theta') per theta')
+        successors = []
+        frontier = 0
+        while frontier < len(beliefs):
+            predicted = mc.T.T @ beliefs[frontier]
+            out = {}
+            for a in range(self.strategy_matrix.shape[1]):
+                lik = self.strategy_matrix[:, a]
+                if not np.any(lik > 0):
+                    continue
+                posterior = predicted * lik
+                total = posterior.sum()
+                posterior = posterior / total if total > 0 else mc.pi.copy()
+                key = self._key(posterior, decimals)
+                if key not in index:
+                    if len(beliefs) >= max_beliefs:
+                        raise ValueError(f"Belief support exceeds max_beliefs={max_beliefs}; "
+                                         "the strategy does not yield a finite belief chain")
+                    index[key] = len(beliefs)
+                    beliefs.append(posterior)
+                out[a] = index[key]
+            successors.append(out)
+            frontier += 1
+        self.beliefs = np.array(beliefs)
+
+        # Joint nodes (theta, b) and transitions, enumerated from t = 0
+        node_index = {}
+        nodes = []
+
+        def node(theta, b):
+            if (theta, b) not in node_index:
+                node_index[(theta, b)] = len(nodes)
+                nodes.append((theta, b))
+            return node_index[(theta, b)]
+
+        initial = {node(theta, 0): mc.pi[theta] for theta in range(n) if mc.pi[theta] > 0}
+        edges = []
+        k = 0
+        while k < len(nodes):
+            theta, b = nodes[k]
+            for theta_next in range(n):
+                p_state = mc.T[theta, theta_next]
+                if p_state == 0:
+                    continue
+                for a, b_next in successors[b].items():
+                    p = p_state * self.strategy_matrix[theta_next, a]
+                    if p > 0:
+                        edges.append((k, node(theta_next, b_next), p))
+            k += 1
+
+        self.nodes = np.array(nodes, dtype=int)
+        self.P = np.zeros((len(nodes), len(nodes)))
+        for i, j, p in edges:
+            self.P[i, j] += p
+        self.initial = np.zeros(len(nodes))
+        self.initial[list(initial)] = list(initial.values())
+
+    @staticmethod
+    def _key(belief, decimals):
+        return tuple(np.round(belief, decimals) + 0.0)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.nodes)
+
+    def node_values(self, f: Callable) -> np.ndarray:
+        """f evaluated at the belief of every node; f maps (m, n_states) -> (m,)."""
+        return np.asarray(f(self.beliefs), dtype=float)[self.nodes[:, 1]]
+
+    def stationary(self) -> np.ndarray:
+        """Stationary distribution over nodes (zero on transient nodes)."""
+        return stationary_distribution(self.P)
+
+    def belief_distribution(self) -> np.ndarray:
+        """Stationary probability of each reachable belief."""
+        return np.bincount(self.nodes[:, 1], weights=self.stationary(),
+                           minlength=len(self.beliefs))
+
+    def stationary_expectation(self, f: Callable) -> float:
+        """Ergodic average lim (1/T) sum_t f(b_t)."""
+        return float(self.stationary() @ self.node_values(f))
+
+    def time_average(self, f: Callable, T: int) -> float:
+        """Exact E[(1/T) sum_{t=0}^{T-1} f(b_t)] from the t = 0 distribution."""
+        values = self.node_values(f)
+        dist = self.initial.copy()
+        total = 0.0
+        for _ in range(T):
+            total += dist @ values
+            dist = dist @ self.P
+        return total / T
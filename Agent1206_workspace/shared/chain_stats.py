@@ -0,0 +1,187 @@
+"""
+Online sufficient statistics for validating simulated Markov chains.
+
+`TransitionAccumulator` consumes state chunks of shape (n_paths, t) from
+any simulator and keeps only running totals: transition counts, per-path
+occupancy frequencies and lag-k autocorrelation sums. Memory does not
+grow with the horizon or with the number of paths seen, so a validation
+can keep drawing batches until the confidence intervals are narrow enough.
+
+Usage:
+    acc = TransitionAccumulator(n_states=2, max_lag=3)
+    while acc.n_paths < max_paths:
+        acc.update(mc.simulate_batch(batch, T, rng=rng), new_paths=True)
+        if acc.n_paths >= 2 * batch and acc.max_ci_halfwidth() <= target:
+            break
+    acc.transition_matrix(), acc.stationary(), acc.autocorrelation(1)
+
+Chunks continue the current paths in time (the transition across the
+chunk boundary is counted) unless `new_paths=True`, which starts a fresh
+set of independent paths.
+
+Confidence intervals (normal approximation, half-widths):
+- transition probabilities: z * sqrt(p (1 - p) / N_i), with N_i the number
+  of transitions out of state i (transitions out of a state are
+  conditionally independent given the visits, so this is the MLE's
+  asymptotic standard error);
+- stationary distribution: z * (across-path std of the occupancy
+  frequencies) / sqrt(n_paths), which accounts for within-path correlation
+  because independent paths are the batches.
+"""
+
+import numpy as np
+from typing import Tuple
+
+
+class TransitionAccumulator:
+    """Incremental transition counts, stationary estimate and autocorrelation.
+
+    Attributes
+    ----------
+    counts : np.ndarray
+        (n_states, n_states) transition counts pooled over all paths
+    state_counts : np.ndarray
+        (n_states,) number of visits to each state
+    n_paths : int
+        Paths seen so far (closed and current)
+    n_steps : int
+        States seen so far, over all paths
+    """
+
+    def __init__(self, n_states: int = 2, max_lag: int = 1):
+        self.n_states = n_states
+        self.max_lag = max_lag
+        self.counts = np.zeros((n_states, n_states), dtype=np.int64)
+        self.state_counts = np.zeros(n_states, dtype=np.int64)
+        self.n_steps = 0
+
+        # Per-path occupancy frequencies of closed paths (Chan et al. merge)
+        self._closed_paths = 0
+        self._freq_mean = np.zeros(n_states)
+        self._freq_m2 = np.zeros(n_states)
+
+        # Current paths: visit counts and the last max_lag states of each
+        self._path_counts = np.zeros((0, n_states), dtype=np.int64)
+        self._tail = np.zeros((0, 0), dtype=np.int64)
+
+        # Moments of the state index x_t, and sum_t x_t x_{t+k} per lag
+        self._x_sum = 0.0
+        self._x2_sum = 0.0
+        self._lag_sum = np.zeros(max_lag)
+        self._lag_n = np.zeros(max_lag, dtype=np.int64)
+
+    @property
+    def n_paths(self) -> int:
+        return self._closed_paths + len(self._path_counts)
+
+    def update(self, states: np.ndarray, new_paths: bool = False):
+        """Add a chunk of shape (n_paths, t) (or (t,) for a single path).
+
+        The chunk continues the current paths unless new_paths is True or
+        no paths have been seen yet.
+        """
+        states = np.asarray(states, dtype=np.int64)
+        if states.ndim == 1:
+            states = states[None, :]
+        if new_paths or self._tail.shape[0] == 0:
+            self._close_paths()
+            self._path_counts = np.zeros((len(states), self.n_states), dtype=np.int64)
+            self._tail = states[:, :0]
+        elif len(states) != len(self._path_counts):
+            raise ValueError(f"Chunk has {len(states)} paths; the current paths are "
+                             f"{len(self._path_counts)} (pass new_paths=True to start new ones)")
+        if states.shape[1] == 0:
+            return
+
+        n = self.n_states
+        ext = np.concatenate([self._tail, states], axis=1)
+        L = self._tail.shape[1]
+
+        # Transitions ending in this chunk (including the one across the boundary)
+        pairs = ext[:, max(L - 1, 0):-1] * n + ext[:, max(L, 1):]
+        self.counts += np.bincount(pairs.ravel(), minlength=n * n).reshape(n, n)
+
+        visits = (states[:, :, None] == np.arange(n)).sum(axis=1)
+        self._path_counts += visits
+        self.state_counts += visits.sum(axis=0)
+        self.n_steps += states.size
+
+        x = states.astype(float)
+        self._x_sum += x.sum()
+        self._x2_sum += (x * x).sum()
+        ext_x = ext.astype(float)
+        for k in range(1, self.max_lag + 1):
+            start = max(L, k)
+            self._lag_sum[k - 1] += (ext_x[:, start - k:-k] * ext_x[:, start:]).sum()
+            self._lag_n[k - 1] += ext_x[:, start:].size
+
+        self._tail = ext[:, -max(self.max_lag, 1):]
+
+    def _path_frequencies(self) -> Tuple[int, np.ndarray, np.ndarray]:
+        """(count, mean, M2) of per-path occupancy frequencies, closed and current."""
+        total = self._path_counts.sum(axis=1, keepdims=True)
+        freqs = self._path_counts[total[:, 0] > 0] / total[total[:, 0] > 0]
+        n_a, n_b = self._closed_paths, len(freqs)
+        if n_b == 0:
+            return n_a, self._freq_mean, self._freq_m2
+        mean_b = freqs.mean(axis=0)
+        m2_b = ((freqs - mean_b) ** 2).sum(axis=0)
+        count = n_a + n_b
+        delta = mean_b - self._freq_mean
+        mean = self._freq_mean + delta * n_b / count
+        m2 = self._freq_m2 + m2_b + delta ** 2 * n_a * n_b / count
+        return count, mean, m2
+
+    def _close_paths(self):
+        count, self._freq_mean, self._freq_m2 = self._path_frequencies()
+        self._closed_paths = count
+        self._path_counts = np.zeros((0, self.n_states), dtype=np.int64)
+        self._tail = np.zeros((0, 0), dtype=np.int64)
+
+    # ------------------------------------------------------------------
+    # Estimates
+    # ------------------------------------------------------------------
+
+    def transition_matrix(self) -> np.ndarray:
+        """Maximum-likelihood transition matrix (rows with no visits are 0)."""
+        rows = self.counts.sum(axis=1, keepdims=True)
+        return np.divide(self.counts, rows, out=np.zeros(self.counts.shape), where=rows > 0)
+
+    def transition_ci(self, z: float = 1.96) -> np.ndarray:
+        """CI half-widths of transition_matrix() (inf for rows with no visits)."""
+        P = self.transition_matrix()
+        rows = self.counts.sum(axis=1, keepdims=True)
+        var = np.divide(P * (1 - P), rows, out=np.full(P.shape, np.inf), where=rows > 0)
+        return z * np.sqrt(var)
+
+    def stationary(self) -> np.ndarray:
+        """Mean over paths of the per-path occupancy frequencies."""
+        return self._path_frequencies()[1]
+
+    def stationary_std(self) -> np.ndarray:
+        """Across-path standard deviation of the occupancy frequencies."""
+        count, _, m2 = self._path_frequencies()
+        return np.sqrt(m2 / max(count, 1))
+
+    def stationary_ci(self, z: float = 1.96) -> np.ndarray:
+        """CI half-widths of stationary() (inf with fewer than two paths)."""
+        count, _, m2 = self._path_frequencies()
+        if count < 2:
+            return np.full(self.n_states, np.inf)
+        return z * np.sqrt(m2 / (count - 1) / count)
+
+    def autocorrelation(self, lag: int = 1) -> float:
+        """Pooled lag-k autocorrelation of the state index sequence."""
+        if not 1 <= lag <= self.max_lag:
+            raise ValueError(f"lag must be in 1..{self.max_lag}, got {lag}")
+        if self._lag_n[lag - 1] == 0:
+            return np.nan
+        mean = self._x_sum / self.n_steps
+        var = self._x2_sum / self.n_steps - mean ** 2
+        if var <= 0:
+            return np.nan
+        return float((self._lag_sum[lag - 1] / self._lag_n[lag - 1] - mean ** 2) / var)
+
+    def max_ci_halfwidth(self, z: float = 1.96) -> float:
+        """Largest CI half-width over the stationary and transition estimates."""
+        return float(max(self.stationary_ci(z).max(), self.transition_ci(z).max()))
@@ -0,0 +1,282 @@
+"""
+Exact distribution of the number of distinguishing periods by forward DP.
+
+For a 2-state chain and two signal processes Q and P (strategy matrices
+sigma_q, sigma_p), an SR player who runs the Bayesian filter under each
+hypothesis sees the predictive signal distributions q_t and p_t. The
+count N_eta = #{t < T : TV(q_t, p_t) > eta} is a function of the path, and
+simulate-and-count estimates its law from replicates.
+
+Here the law is computed directly. The pair of filter posteriors,
+together with the current state, is a Markov chain:
+
+    node_t = (theta_t, b^q_{t-1}, b^p_{t-1})
+    y^q_t ~ sigma_q[theta_t],  y^p_t ~ sigma_p[theta_t]  (independent)
+    b^x_t = Bayes(T' b^x_{t-1}, y^x_t),  theta_{t+1} ~ K[theta_t]
+
+and the count increments by 1 whenever TV(q_t, p_t) > eta at the source
+node. Mass over (node, count) is pushed forward through T periods, which
+costs O(T * nnz * count width) whatever the number of replicates would be.
+
+- A revealing strategy (e.g. Stackelberg) yields finitely many posteriors,
+  which are enumerated exactly.
+- A noisy strategy yields a continuum. Posteriors are then placed on a grid
+  of Pr(state 0): each one is split between its two neighbouring grid points
+  so the mean belief is preserved. Refining the grid converges to the exact law.
+- Entries below `tol` are dropped after every step. The discarded total is
+  reported as `CountDistribution.pruned`.
+
+Usage:
+    dists = count_distribution(mc, sigma_q, sigma_p, T=5000, etas=[0.05, 0.1])
+    d = dists[0.1]
+    d.mean(), d.std(), d.sf(theoretical_bound(mu0, 0.1))  # P(N > T_bar)
+
+The filters always assume `mc`. Pass `state_T` to draw the true states from
+a different kernel (e.g. np.tile(mc.pi, (2, 1)) for i.i.d. states).
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import breadth_first_order
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from shared.markov_utils import MarkovChain, tv_distance
+
+
+class CountDistribution:
+    """Probability mass function of a count on {offset, ..., offset + len(pmf) - 1}.
+
+    Attributes
+    ----------
+    pmf : np.ndarray
+        Pr(N = offset + k) for k = 0, ..., len(pmf) - 1
+    offset : int
+        Smallest count with retained mass
+    pruned : float
+        Total mass dropped by pruning (pmf sums to 1 - pruned)
+    """
+
+    def __init__(self, pmf: np.ndarray, offset: int = 0, pruned: float = 0.0):
+        self.pmf = np.asarray(pmf, dtype=float)
+        self.offset = int(offset)
+        self.pruned = float(pruned)
+
+    def __repr__(self):
+        return (f"CountDistribution(support=[{self.offset}, {self.offset + len(self.pmf) - 1}], "
+                f"mean={self.mean():.3f}, pruned={self.pruned:.1e})")
+
+    @property
+    def support(self) -> np.ndarray:
+        return self.offset + np.arange(len(self.pmf))
+
+    def mean(self) -> float:
+        return float(self.pmf @ self.support / self.pmf.sum())
+
+    def std(self) -> float:
+        second = self.pmf @ self.support.astype(float) ** 2 / self.pmf.sum()
+        return float(np.sqrt(max(second - self.mean() ** 2, 0.0)))
+
+    def cdf(self, x: float) -> float:
+        """Pr(N <= x)."""
+        return float(self.pmf[self.support <= x].sum())
+
+    def sf(self, x: float) -> float:
+        """Pr(N > x)."""
+        return float(self.pmf[self.support > x].sum())
+
+    def quantile(self, q: float) -> int:
+        """Smallest count c with Pr(N <= c) >= q."""
+        k = np.searchsorted(np.cumsum(self.pmf), q * self.pmf.sum())
+        return self.offset + int(min(k, len(self.pmf) - 1))
+
+
+def belief_lattice(mc: MarkovChain, strategy_matrix: np.ndarray,
+                   prior: Optional[np.ndarray] = None,
+                   grid: Union[None, int, np.ndarray] = None,
+                   decimals: int = 12, max_beliefs: int = 2000
+                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Posteriors Pr(state 0) of the 2-state filter and their successors.
+
+    Parameters
+    ----------
+    mc : MarkovChain
+        Chain assumed by the filter (2 states)
+    strategy_matrix : np.ndarray
+        strategy_matrix[state, signal] = Pr(signal | state)
+    prior : np.ndarray, optional
+        Belief before the first signal (default mc.pi)
+    grid : int or np.ndarray, optional
+        None enumerates the reachable posteriors exactly. Otherwise use
+        grid points in [0, 1] (an int gives that many equally spaced points)
+        and interpolate each posterior between its two neighbours.
+    decimals : int
+        Exact posteriors equal after rounding to this many decimals are merged
+    max_beliefs : int
+        Raise ValueError if exact enumeration grows past this many beliefs
+
+    Returns (beliefs, succ, weight): beliefs has shape (m,) with
+    beliefs[0] = prior; succ and weight have shape (m, n_signals, 2).
+    After signal y, belief i moves to succ[i, y, 0] with probability
+    weight[i, y, 0] and to succ[i, y, 1] with probability weight[i, y, 1].
+    """
+    if mc.n_states != 2:
+        raise ValueError("belief_lattice supports 2-state chains only")
+    sigma = np.asarray(strategy_matrix, dtype=float)
+    prior_g = float((mc.pi if prior is None else np.asarray(prior))[0])
+
+    def update(b):
+        """Posteriors after each signal, shape (len(b), n_signals)."""
+        pred = b * mc.T[0, 0] + (1 - b) * mc.T[1, 0]
+        num = pred[:, None] * sigma[0]
+        den = num + (1 - pred[:, None]) * sigma[1]
+        return np.divide(num, den, out=np.full(den.shape, mc.pi[0]), where=den > 0)
+
+    if grid is None:
+        beliefs = [prior_g]
+        index = {round(prior_g, decimals): 0}
+        succ_rows = []
+        frontier = 0
+        while frontier < len(beliefs):
+            row = []
+            for b_next in update(np.array([beliefs[frontier]]))[0]:
+                key = round(float(b_next), decimals)
+                if key not in index:
+                    if len(beliefs) >= max_beliefs:
+                        raise ValueError(f"Belief support exceeds max_beliefs={max_beliefs}; "
+                                         "pass a grid for this strategy")
+                    index[key] = len(beliefs)
+                    beliefs.append(float(b_next))
+                row.append(index[key])
+            succ_rows.append(row)
+            frontier += 1
+        succ = np.repeat(np.array(succ_rows)[..., None], 2, axis=-1)
+        weight = np.zeros(succ.shape)
+        weight[..., 0] = 1.0
+        return np.array(beliefs), succ, weight
+
+    points = np.linspace(0, 1, grid) if np.ndim(grid) == 0 else np.sort(np.asarray(grid, float))
+    beliefs = np.concatenate([[prior_g], points])
+    post = np.clip(update(beliefs), points[0], points[-1])
+    hi = np.clip(np.searchsorted(points, post), 1, len(points) - 1)
+    lo = hi - 1
+    w_hi = (post - points[lo]) / (points[hi] - points[lo])
+    succ = np.stack([lo, hi], axis=-1) + 1
+    weight = np.stack([1 - w_hi, w_hi], axis=-1)
+    return beliefs, succ, weight
+
+
+def _predictive(beliefs, mc, strategy_matrix):
+    """Signal distributions (m, n_signals) predicted from posteriors Pr(state 0)."""
+    pred = beliefs * mc.T[0, 0] + (1 - beliefs) * mc.T[1, 0]
+    return pred[:, None] * strategy_matrix[0] + (1 - pred[:, None]) * strategy_matrix[1]
+
+
+def count_distribution(mc: MarkovChain, sigma_q: np.ndarray, sigma_p: np.ndarray,
+                       T: int, etas: Iterable[float],
+                       state_T: Optional[np.ndarray] = None,
+                       initial: Optional[np.ndarray] = None,
+                       q_grid: Union[None, int, np.ndarray] = None,
+                       p_grid: Union[None, int, np.ndarray] = 1001,
+                       tol: float = 1e-14) -> Dict[float, CountDistribution]:
+    """Law of #{t < T : TV(q_t, p_t) > eta} for each eta, by forward DP.
+
+    Parameters
+    ----------
+    mc : MarkovChain
+        Chain assumed by both filters (2 states)
+    sigma_q, sigma_p : np.ndarray
+        Strategy matrices generating the signals the two filters see
+    T : int
+        Number of periods
+    etas : iterable of float
+        TV thresholds
+    state_T : np.ndarray, optional
+        Transition matrix of the true states (default mc.T)
+    initial : np.ndarray, optional
+        Distribution of theta_0 (default mc.pi); both filters start at mc.pi
+    q_grid, p_grid : int or np.ndarray, optional
+        Belief grids for the two filters (see belief_lattice); None is exact
+    tol : float
+        Drop (node, count) entries with less mass than this after each step;
+        ValueError if that leaves no mass at all
+
+    Returns {eta: CountDistribution}.
+    """
+    sigma_q = np.asarray(sigma_q, dtype=float)
+    sigma_p = np.asarray(sigma_p, dtype=float)
+    K = mc.T if state_T is None else np.asarray(state_T, dtype=float)
+    initial = mc.pi if initial is None else np.asarray(initial, dtype=float)
+    P, start, nodes = _node_chain(mc, sigma_q, sigma_p, K, initial, q_grid, p_grid)
+    beliefs_q, beliefs_p = nodes['beliefs_q'], nodes['beliefs_p']
+    tv = tv_distance(_predictive(beliefs_q[nodes['q']], mc, sigma_q),
+                     _predictive(beliefs_p[nodes['p']], mc, sigma_p))
+    P_t = P.T.tocsr()
+
+    results = {}
+    for eta in etas:
+        hit = (tv > eta)[:, None]
+        mass = start[:, None].copy()
+        offset, pruned = 0, 0.0
+        for t in range(T):
+            # Count the current period at the source node, then move the mass
+            shifted = np.zeros((len(mass), mass.shape[1] + 1))
+            shifted[:, :-1] = np.where(hit, 0.0, mass)
+            shifted[:, 1:] += np.where(hit, mass, 0.0)
+            mass = P_t @ shifted
+            small = mass < tol
+            pruned += mass[small].sum()
+            mass[small] = 0.0
+            cols = np.flatnonzero(mass.any(axis=0))
+            if len(cols) == 0:
+                raise ValueError(f"All mass fell below tol={tol} after {t + 1} periods "
+                                 f"(eta={eta}); use a smaller tol")
+            offset += cols[0]
+            mass = mass[:, cols[0]:cols[-1] + 1]
+        results[eta] = CountDistribution(mass.sum(axis=0), offset=offset, pruned=pruned)
+    return results
+
+
+def _node_chain(mc, sigma_q, sigma_p, K, initial, q_grid, p_grid):
+    """Sparse transition matrix over reachable (theta, b^q, b^p) nodes.
+
+    Returns (P, start, nodes): P restricted to nodes reachable from the
+    t = 0 nodes, the distribution over them at t = 0, and a dict with the
+    state and belief indices of every node and the two belief arrays.
+    """
+    beliefs_q, succ_q, w_q = belief_lattice(mc, sigma_q, grid=q_grid)
+    beliefs_p, succ_p, w_p = belief_lattice(mc, sigma_p, grid=p_grid)
+    n, m_q, m_p = mc.n_states, len(beliefs_q), len(beliefs_p)
+    theta, iq, ip = (a.ravel() for a in np.meshgrid(np.arange(n), np.arange(m_q),
+                                                     np.arange(m_p), indexing='ij'))
+    n_nodes = len(theta)
+
+    # One edge per (node, y^q, y^p, q neighbour, p neighbour, theta')
+    rows, cols, vals = [], [], []
+    for yq in range(sigma_q.shape[1]):
+        for yp in range(sigma_p.shape[1]):
+            p_sig = sigma_q[theta, yq] * sigma_p[theta, yp]
+            for a in range(2):
+                for b in range(2):
+                    p_bel = p_sig * w_q[iq, yq, a] * w_p[ip, yp, b]
+                    q_next, p_next = succ_q[iq, yq, a], succ_p[ip, yp, b]
+                    for theta_next in range(n):
+                        p = p_bel * K[theta, theta_next]
+                        keep = p > 0
+                        rows.append(np.flatnonzero(keep))
+                        cols.append((theta_next * m_q + q_next[keep]) * m_p + p_next[keep])
+                        vals.append(p[keep])
+    P = sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                          shape=(n_nodes, n_nodes))
+
+    start_full = np.zeros(n_nodes)
+    start_full[np.arange(n) * m_q * m_p] = initial
+
+    # Restrict to nodes reachable from the start (a virtual root feeds them)
+    root = sparse.csr_matrix((start_full > 0).astype(float)[None, :])
+    graph = sparse.bmat([[sparse.csr_matrix((1, 1)), root],
+                         [sparse.csr_matrix((n_nodes, 1)), P]], format='csr')
+    reach = np.sort(breadth_first_order(graph, 0, return_predecessors=False)[1:] - 1)
+    P = P[reach][:, reach]
+    nodes = {'theta': theta[reach], 'q': iq[reach], 'p': ip[reach],
+             'beliefs_q': beliefs_q, 'beliefs_p': beliefs_p}
+    return P, start_full[reach], nodes
@@ -0,0 +1,110 @@
+"""
+Deferred figure rendering with a compute-only mode.
+
+While computing, a script queues figure specs: a module-level plotting
+function plus the data it needs. The figures are all rendered at the end,
+in a process pool when more than one CPU is available. A plotting function
+builds and returns a matplotlib Figure; the queue saves it with
+`save_figure` (150 dpi, tight bounding box). The numbers and the report are
+therefore done before any rendering starts.
+
+Compute-only mode (`--no-figures` on the command line, or NO_FIGURES=1 in
+the environment, which the orchestrator sets for its scripts) drops the
+specs. Scripts import matplotlib only through `pyplot()` inside their
+plotting functions, so a compute-only run never imports it.
+
+Usage:
+    def plot_heatmap(heatmap, extent):
+        plt = pyplot()
+        fig, ax = plt.subplots()
+        ...
+        return fig
+
+    figures = FigureQueue()
+    figures.submit(plot_heatmap, os.path.join(FIG_DIR, 'heatmap.png'), heatmap, extent)
+    ...                                   # more computation, the report
+    for path in figures.render():
+        print(f"Saved: {path}")
+"""
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+from shared.workers import default_workers
+
+NO_FIGURES_FLAG = '--no-figures'
+NO_FIGURES_ENV = 'NO_FIGURES'
+
+
+def figures_enabled() -> bool:
+    """False in compute-only mode (--no-figures or NO_FIGURES=1)."""
+    return NO_FIGURES_FLAG not in sys.argv and os.environ.get(NO_FIGURES_ENV, '0') != '1'
+
+
+def pyplot():
+    """matplotlib.pyplot on the Agg backend, imported on first use."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+class FigureQueue:
+    """Figure specs collected during computation and rendered at the end.
+
+    Attributes
+    ----------
+    enabled : bool
+        False in compute-only mode; submit() then records nothing
+    """
+
+    def __init__(self, n_workers: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        n_workers : int, optional
+            Rendering processes (default: the script's worker budget, see
+            shared/workers.py); 1 renders in-process
+        """
+        self.n_workers = n_workers or default_workers()
+        self.enabled = figures_enabled()
+        self._specs = []
+
+    def __len__(self):
+        return len(self._specs)
+
+    def submit(self, plot_fn: Callable, path: str, *args, **kwargs) -> Optional[str]:
+        """Queue plot_fn(*args, **kwargs) -> Figure, to be saved at `path`.
+
+        plot_fn must be a module-level function and its arguments picklable,
+        as they are sent to a worker process. Returns `path`, or None in
+        compute-only mode.
+        """
+        if not self.enabled:
+            return None
+        self._specs.append((plot_fn, path, args, kwargs))
+        return path
+
+    def render(self) -> List[str]:
+        """Render and save every queued figure; returns the paths in submission order."""
+        specs, self._specs = self._specs, []
+        n_workers = min(self.n_workers, len(specs))
+        if n_workers <= 1:
+            return [_render(spec) for spec in specs]
+        # Forked workers resolve plot functions defined in the script's __main__
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+            return list(pool.map(_render, specs))
+
+
+def _render(spec) -> str:
+    from shared.markov_utils import save_figure
+
+    plot_fn, path, args, kwargs = spec
+    fig = plot_fn(*args, **kwargs)
+    save_figure(fig, path)
+    return path
@@ -0,0 +1,104 @@
+"""
+Forgetting rates of the HMM Bayesian filter without Monte Carlo over paths.
+
+The unnormalized filter update after signal y is b -> M_y b with
+M_y = diag(strategy[:, y]) T^T, so two filters started from different
+priors are driven by the same random matrix product M_{y_t} ... M_{y_1}.
+Their distance decays at:
+
+- at most the Birkhoff contraction coefficient tau(M_y) per step, in the
+  Hilbert projective metric (a deterministic worst-case bound);
+- asymptotically exp(lambda_2 - lambda_1), the gap between the top two
+  Lyapunov exponents of the product, estimated from one long signal path.
+
+lambda_1 comes from the norm of the product and lambda_1 + lambda_2 from
+the product of the second compound matrices (the 2x2 minors; for two
+states, the determinants). Both products are reduced pairwise, O(log T)
+vectorized matmuls, rescaling as they go.
+"""
+
+import numpy as np
+from itertools import combinations
+from typing import Tuple
+
+
+def filter_matrices(T: np.ndarray, strategy_matrix: np.ndarray) -> np.ndarray:
+    """Unnormalized filter update matrices M[y] = diag(strategy[:, y]) @ T.T.
+
+    Returns an array of shape (n_signals, n_states, n_states).
+    """
+    return strategy_matrix.T[:, :, None] * T.T[None, :, :]
+
+
+def birkhoff_contraction(M: np.ndarray) -> np.ndarray:
+    """Birkhoff contraction coefficient tau(M) = (1 - sqrt(phi)) / (1 + sqrt(phi)).
+
+    phi = min over i, j, k, l of M[i, k] M[j, l] / (M[j, k] M[i, l]).
+    tau is 1 for matrices with a zero entry. Accepts a single matrix or a
+    stack (..., n, n).
+    """
+    M = np.asarray(M, dtype=float)
+    positive = np.all(M > 0, axis=(-2, -1))
+    safe = np.where(positive[..., None, None], M, 1.0)
+    logM = np.log(safe)
+    # cross[..., i, j, k, l] = log M_ik + log M_jl - log M_jk - log M_il
+    cross = (logM[..., :, None, :, None] + logM[..., None, :, None, :]
+             - logM[..., None, :, :, None] - logM[..., :, None, None, :])
+    root_phi = np.exp(0.5 * cross.min(axis=(-4, -3, -2, -1)))
+    return np.where(positive, (1 - root_phi) / (1 + root_phi), 1.0)
+
+
+def compound_matrix(M: np.ndarray) -> np.ndarray:
+    """Second compound (matrix of 2x2 minors) of each matrix in a stack (..., n, n)."""
+    n = M.shape[-1]
+    pairs = list(combinations(range(n), 2))
+    r = np.array(pairs)
+    rows0, rows1 = r[:, 0][:, None], r[:, 1][:, None]
+    cols0, cols1 = r[:, 0][None, :], r[:, 1][None, :]
+    return (M[..., rows0, cols0] * M[..., rows1, cols1]
+            - M[..., rows0, cols1] * M[..., rows1, cols0])
+
+
+def log_product_norm(mats: np.ndarray) -> float:
+    """log of the max-abs norm of mats[-1] @ ... @ mats[0], without under/overflow."""
+    mats = np.array(mats, dtype=float)
+    log_scale = 0.0
+    while len(mats) > 1:
+        if len(mats) % 2:
+            mats = np.concatenate([mats, np.eye(mats.shape[-1])[None]])
+        mats = mats[1::2] @ mats[0::2]
+        scale = np.abs(mats).max(axis=(-2, -1))
+        if np.any(scale == 0):
+            return -np.inf
+        mats /= scale[:, None, None]
+        log_scale += np.log(scale).sum()
+    return log_scale + np.log(np.abs(mats[0]).max())
+
+
+def lyapunov_forgetting_rate(mc, strategy_matrix: np.ndarray, n_steps: int = 20000,
+                             rng=None) -> Tuple[float, float, float]:
+    """Asymptotic filter forgetting rate exp(lambda_2 - lambda_1) from one signal path.
+
+    Parameters
+    ----------
+    mc : MarkovChain
+        Hidden chain (T, simulate_batch)
+    strategy_matrix : np.ndarray
+        strategy_matrix[state, signal] = Pr(signal | state)
+    n_steps : int
+        Length of the simulated path
+    rng : np.random.Generator, optional
+
+    Returns (rate, lambda_1, lambda_2).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    states = mc.simulate_batch(1, n_steps, rng=rng)[0]
+    cdf = np.cumsum(strategy_matrix[states], axis=1)
+    signals = (rng.random(n_steps)[:, None] > cdf[:, :-1]).sum(axis=1)
+
+    M = filter_matrices(mc.T, strategy_matrix)
+    lam1 = log_product_norm(M[signals]) / n_steps
+    lam12 = log_product_norm(compound_matrix(M)[signals]) / n_steps
+    lam2 = lam12 - lam1
+    return float(np.exp(lam2 - lam1)), float(lam1), float(lam2)
@@ -0,0 +1,197 @@
+"""
+Batched play of the deterrence game with a belief-driven SR player.
+
+The LR player follows a pure strategy; the SR player best-responds to a
+belief about the state, either the stationary pi(G) ("stationary") or the
+Bayesian filter on past LR actions ("filtered"). Everything is evaluated
+for a whole (n_runs, T) state array at once:
+
+- SR best response: one threshold comparison mu > mu*, with mu* solved
+  from the SR payoff matrix;
+- LR payoffs: fancy-indexing the (state, lr_action, sr_action) payoff tensor;
+- beliefs: one BatchBayesianFilter step per period for all runs.
+
+Both scenarios replay the same states in one pass. `play` returns full
+(n_runs, T) arrays. `play_means` walks the horizon in time chunks and keeps
+only per-run averages, so n_runs = 10^4 and beyond fit in memory.
+
+Usage:
+    engine = GameEngine(mc, DeterrenceGame())
+    res = engine.play(mc.simulate_batch(n_runs, T, rng=rng))
+    res['filtered']['lr_payoffs'].mean(axis=1)
+    means = engine.play_means(states)        # per-run averages only
+"""
+
+import numpy as np
+from typing import Dict, Optional, Sequence
+
+from shared.markov_utils import (
+    MarkovChain, DeterrenceGame, BatchBayesianFilter, make_strategy_matrix
+)
+
+# SR payoffs u2[state, sr_action]: state 0=G, 1=B; action 0=C, 1=D
+SR_PAYOFFS = np.array([
+    [1.0, 0.0],
+    [-1.0, 0.5]
+])
+
+# LR payoff is u1(state, lr_action), scaled by this when SR defects
+SR_DEFECT_FACTOR = 0.5
+
+SCENARIOS = ('stationary', 'filtered')
+
+
+def sr_threshold(u2: np.ndarray = SR_PAYOFFS) -> float:
+    """Belief mu* = Pr(G) above which C beats D for the SR player.
+
+    E[u2(C)] - E[u2(D)] = mu d_G + (1 - mu) d_B with d = u2[:, C] - u2[:, D],
+    so mu* = d_B / (d_B - d_G). Requires C to be better in G and D in B.
+    """
+    d = u2[:, 0] - u2[:, 1]
+    if not (d[0] > 0 > d[1]):
+        raise ValueError("SR payoffs must favour C in G and D in B for a threshold rule")
+    return float(d[1] / (d[1] - d[0]))
+
+
+def lr_payoff_tensor(game: DeterrenceGame,
+                     defect_factor: float = SR_DEFECT_FACTOR) -> np.ndarray:
+    """payoffs[state, lr_action, sr_action]: u1, scaled by defect_factor under D."""
+    return game.u1[:, :, None] * np.array([1.0, defect_factor])
+
+
+class GameEngine:
+    """Vectorized LR/SR play over batches of state paths.
+
+    Attributes
+    ----------
+    strategy_matrix : np.ndarray
+        LR strategy, strategy_matrix[state, action] (pure: one 1 per row)
+    payoffs : np.ndarray
+        (n_states, n_lr_actions, n_sr_actions) LR payoff tensor
+    threshold : float
+        SR plays C iff belief > threshold
+    """
+
+    def __init__(self, mc: MarkovChain, game: DeterrenceGame,
+                 strategy_matrix: Optional[np.ndarray] = None,
+                 u2: np.ndarray = SR_PAYOFFS,
+                 defect_factor: float = SR_DEFECT_FACTOR):
+        """
+        Parameters
+        ----------
+        mc : MarkovChain
+        game : DeterrenceGame
+        strategy_matrix : np.ndarray, optional
+            Pure LR strategy (default Stackelberg)
+        u2 : np.ndarray
+            SR payoffs u2[state, sr_action]
+        defect_factor : float
+            LR payoff multiplier when SR plays D
+        """
+        self.mc = mc
+        self.game = game
+        if strategy_matrix is None:
+            strategy_matrix = make_strategy_matrix(game.stackelberg_strategy)
+        self.strategy_matrix = np.asarray(strategy_matrix, dtype=float)
+        if not np.all(self.strategy_matrix.max(axis=1) == 1):
+            raise ValueError("GameEngine plays pure LR strategies only")
+        self._lr_action = self.strategy_matrix.argmax(axis=1)
+        self.payoffs = lr_payoff_tensor(game, defect_factor)
+        self.threshold = sr_threshold(np.asarray(u2, dtype=float))
+
+    def sr_best_response(self, beliefs: np.ndarray, tie: int = 1) -> np.ndarray:
+        """SR actions for beliefs Pr(G): C (0) above the threshold, D (1) below.
+
+        Beliefs exactly at the threshold get `tie`.
+        """
+        beliefs = np.asarray(beliefs)
+        actions = np.where(beliefs > self.threshold, 0, 1)
+        if tie != 1:
+            actions[beliefs == self.threshold] = tie
+        return actions
+
+    def lr_actions(self, states: np.ndarray) -> np.ndarray:
+        return self._lr_action[states]
+
+    def filtered_beliefs(self, lr_actions: np.ndarray,
+                         bf: Optional[BatchBayesianFilter] = None) -> np.ndarray:
+        """Pr(G) held by the SR player before each period's LR action.
+
+        lr_actions has shape (n_runs, t). With `bf`, the paths continue from
+        that filter, which is left after the last action (for the next chunk).
+        Otherwise they start at mc.pi.
+        """
+        n_runs, t = lr_actions.shape
+        if bf is None:
+            bf = BatchBayesianFilter(self.mc, n_paths=n_runs)
+        beliefs = np.empty((n_runs, t))
+        for s in range(t):
+            beliefs[:, s] = bf.belief[:, 0]
+            bf.update(lr_actions[:, s], self.strategy_matrix)
+        return beliefs
+
+    def play(self, states: np.ndarray, scenarios: Sequence[str] = SCENARIOS,
+             tie: int = 1) -> Dict[str, Dict[str, np.ndarray]]:
+        """Play every scenario on the same state paths.
+
+        Parameters
+        ----------
+        states : np.ndarray
+            (n_runs, T) or (T,) state paths
+        scenarios : sequence of str
+            Any of 'stationary' (SR belief pi(G)) and 'filtered'
+        tie : int
+            SR action at beliefs exactly on the threshold
+
+        Returns {scenario: {'states', 'beliefs', 'lr_actions', 'sr_actions',
+        'lr_payoffs'}}, arrays with the shape of `states`.
+        """
+        single = np.ndim(states) == 1
+        states = np.atleast_2d(states)
+        lr_actions = self.lr_actions(states)
+        out = {}
+        for scenario in scenarios:
+            beliefs = self._beliefs(scenario, lr_actions)
+            sr_actions = self.sr_best_response(beliefs, tie)
+            res = {
+                'states': states,
+                'beliefs': beliefs,
+                'lr_actions': lr_actions,
+                'sr_actions': sr_actions,
+                'lr_payoffs': self.payoffs[states, lr_actions, sr_actions],
+            }
+            out[scenario] = {k: v[0] for k, v in res.items()} if single else res
+        return out
+
+    def play_means(self, states: np.ndarray, chunk_len: int = 500,
+                   tie: int = 1) -> Dict[str, np.ndarray]:
+        """Per-run averages over time of both scenarios, in time chunks.
+
+        Returns a dict of (n_runs,) arrays: 'payoff_stationary',
+        'payoff_filtered', 'coop_stationary', 'coop_filtered' (fraction of
+        periods SR plays C) and 'disagreement' (fraction of periods the two
+        SR actions differ).
+        """
+        n_runs, T = states.shape
+        bf = BatchBayesianFilter(self.mc, n_paths=n_runs)
+        sums = {name: np.zeros(n_runs) for name in
+                ('payoff_stationary', 'payoff_filtered', 'coop_stationary',
+                 'coop_filtered', 'disagreement')}
+        sr_stat = self.sr_best_response(self.mc.pi[0], tie)
+        for start in range(0, T, chunk_len):
+            block = np.asarray(states[:, start:start + chunk_len])
+            lr_actions = self.lr_actions(block)
+            sr_filt = self.sr_best_response(self.filtered_beliefs(lr_actions, bf), tie)
+            sums['payoff_stationary'] += self.payoffs[block, lr_actions, sr_stat].sum(axis=1)
+            sums['payoff_filtered'] += self.payoffs[block, lr_actions, sr_filt].sum(axis=1)
+            sums['coop_stationary'] += (sr_stat == 0) * block.shape[1]
+            sums['coop_filtered'] += (sr_filt == 0).sum(axis=1)
+            sums['disagreement'] += (sr_filt != sr_stat).sum(axis=1)
+        return {name: total / T for name, total in sums.items()}
+
+    def _beliefs(self, scenario, lr_actions):
+        if scenario == 'stationary':
+            return np.full(lr_actions.shape, self.mc.pi[0])
+        if scenario == 'filtered':
+            return self.filtered_beliefs(lr_actions)
+        raise ValueError(f"Unknown scenario {scenario!r}; expected one of {SCENARIOS}")
@@ -0,0 +1,194 @@
+"""
+Evaluation of per-cell kernels over (alpha, beta) parameter grids.
+
+A kernel computes the quantities for one grid cell (or, in vectorized mode,
+for all cells at once from broadcast alpha/beta arrays). `evaluate_grid`
+runs it over the grid serially, vectorized, or in chunks across a process
+pool, and collects the outputs in a labeled `GridResult`.
+
+Monte Carlo kernels take an `rng` keyword. In serial and process mode
+each cell gets its own seed, drawn from one SeedSequence, so results are
+the same for both modes and any chunking or worker count. The seeds are
+kept in the result, and any cell can be re-run alone with
+np.random.default_rng(result.seeds[i, j]). Vectorized mode instead draws
+all cells from one shared generator, so its draws differ from the other
+two modes.
+
+Usage:
+    def kernel(alpha, beta, rng):
+        ...
+        return {'mean_tv': m, 'std_tv': s}
+
+    result = evaluate_grid(kernel, alphas, betas, mode='process', seed=456)
+    result['mean_tv']                # (n_alpha, n_beta) array
+    result.sel(alpha=0.3, beta=0.5)  # {'mean_tv': ..., 'std_tv': ...}
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from shared.workers import default_workers
+
+MODES = ('serial', 'vectorized', 'process')
+
+
+class GridResult:
+    """Kernel outputs over an (alpha, beta) grid, indexed [alpha, beta, ...].
+
+    Attributes
+    ----------
+    alpha, beta : np.ndarray
+        Grid coordinates (dims 0 and 1 of every data array)
+    data : dict
+        Output name -> array of shape (n_alpha, n_beta) + per-cell shape
+    seeds : np.ndarray or None
+        (n_alpha, n_beta) uint64 seed used for each cell; None for
+        deterministic kernels. In vectorized mode every cell shares the one
+        generator seeded with this value.
+    """
+
+    dims = ('alpha', 'beta')
+
+    def __init__(self, alpha: np.ndarray, beta: np.ndarray,
+                 data: Dict[str, np.ndarray], seeds: Optional[np.ndarray] = None):
+        self.alpha = np.asarray(alpha)
+        self.beta = np.asarray(beta)
+        self.data = data
+        self.seeds = seeds
+
+    @property
+    def shape(self):
+        return (len(self.alpha), len(self.beta))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.data[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.data
+
+    def keys(self):
+        return self.data.keys()
+
+    def index(self, alpha: float, beta: float):
+        """(i, j) of the grid cell nearest to (alpha, beta)."""
+        return (int(np.argmin(np.abs(self.alpha - alpha))),
+                int(np.argmin(np.abs(self.beta - beta))))
+
+    def sel(self, alpha: float, beta: float) -> Dict[str, np.ndarray]:
+        """All outputs at the grid cell nearest to (alpha, beta)."""
+        i, j = self.index(alpha, beta)
+        return {name: values[i, j] for name, values in self.data.items()}
+
+    def cells(self):
+        """Iterate over (i, j, alpha, beta) in row-major order."""
+        for i, a in enumerate(self.alpha):
+            for j, b in enumerate(self.beta):
+                yield i, j, a, b
+
+    def __repr__(self):
+        names = ', '.join(f"{k}{v.shape[2:] or ''}" for k, v in self.data.items())
+        return (f"GridResult(alpha: {len(self.alpha)}, beta: {len(self.beta)}; {names}"
+                f"{'; seeded' if self.seeds is not None else ''})")
+
+
+def cell_seeds(seed, shape) -> np.ndarray:
+    """Independent uint64 seeds for every cell, spawned from one SeedSequence."""
+    ss = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return ss.generate_state(int(np.prod(shape)), dtype=np.uint64).reshape(shape)
+
+
+def evaluate_grid(kernel: Callable, alphas: np.ndarray, betas: np.ndarray,
+                  mode: str = 'serial', seed=None, seeds: Optional[np.ndarray] = None,
+                  n_workers: Optional[int] = None, chunksize: Optional[int] = None,
+                  **kwargs) -> GridResult:
+    """Evaluate `kernel` at every (alpha, beta) cell of the grid.
+
+    Parameters
+    ----------
+    kernel : callable
+        kernel(alpha, beta, **kwargs) returning a scalar, an array or a dict
+        of them. It also gets rng=np.random.Generator when the grid is
+        seeded. In vectorized mode alpha and beta are (n_alpha, n_beta)
+        arrays and every output must have that leading shape.
+    alphas, betas : np.ndarray
+        Grid coordinates
+    mode : str
+        'serial', 'vectorized' or 'process' (cells split into chunks over a
+        ProcessPoolExecutor; kernel and kwargs must be picklable)
+    seed : int or SeedSequence, optional
+        Root seed; each cell's seed is drawn from it with `cell_seeds`
+    seeds : np.ndarray, optional
+        Explicit (n_alpha, n_beta) per-cell seeds, instead of `seed`
+    n_workers : int, optional
+        Pool size for mode='process' (default: the script's worker budget,
+        see shared/workers.py)
+    chunksize : int, optional
+        Cells per pool task (default: about four tasks per worker)
+    **kwargs
+        Passed through to every kernel call
+
+    Returns a GridResult; non-dict kernel outputs are stored as 'value'.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown grid mode {mode!r}; expected one of {MODES}")
+    alphas = np.asarray(alphas, dtype=float)
+    betas = np.asarray(betas, dtype=float)
+    shape = (len(alphas), len(betas))
+
+    if seeds is None and seed is not None:
+        seeds = cell_seeds(seed, shape)
+    if seeds is not None:
+        seeds = np.asarray(seeds)
+        if seeds.shape != shape:
+            raise ValueError(f"seeds must have shape {shape}, got {seeds.shape}")
+
+    if mode == 'vectorized':
+        A, B = np.meshgrid(alphas, betas, indexing='ij')
+        if seeds is not None:
+            # One stream for the whole grid, recorded on every cell
+            seeds = np.full(shape, seeds.flat[0], dtype=seeds.dtype)
+            kwargs['rng'] = np.random.default_rng(int(seeds.flat[0]))
+        out = kernel(A, B, **kwargs)
+        data = {k: np.asarray(v) for k, v in _as_dict(out).items()}
+        for name, values in data.items():
+            if values.shape[:2] != shape:
+                raise ValueError(f"Vectorized output {name!r} has shape {values.shape}, "
+                                 f"expected leading shape {shape}")
+        return GridResult(alphas, betas, data, seeds)
+
+    cells = [(alphas[i], betas[j], None if seeds is None else int(seeds[i, j]))
+             for i in range(shape[0]) for j in range(shape[1])]
+    run = partial(_run_chunk, kernel, kwargs)
+
+    if mode == 'serial':
+        outputs = run(cells)
+    else:
+        n_workers = n_workers or default_workers()
+        if chunksize is None:
+            chunksize = max(1, -(-len(cells) // (4 * n_workers)))
+        chunks = [cells[k:k + chunksize] for k in range(0, len(cells), chunksize)]
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            outputs = [out for chunk_out in pool.map(run, chunks) for out in chunk_out]
+
+    outputs = [_as_dict(out) for out in outputs]
+    data = {name: np.asarray([out[name] for out in outputs]).reshape(shape + np.shape(outputs[0][name]))
+            for name in outputs[0]}
+    return GridResult(alphas, betas, data, seeds)
+
+
+def _as_dict(out) -> Dict:
+    return out if isinstance(out, dict) else {'value': out}
+
+
+def _run_chunk(kernel, kwargs, cells):
+    """Evaluate the kernel on a list of (alpha, beta, seed) cells."""
+    outputs = []
+    for alpha, beta, seed in cells:
+        if seed is None:
+            outputs.append(kernel(alpha, beta, **kwargs))
+        else:
+            outputs.append(kernel(alpha, beta, rng=np.random.default_rng(seed), **kwargs))
+    return outputs
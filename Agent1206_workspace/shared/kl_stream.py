@@ -0,0 +1,147 @@
+"""
+Streaming KL / TV statistics for pairs of signal-distribution processes.
+
+`DivergenceAccumulator` consumes q_t and p_t in chunks and keeps only
+running totals, so the KL counting-bound check can run over horizons far
+too long to hold the full (T, n_signals) histories in memory.
+
+Usage:
+    acc = DivergenceAccumulator(etas=[0.05, 0.1], kl_bound=-np.log(mu0),
+                                checkpoint_every=1000)
+    for q_chunk, p_chunk in chunks:          # arrays of shape (t, ..., n)
+        acc.update(q_chunk, p_chunk)
+    acc.counts[0.1], acc.cumulative_kl, acc.first_crossing
+    t, cum_kl, mean_tv = acc.checkpoints()   # downsampled series for plots
+
+Leading dimensions after time (e.g. paths) are tracked independently.
+"""
+
+import numpy as np
+from typing import Dict, Iterable, Optional, Tuple
+
+from shared.markov_utils import kl_divergence, tv_distance
+
+
+class DivergenceAccumulator:
+    """Online per-period TV / KL statistics in O(1) memory per path.
+
+    Tracks, for D_t = D(q_t || p_t) and TV_t = ||q_t - p_t||_TV:
+    - the number of periods, mean and std of D_t and mean, min, max of TV_t
+    - the cumulative KL sum_t D_t and the first t where it reaches `kl_bound`
+    - #{t : TV_t > eta} for every threshold in `etas`
+    - optionally, every `checkpoint_every` periods: t, the cumulative KL and
+      the mean TV since the previous checkpoint
+    """
+
+    def __init__(self, etas: Iterable[float] = (), kl_bound: Optional[float] = None,
+                 checkpoint_every: Optional[int] = None):
+        self.etas = list(etas)
+        self.kl_bound = kl_bound
+        self.checkpoint_every = checkpoint_every
+        self.n_periods = 0
+        self._initialized = False
+
+    def _init_state(self, shape):
+        self.cumulative_kl = np.zeros(shape)
+        self._kl_mean = np.zeros(shape)
+        self._kl_m2 = np.zeros(shape)
+        self._tv_sum = np.zeros(shape)
+        self.tv_min = np.full(shape, np.inf)
+        self.tv_max = np.full(shape, -np.inf)
+        self.counts: Dict[float, np.ndarray] = {eta: np.zeros(shape, dtype=np.int64)
+                                                for eta in self.etas}
+        self.first_crossing = np.full(shape, -1, dtype=np.int64)
+        self._ckpt_t, self._ckpt_kl, self._ckpt_tv = [], [], []
+        self._window_tv = np.zeros(shape)
+        self._initialized = True
+
+    def update(self, q: np.ndarray, p: np.ndarray):
+        """Add a chunk of periods; q and p have shape (t, ..., n_signals)."""
+        q = np.asarray(q, dtype=float)
+        p = np.asarray(p, dtype=float)
+        if not self._initialized:
+            self._init_state(q.shape[1:-1])
+        n = q.shape[0]
+        if n == 0:
+            return
+
+        tv = tv_distance(q, p)
+        kl = kl_divergence(q, p)
+
+        # Cumulative KL and first crossing of the bound
+        cum = self.cumulative_kl + np.cumsum(kl, axis=0)
+        if self.kl_bound is not None:
+            crossed = cum >= self.kl_bound
+            hit = crossed.any(axis=0) & (self.first_crossing < 0)
+            self.first_crossing = np.where(hit, self.n_periods + crossed.argmax(axis=0),
+                                           self.first_crossing)
+
+        # Mean / variance of D_t, merged chunk-wise (Chan et al.)
+        chunk_mean = kl.mean(axis=0)
+        chunk_m2 = ((kl - chunk_mean) ** 2).sum(axis=0)
+        total = self.n_periods + n
+        delta = chunk_mean - self._kl_mean
+        self._kl_m2 += chunk_m2 + delta ** 2 * self.n_periods * n / total
+        self._kl_mean += delta * n / total
+
+        self._tv_sum += tv.sum(axis=0)
+        self.tv_min = np.minimum(self.tv_min, tv.min(axis=0))
+        self.tv_max = np.maximum(self.tv_max, tv.max(axis=0))
+        for eta in self.etas:
+            self.counts[eta] += (tv > eta).sum(axis=0)
+
+        if self.checkpoint_every:
+            self._checkpoint(tv, cum)
+
+        self.cumulative_kl = cum[-1]
+        self.n_periods = total
+
+    def _checkpoint(self, tv, cum):
+        """Record (t, cumulative KL, window mean TV) at every multiple of checkpoint_every."""
+        k = self.checkpoint_every
+        start = self.n_periods
+        # Offsets in this chunk at which a window closes (t + 1 divisible by k)
+        ends = np.arange((-(start + 1)) % k, len(tv), k)
+        prev = 0
+        for end in ends:
+            self._window_tv += tv[prev:end + 1].sum(axis=0)
+            self._ckpt_t.append(start + end)
+            self._ckpt_kl.append(cum[end].copy())
+            self._ckpt_tv.append(self._window_tv / k)
+            self._window_tv = np.zeros_like(self._window_tv)
+            prev = end + 1
+        self._window_tv += tv[prev:].sum(axis=0)
+
+    # ------------------------------------------------------------------
+    # Results
+    # ------------------------------------------------------------------
+
+    @property
+    def mean_kl(self) -> np.ndarray:
+        return self._kl_mean
+
+    @property
+    def std_kl(self) -> np.ndarray:
+        return np.sqrt(self._kl_m2 / max(self.n_periods, 1))
+
+    @property
+    def mean_tv(self) -> np.ndarray:
+        return self._tv_sum / max(self.n_periods, 1)
+
+    def checkpoints(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(t, cumulative KL at t, mean TV over the window ending at t)."""
+        return np.array(self._ckpt_t), np.array(self._ckpt_kl), np.array(self._ckpt_tv)
+
+    def summary(self) -> Dict:
+        """Scalar statistics (for a single path) as a plain dict."""
+        return {
+            'n_periods': self.n_periods,
+            'mean_kl': float(self.mean_kl),
+            'std_kl': float(self.std_kl),
+            'cumulative_kl': float(self.cumulative_kl),
+            'first_crossing': int(self.first_crossing),
+            'mean_tv': float(self.mean_tv),
+            'min_tv': float(self.tv_min),
+            'max_tv': float(self.tv_max),
+            'counts': {eta: int(c) for eta, c in self.counts.items()},
+        }
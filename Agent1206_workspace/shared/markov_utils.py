@@ -4,13 +4,28 @@ Used by all subagent scripts.
 """
 
 import numpy as np
+from scipy import sparse
+from scipy.special import rel_entr
 from typing import Tuple, Optional, Dict
 
+from shared.figures import figures_enabled
+from shared.sim_cache import memoize
+
 
 class MarkovChain:
-    """2-state Markov chain for the deterrence game."""
+    """Finite-state Markov chain for the deterrence game (2 states by default).
+
+    The lifted state space holds windows of `order` consecutive states,
+    (theta_t, theta_{t-1}, ..., theta_{t-order+1}), indexed in base
+    n_states with the most recent state as the most significant digit:
+    for two states and order 2, (G,G)=0, (G,B)=1, (B,G)=2, (B,B)=3.
+    Lifted indices and components are computed arithmetically, and the
+    lifted transitions (n_states nonzeros per row) are stored compactly.
+    """
 
-    def __init__(self, alpha: float = 0.3, beta: float = 0.5):
+    def __init__(self, alpha: float = 0.3, beta: float = 0.5,
+                 T: Optional[np.ndarray] = None, order: int = 2,
+                 states: Optional[list] = None):
         """
         Parameters
         ----------
@@ -18,34 +33,93 @@ class MarkovChain:
             Pr(B | G) — probability of transitioning from Good to Bad
         beta : float
             Pr(G | B) — probability of transitioning from Bad to Good
+        T : np.ndarray, optional
+            (n, n) row-stochastic transition matrix; overrides alpha/beta
+        order : int
+            Number of consecutive states in a lifted state
+        states : list, optional
+            State names (default ['G', 'B'] for two states, else '0', '1', ...)
         """
+        if T is None:
+            # Transition matrix: T[i,j] = Pr(state j | state i)
+            # Row 0 = G, Row 1 = B
+            self.T = np.array([
+                [1 - alpha, alpha],   # From G
+                [beta, 1 - beta]      # From B
+            ])
+            # Stationary distribution (closed form)
+            self.pi = np.array([beta / (alpha + beta), alpha / (alpha + beta)])
+        else:
+            self.T = np.asarray(T, dtype=float)
+            if self.T.ndim != 2 or self.T.shape[0] != self.T.shape[1]:
+                raise ValueError(f"T must be a square matrix, got shape {self.T.shape}")
+            if not np.allclose(self.T.sum(axis=1), 1.0):
+                raise ValueError("Rows of T must sum to 1")
+            self.pi = stationary_distribution(self.T)
+            if len(self.T) == 2:
+                alpha, beta = self.T[0, 1], self.T[1, 0]
+            else:
+                alpha = beta = None
         self.alpha = alpha
         self.beta = beta
-        self.states = ['G', 'B']
-        self.n_states = 2
-
-        # Transition matrix: T[i,j] = Pr(state j | state i)
-        # Row 0 = G, Row 1 = B
-        self.T = np.array([
-            [1 - alpha, alpha],   # From G
-            [beta, 1 - beta]      # From B
-        ])
-
-        # Stationary distribution
-        self.pi = np.array([beta / (alpha + beta), alpha / (alpha + beta)])
-
-        # Lifted state space: (theta_t, theta_{t-1})
-        # Order: (G,G), (G,B), (B,G), (B,B)
-        self.lifted_states = [(0, 0), (0, 1), (1, 0), (1, 1)]
-        self.n_lifted = 4
-
-        # Lifted stationary distribution
-        self.rho_tilde = np.array([
-            self.pi[0] * (1 - alpha),   # (G,G): pi(G) * Pr(G|G)
-            self.pi[1] * beta,          # (G,B): pi(B) * Pr(G|B)
-            self.pi[0] * alpha,         # (B,G): pi(G) * Pr(B|G)
-            self.pi[1] * (1 - beta)     # (B,B): pi(B) * Pr(B|B)
-        ])
+        self.n_states = len(self.T)
+        if states is None:
+            states = ['G', 'B'] if self.n_states == 2 else [str(i) for i in range(self.n_states)]
+        self.states = list(states)
+
+        # Lifted state space: (theta_t, theta_{t-1}, ...), see lifted_index
+        if order < 1:
+            raise ValueError(f"order must be >= 1, got {order}")
+        self.order = order
+        self.n_lifted = self.n_states ** order
+        self._digit_weights = self.n_states ** np.arange(order - 1, -1, -1)
+        self.lifted_states = self.lifted_components(np.arange(self.n_lifted))
+
+        # Lifted stationary distribution:
+        # rho(theta_t, ..., theta_{t-k+1}) = pi(theta_{t-k+1}) prod_j T[theta_{t-j-1}, theta_{t-j}]
+        rho = self.pi
+        for m in range(1, order):
+            newest = np.arange(len(rho)) // self.n_states ** (m - 1)
+            rho = (self.T[newest[None, :], np.arange(self.n_states)[:, None]]
+                   * rho[None, :]).ravel()
+        self.rho_tilde = rho
+
+    def lifted_index(self, *states):
+        """Lifted index of (theta_t, theta_{t-1}, ...), most recent first.
+
+        Accepts scalars or broadcastable arrays of states.
+        """
+        if len(states) != self.order:
+            raise ValueError(f"Expected {self.order} states, got {len(states)}")
+        idx = np.asarray(states[0], dtype=np.int64)
+        for s in states[1:]:
+            idx = idx * self.n_states + np.asarray(s, dtype=np.int64)
+        return idx if idx.ndim else int(idx)
+
+    def lifted_components(self, idx) -> np.ndarray:
+        """States (theta_t, theta_{t-1}, ...) of lifted indices; shape (..., order)."""
+        return (np.asarray(idx)[..., None] // self._digit_weights) % self.n_states
+
+    def lifted_successors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Compact lifted transitions: (next_idx, probs), each (n_lifted, n_states).
+
+        From lifted state l = (theta_t, ...), column j is the move to
+        (j, theta_t, ..., theta_{t-order+2}) with probability T[theta_t, j].
+        """
+        n = self.n_states
+        lifted = np.arange(self.n_lifted)
+        top = n ** (self.order - 1)
+        next_idx = np.arange(n)[None, :] * top + (lifted // n)[:, None]
+        probs = self.T[lifted // top]
+        return next_idx, probs
+
+    def lifted_transition_matrix(self):
+        """Lifted transition matrix as a scipy.sparse CSR matrix (n_states nonzeros per row)."""
+        next_idx, probs = self.lifted_successors()
+        n = self.n_states
+        indptr = np.arange(0, self.n_lifted * n + 1, n)
+        return sparse.csr_matrix((probs.ravel(), next_idx.ravel(), indptr),
+                                 shape=(self.n_lifted, self.n_lifted))
 
     def simulate(self, T: int, theta_0: Optional[int] = None,
                  rng: Optional[np.random.Generator] = None) -> np.ndarray:
@@ -56,25 +130,181 @@ class MarkovChain:
         if rng is None:
             rng = np.random.default_rng()
         if theta_0 is None:
-            theta_0 = rng.choice(2, p=self.pi)
+            theta_0 = rng.choice(self.n_states, p=self.pi)
 
         states = np.zeros(T, dtype=int)
         states[0] = theta_0
         for t in range(1, T):
-            states[t] = rng.choice(2, p=self.T[states[t - 1]])
+            states[t] = rng.choice(self.n_states, p=self.T[states[t - 1]])
         return states
 
-    def lifted_sequence(self, states: np.ndarray) -> np.ndarray:
-        """Convert state sequence to lifted state indices.
+    def simulate_batch(self, n_paths: int, T: int,
+                       theta_0: Optional[np.ndarray] = None,
+                       rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """Simulate n_paths independent chains of T steps in one shot.
 
-        Lifted state index: (theta_t, theta_{t-1}) ->
-          (G,G)=0, (G,B)=1, (B,G)=2, (B,B)=3
-        Returns array of length len(states)-1 (starts at t=1).
+        For two states, instead of drawing one state per period, each path
+        is built from alternating sojourns whose lengths are geometric
+        (Geometric(alpha) in G, Geometric(beta) in B), sampled by inverse CDF
+        from pre-drawn uniforms. With more states, all paths advance together
+        one period at a time by inverse CDF. The marginal law of each path is
+        identical to `simulate`, but the random stream differs, so results
+        are not bit-for-bit equal.
+
+        Parameters
+        ----------
+        n_paths : int
+            Number of independent paths.
+        T : int
+            Number of periods per path.
+        theta_0 : int or array of shape (n_paths,), optional
+            Initial state(s). Drawn from pi when omitted.
+
+        Returns array of states (0=G, 1=B) of shape (n_paths, T), dtype uint8
+        (uint16 above 256 states).
         """
-        lifted = np.zeros(len(states) - 1, dtype=int)
-        for t in range(1, len(states)):
-            lifted[t - 1] = states[t] * 2 + states[t - 1]
-        return lifted
+        if rng is None:
+            rng = np.random.default_rng()
+        if self.n_states != 2:
+            return self._simulate_batch_steps(n_paths, T, theta_0, rng)
+        if theta_0 is None:
+            theta_0 = (rng.random(n_paths) < self.pi[1]).astype(np.uint8)
+        else:
+            theta_0 = np.broadcast_to(np.asarray(theta_0, dtype=np.uint8),
+                                      (n_paths,))
+
+        states = np.zeros((n_paths, T), dtype=np.uint8)
+        if T == 0 or n_paths == 0:
+            return states
+
+        # log(1 - exit probability) for a sojourn started in G or B
+        with np.errstate(divide='ignore'):
+            log_stay = np.log1p(-np.array([self.alpha, self.beta]))
+
+        # Expected number of sojourns to cover T periods, with slack
+        mean_pair = sum(1.0 / p if p > 0 else T for p in (self.alpha, self.beta))
+        block = int(2 * np.ceil(T / mean_pair)) + 16
+
+        flips = np.zeros((n_paths, T), dtype=np.uint8)
+        covered = np.zeros(n_paths, dtype=np.int64)
+        parity = theta_0.astype(np.int64)  # state of the next sojourn
+        active = np.arange(n_paths)
+        while active.size > 0:
+            # Sojourn k of a path starting in s is spent in s XOR (k mod 2)
+            k = np.arange(block)
+            sojourn_state = (parity[active, None] + k[None, :]) & 1
+            u = 1.0 - rng.random((active.size, block))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                lengths = 1.0 + np.floor(np.log(u) / log_stay[sojourn_state])
+            lengths = np.fmin(lengths, T).astype(np.int64)
+
+            # Change points are the (exclusive) end of each sojourn
+            ends = covered[active, None] + np.cumsum(lengths, axis=1)
+            rows, cols = np.nonzero(ends < T)
+            flips[active[rows], ends[rows, cols]] = 1
+
+            covered[active] = ends[:, -1]
+            parity[active] = (parity[active] + block) & 1
+            active = active[covered[active] < T]
+
+        # The state at t is theta_0 flipped once per change point in (0, t]
+        np.cumsum(flips, axis=1, dtype=np.uint8, out=states)
+        states += theta_0[:, None]
+        states &= 1
+        return states
+
+    def _simulate_batch_steps(self, n_paths, T, theta_0, rng) -> np.ndarray:
+        """simulate_batch for n states: one inverse-CDF step per period for all paths."""
+        dtype = np.uint8 if self.n_states <= 256 else np.uint16
+        cdf = np.cumsum(self.T, axis=1)[:, :-1]
+        if theta_0 is None:
+            theta_0 = np.searchsorted(np.cumsum(self.pi)[:-1], rng.random(n_paths), side='right')
+        states = np.zeros((n_paths, T), dtype=dtype)
+        if T == 0 or n_paths == 0:
+            return states
+        states[:, 0] = theta_0
+        u = rng.random((T - 1, n_paths))
+        current = states[:, 0].astype(np.intp)
+        for t in range(1, T):
+            current = (u[t - 1][:, None] >= cdf[current]).sum(axis=1)
+            states[:, t] = current
+        return states
+
+    def lifted_dtype(self, order: Optional[int] = None) -> np.dtype:
+        """Smallest unsigned integer dtype holding every lifted index."""
+        order = self.order if order is None else order
+        return np.min_scalar_type(self.n_states ** order - 1)
+
+    def lifted_sequence(self, states: np.ndarray, out: Optional[np.ndarray] = None,
+                        order: Optional[int] = None) -> np.ndarray:
+        """Convert state sequences to lifted state indices.
+
+        Lifted state index: (theta_t, theta_{t-1}, ...) -> lifted_index;
+        for two states and order 2, (G,G)=0, (G,B)=1, (B,G)=2, (B,B)=3.
+        Computed by Horner's rule over shifted views of `states`, in place in
+        the output, so no per-period loop and no temporaries of the full size.
+
+        Parameters
+        ----------
+        states : np.ndarray
+            States of shape (..., T), e.g. (T,) or (n_paths, T)
+        out : np.ndarray, optional
+            Buffer of shape (..., T-order+1) and an unsigned dtype wide
+            enough for n_states**order - 1 (e.g. uint8, uint16)
+        order : int, optional
+            Window length (default: self.order)
+
+        Returns array of shape (..., T-order+1) (starts at t=order-1), of
+        dtype lifted_dtype(order) unless `out` is given.
+        """
+        k = self.order if order is None else order
+        states = np.asarray(states)
+        length = states.shape[-1] - k + 1
+        shape = states.shape[:-1] + (max(length, 0),)
+        if out is None:
+            out = np.empty(shape, dtype=self.lifted_dtype(k))
+        else:
+            if out.shape != shape:
+                raise ValueError(f"out must have shape {shape}, got {out.shape}")
+            if np.iinfo(out.dtype).max < self.n_states ** k - 1:
+                raise ValueError(f"out dtype {out.dtype} cannot hold lifted indices "
+                                 f"up to {self.n_states ** k - 1}")
+        if length <= 0:
+            return out
+
+        # out = theta_t * n^(k-1) + theta_{t-1} * n^(k-2) + ... via Horner
+        np.copyto(out, states[..., k - 1:], casting='unsafe')
+        for j in range(k - 2, -1, -1):
+            np.multiply(out, self.n_states, out=out, casting='unsafe')
+            np.add(out, states[..., j:j + length], out=out, casting='unsafe')
+        return out
+
+
+def stationary_distribution(T: np.ndarray) -> np.ndarray:
+    """Stationary distribution of a row-stochastic matrix T.
+
+    Solves pi (T - I) = 0 with sum(pi) = 1 as one least-squares system
+    (SVD-based, so well-behaved for nearly decomposable chains), then clips
+    round-off negatives.
+    """
+    n = len(T)
+    A = np.vstack([T.T - np.eye(n), np.ones((1, n))])
+    b = np.zeros(n + 1)
+    b[-1] = 1.0
+    pi = np.linalg.lstsq(A, b, rcond=None)[0]
+    pi = np.clip(pi, 0.0, None)
+    return pi / pi.sum()
+
+
+@memoize()
+def simulate_path(mc: MarkovChain, T: int, rng: Optional[np.random.Generator] = None,
+                  theta_0: Optional[int] = None) -> np.ndarray:
+    """mc.simulate(T, theta_0, rng), memoized on disk across scripts and runs.
+
+    Same path and same generator state afterwards as calling mc.simulate
+    directly; a cached path comes back as a read-only memory map.
+    """
+    return mc.simulate(T, theta_0=theta_0, rng=rng)
 
 
 class DeterrenceGame:
@@ -155,6 +385,192 @@ class BayesianFilter:
             self.belief = prior.copy()
 
 
+class BatchBayesianFilter:
+    """HMM Bayesian filter advancing many independent belief paths at once.
+
+    Beliefs are stored as an (n_paths, n_states) matrix. Each update does one
+    matmul for the prediction and one normalization for all paths, writing
+    into preallocated buffers.
+    """
+
+    def __init__(self, mc: MarkovChain, n_paths: int,
+                 prior: Optional[np.ndarray] = None):
+        """
+        Parameters
+        ----------
+        mc : MarkovChain
+        n_paths : int
+            Number of belief paths tracked in parallel.
+        prior : np.ndarray, optional
+            Shape (n_states,) shared by all paths, or (n_paths, n_states).
+            Defaults to the stationary distribution.
+        """
+        self.mc = mc
+        self.n_paths = n_paths
+        self.belief = np.empty((n_paths, mc.n_states))
+        self._predicted = np.empty_like(self.belief)
+        self._likelihood = np.empty_like(self.belief)
+        self._total = np.empty((n_paths, 1))
+        self.reset(prior)
+
+    def predict(self) -> np.ndarray:
+        """One-step prediction for every path (returns an internal buffer)."""
+        return np.matmul(self.belief, self.mc.T, out=self._predicted)
+
+    def update(self, signals: np.ndarray,
+               strategy_matrix: np.ndarray) -> np.ndarray:
+        """
+        Bayesian update of all paths given one observed signal per path.
+
+        Parameters
+        ----------
+        signals : np.ndarray
+            Observed actions, shape (n_paths,)
+        strategy_matrix : np.ndarray
+            strategy_matrix[state, action] = Pr(action | state)
+
+        Returns the updated (n_paths, n_states) belief matrix. This is the
+        filter's own buffer, so copy it if it must outlive the next update.
+        """
+        predicted = self.predict()
+
+        # Likelihood rows: Pr(signal_i | state) for each path i
+        np.take(strategy_matrix.T, signals, axis=0, out=self._likelihood)
+
+        np.multiply(predicted, self._likelihood, out=self.belief)
+        np.sum(self.belief, axis=1, keepdims=True, out=self._total)
+        valid = self._total > 0
+        np.divide(self.belief, self._total, out=self.belief, where=valid)
+        if not valid.all():
+            self.belief[~valid[:, 0]] = self.mc.pi
+        return self.belief
+
+    def reset(self, prior: Optional[np.ndarray] = None):
+        self.belief[...] = self.mc.pi if prior is None else prior
+
+
+# Above this many paths, stepping all paths together beats the prefix scan
+_LOG_ODDS_SCAN_MAX_PATHS = 4
+
+
+def _log_matmul_2x2(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+    """Product of stacked 2x2 matrices stored as logs: log(exp(A) @ exp(B))."""
+    return np.logaddexp(A[..., :, 0, None] + B[..., None, 0, :],
+                        A[..., :, 1, None] + B[..., None, 1, :])
+
+
+def log_odds_filter(signals: np.ndarray, mc: MarkovChain,
+                    strategy_matrix: np.ndarray,
+                    prior: Optional[np.ndarray] = None) -> np.ndarray:
+    """Run the 2-state HMM filter over whole signal sequences in log space.
+
+    Equivalent to calling `BayesianFilter.update` once per signal, but the
+    belief is carried as the log-odds of G and never normalized in linear
+    space, so near-deterministic strategies do not underflow.
+
+    A single sequence (or a handful) is filtered without a per-period loop:
+    the unnormalized forward recursion v_t = diag(sigma[:, y_t]) T' v_{t-1}
+    is a prefix product of 2x2 matrices, evaluated in log space with
+    log2(T) vectorized sweeps. Larger batches instead step the scalar
+    log-odds map for all paths at once.
+
+    Parameters
+    ----------
+    signals : np.ndarray
+        Observed actions, shape (T,) or (n_paths, T)
+    mc : MarkovChain
+    strategy_matrix : np.ndarray
+        strategy_matrix[state, action] = Pr(action | state)
+    prior : np.ndarray, optional
+        Belief before the first signal. Defaults to mc.pi.
+
+    Returns posterior log-odds log Pr(G | h_t) / Pr(B | h_t), same shape as
+    `signals`. A signal with zero probability in every state resets the
+    belief to mc.pi, as in `BayesianFilter.update`.
+    """
+    signals = np.asarray(signals)
+    prior = mc.pi if prior is None else prior
+
+    with np.errstate(divide='ignore'):
+        log_T = np.log(mc.T)
+        log_lik = np.log(strategy_matrix)
+        log_prior = np.log(prior)
+        log_pi = np.log(mc.pi)
+    impossible = np.all(np.isneginf(log_lik), axis=0)
+
+    n_paths = signals.size // max(signals.shape[-1], 1)
+    if n_paths > _LOG_ODDS_SCAN_MAX_PATHS:
+        return _log_odds_steps(signals, log_T, log_lik, log_prior,
+                               log_pi, impossible)
+
+    # One-step log transfer matrix per signal: log(diag(sigma[:, y]) @ T')
+    log_M = log_lik.T[:, :, None] + log_T.T[None, :, :]
+    log_M[impossible] = log_pi[:, None]  # maps any v to pi * sum(v)
+
+    # Inclusive prefix products P_t = M_t ... M_1 (Hillis-Steele scan)
+    P = log_M[signals]
+    T_len = signals.shape[-1]
+    d = 1
+    while d < T_len:
+        P[..., d:, :, :] = _log_matmul_2x2(P[..., d:, :, :], P[..., :-d, :, :])
+        # Rescale to keep logs bounded; only the direction of v_t matters
+        scale = P.max(axis=(-2, -1), keepdims=True)
+        P -= np.where(np.isfinite(scale), scale, 0.0)
+        d *= 2
+
+    log_v = np.logaddexp(P[..., :, 0] + log_prior[0], P[..., :, 1] + log_prior[1])
+    with np.errstate(invalid='ignore'):
+        return log_v[..., 0] - log_v[..., 1]
+
+
+def _log_odds_steps(signals, log_T, log_lik, log_prior, log_pi, impossible):
+    """Step the scalar log-odds filter map for many paths in parallel."""
+    with np.errstate(invalid='ignore'):
+        log_lr = log_lik[0] - log_lik[1]
+    reset = np.where(impossible, log_pi[0] - log_pi[1], np.nan)
+
+    out = np.empty(signals.shape)
+    l = np.full(signals.shape[:-1], log_prior[0] - log_prior[1])
+    for t in range(signals.shape[-1]):
+        y = signals[..., t]
+        log_g = -np.logaddexp(0.0, -l)   # log mu
+        log_b = -np.logaddexp(0.0, l)    # log (1 - mu)
+        l = (np.logaddexp(log_T[0, 0] + log_g, log_T[1, 0] + log_b)
+             - np.logaddexp(log_T[0, 1] + log_g, log_T[1, 1] + log_b)
+             + log_lr[y])
+        l = np.where(impossible[y], reset[y], l)
+        out[..., t] = l
+    return out
+
+
+def log_odds_to_belief(log_odds: np.ndarray) -> np.ndarray:
+    """Convert log-odds of G to Pr(G)."""
+    with np.errstate(over='ignore'):
+        return 1.0 / (1.0 + np.exp(-log_odds))
+
+
+def predictive_signal_distributions(signals: np.ndarray, mc: MarkovChain,
+                                    strategy_matrix: np.ndarray,
+                                    prior: Optional[np.ndarray] = None
+                                    ) -> Tuple[np.ndarray, np.ndarray]:
+    """One-step-ahead signal distributions of the 2-state filter along a path.
+
+    dists[..., t, y] = Pr(y_t = y | y_0 .. y_{t-1}) = (T' b_{t-1}) @ strategy,
+    with b_{-1} = prior and b_t the posterior from `log_odds_filter`.
+
+    Returns (dists, last_posterior): shapes (..., T, n_signals) and
+    (..., 2). Pass last_posterior as `prior` to continue the path.
+    """
+    prior = mc.pi if prior is None else np.asarray(prior)
+    post_g = log_odds_to_belief(log_odds_filter(signals, mc, strategy_matrix, prior=prior))
+    prev_g = np.concatenate([np.broadcast_to(prior[..., 0], post_g.shape[:-1])[..., None],
+                             post_g[..., :-1]], axis=-1)
+    pred_g = prev_g * mc.T[0, 0] + (1 - prev_g) * mc.T[1, 0]
+    dists = (pred_g[..., None] * strategy_matrix[0]
+             + (1 - pred_g[..., None]) * strategy_matrix[1])
+    return dists, np.stack([post_g[..., -1], 1 - post_g[..., -1]], axis=-1)
+
+
 def make_strategy_matrix(strategy_fn, n_states: int = 2,
                          n_actions: int = 2) -> np.ndarray:
     """Convert a deterministic strategy function to a probability matrix.
@@ -168,21 +584,33 @@ def make_strategy_matrix(strategy_fn, n_states: int = 2,
     return mat
 
 
-def tv_distance(p: np.ndarray, q: np.ndarray) -> float:
-    """Total variation distance between two distributions."""
-    return 0.5 * np.abs(p - q).sum()
+def tv_distance(p: np.ndarray, q: np.ndarray, axis: int = -1,
+                out: Optional[np.ndarray] = None):
+    """Total variation distance 0.5 * sum |p - q| along `axis`.
+
+    p and q broadcast against each other, so stacks of distributions
+    (..., n) over paths and time are handled in one call; a pair of
+    vectors gives a scalar. `out` receives the result if given.
+    """
+    out = np.sum(np.abs(np.subtract(p, q)), axis=axis, out=out)
+    return np.multiply(out, 0.5, out=out if isinstance(out, np.ndarray) else None)
 
 
-def kl_divergence(p: np.ndarray, q: np.ndarray, eps: float = 1e-12) -> float:
-    """KL divergence D(p || q) with numerical safeguard."""
-    p_safe = np.clip(p, eps, 1.0)
-    q_safe = np.clip(q, eps, 1.0)
-    return np.sum(p_safe * np.log(p_safe / q_safe))
+def kl_divergence(p: np.ndarray, q: np.ndarray, axis: int = -1,
+                  out: Optional[np.ndarray] = None):
+    """KL divergence D(p || q) = sum p log(p / q) along `axis`.
+
+    Zeros are handled exactly as in scipy.special.rel_entr: terms with
+    p = 0 contribute 0, and p > 0 where q = 0 gives inf. Broadcasts like
+    `tv_distance`; `out` receives the result if given.
+    """
+    return np.sum(rel_entr(p, q), axis=axis, out=out)
 
 
 def save_figure(fig, path: str, dpi: int = 150):
-    """Save matplotlib figure and close it."""
-    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    """Save matplotlib figure and close it; under --no-figures it is only closed."""
+    if figures_enabled():
+        fig.savefig(path, dpi=dpi, bbox_inches='tight')
     import matplotlib.pyplot as plt
     plt.close(fig)
     return path
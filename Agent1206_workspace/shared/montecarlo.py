@@ -0,0 +1,153 @@
+"""
+Sharded, reproducible Monte Carlo replicates.
+
+`run_replicates` calls a replicate function once per replicate, each with
+its own independent generator, and returns the outputs stacked in
+replicate order.
+
+- Streams: replicate i uses np.random.SeedSequence(seed, spawn_key=(i,)),
+  i.e. the i-th child of SeedSequence(seed).spawn(n). It depends only on
+  (seed, i), never on how replicates are split up.
+- Sharding: replicates are cut into contiguous shards and run on a
+  process pool (or in-process when n_workers=1). Results are placed by
+  replicate index, so the output is identical for any worker count or
+  shard size.
+- Checkpointing: with `checkpoint=path.npz`, completed shards are written
+  out as they finish. Re-running with the same path, seed, n, replicate
+  function and kwargs resumes and only runs the missing replicates; a
+  checkpoint written for anything else is refused.
+
+Usage:
+    def replicate(T, rng):
+        ...
+        return {'count': c, 'tv_mean': m}
+
+    out = run_replicates(replicate, 100_000, seed=0, n_workers=8,
+                         checkpoint='mc_checkpoint.npz', T=5000)
+    out['count']          # shape (100_000,)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from shared.sim_cache import canonical_hash
+from shared.workers import default_workers
+
+
+def replicate_rng(seed, index: int) -> np.random.Generator:
+    """Generator of replicate `index`: child `index` of SeedSequence(seed)."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+
+def run_replicates(replicate_fn: Callable, n: int, seed: int = 0,
+                   n_workers: Optional[int] = None, shard_size: Optional[int] = None,
+                   checkpoint: Optional[str] = None, progress: bool = False,
+                   **kwargs) -> Dict[str, np.ndarray]:
+    """Run replicate_fn(rng=..., **kwargs) for n independent replicates.
+
+    Parameters
+    ----------
+    replicate_fn : callable
+        replicate_fn(rng=generator, **kwargs) returning a scalar, an array or a dict
+        of them (same shapes for every replicate). It must be picklable
+        when n_workers > 1.
+    n : int
+        Number of replicates
+    seed : int
+        Root entropy for the replicate streams
+    n_workers : int, optional
+        Process count (default: the script's worker budget, see
+        shared/workers.py); 1 runs in-process
+    shard_size : int, optional
+        Replicates per shard (default: about four shards per worker, at
+        most 1000 so checkpoints stay frequent)
+    checkpoint : str, optional
+        .npz file to save completed shards to and resume from; ValueError
+        if it was written for another seed, n, replicate_fn or kwargs
+    progress : bool
+        Print a line as each shard completes
+
+    Returns a dict of arrays of shape (n, ...) in replicate order;
+    non-dict outputs are stored under 'value'.
+    """
+    n_workers = n_workers or default_workers()
+    if shard_size is None:
+        shard_size = int(np.clip(-(-n // (4 * n_workers)), 1, 1000))
+    shards = [(start, min(start + shard_size, n)) for start in range(0, n, shard_size)]
+
+    results: Dict[str, np.ndarray] = {}
+    done = np.zeros(n, dtype=bool)
+    fingerprint = _fingerprint(replicate_fn, kwargs) if checkpoint is not None else None
+    if checkpoint is not None and os.path.exists(checkpoint):
+        results, done = _load_checkpoint(checkpoint, seed, n, fingerprint)
+    pending = [(a, b) for a, b in shards if not done[a:b].all()]
+    if progress and done.any():
+        print(f"  Resuming: {int(done.sum())}/{n} replicates from {checkpoint}")
+
+    run = partial(_run_shard, replicate_fn, seed, kwargs)
+
+    def collect(shard, outputs):
+        a, b = shard
+        for name, values in outputs.items():
+            if name not in results:
+                results[name] = np.zeros((n,) + values.shape[1:], dtype=values.dtype)
+            results[name][a:b] = values
+        done[a:b] = True
+        if checkpoint is not None:
+            _save_checkpoint(checkpoint, seed, n, fingerprint, results, done)
+        if progress:
+            print(f"  Replicates {int(done.sum())}/{n}")
+
+    if n_workers == 1 or len(pending) <= 1:
+        for shard in pending:
+            collect(shard, run(shard))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = {pool.submit(run, shard): shard for shard in pending}
+            for future in as_completed(futures):
+                collect(futures[future], future.result())
+
+    return results
+
+
+def _run_shard(replicate_fn, seed, kwargs, shard) -> Dict[str, np.ndarray]:
+    """Run replicates [a, b) and stack their outputs by name."""
+    a, b = shard
+    outputs = []
+    for i in range(a, b):
+        out = replicate_fn(rng=replicate_rng(seed, i), **kwargs)
+        outputs.append(out if isinstance(out, dict) else {'value': out})
+    return {name: np.asarray([o[name] for o in outputs]) for name in outputs[0]}
+
+
+def _fingerprint(replicate_fn, kwargs) -> str:
+    """Hash of the replicate function's qualified name and its canonicalized kwargs."""
+    name = f"{replicate_fn.__module__}.{getattr(replicate_fn, '__qualname__', repr(replicate_fn))}"
+    return canonical_hash({'function': name, 'kwargs': kwargs})
+
+
+def _save_checkpoint(path, seed, n, fingerprint, results, done):
+    """Write the checkpoint atomically (temp file, then rename)."""
+    tmp = f"{path}.tmp.npz"
+    np.savez(tmp, _seed=np.asarray(str(seed)), _n=n, _done=done,
+             _fingerprint=np.asarray(fingerprint),
+             **{f"r_{name}": values for name, values in results.items()})
+    os.replace(tmp, path)
+
+
+def _load_checkpoint(path, seed, n, fingerprint):
+    with np.load(path) as data:
+        if str(data['_seed']) != str(seed) or int(data['_n']) != n:
+            raise ValueError(f"Checkpoint {path} is for seed={data['_seed']}, "
+                             f"n={int(data['_n'])}; requested seed={seed}, n={n}")
+        stored = str(data['_fingerprint']) if '_fingerprint' in data.files else None
+        if stored != fingerprint:
+            raise ValueError(f"Checkpoint {path} was written by a different replicate "
+                             "function or kwargs; delete it to start over")
+        done = data['_done'].copy()
+        results = {key[2:]: data[key].copy() for key in data.files if key.startswith('r_')}
+    return results, done
@@ -0,0 +1,337 @@
+"""
+Exact solver for small discrete optimal transport (transportation) problems.
+Used by the SA5 OT sensitivity scripts, SSA7_3 and SSA2_3.
+
+The SSAs solve thousands of tiny OT problems (a handful of lifted states by
+a handful of actions) that differ only slightly from one another. Instead
+of building a dense constraint matrix and calling linprog per solve, this
+module runs the transportation simplex (network simplex on the bipartite
+state/action graph): north-west-corner start, MODI duals, cycle pivots.
+An `OTSolver` remembers its last optimal basis and warm-starts the next
+solve of the same shape from it, so a perturbation sweep usually needs no
+pivots at all. linprog (with the constraint matrix cached per shape)
+remains as the fallback. `rhs_ranging` gives the exact range of a linear
+marginal perturbation over which the optimal basis (and support) holds.
+"""
+
+import numpy as np
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Relative mismatch allowed between sum(mu) and sum(nu)
+BALANCE_TOL = 1e-9
+# Reduced-cost tolerance for optimality
+OPT_TOL = 1e-12
+
+
+@lru_cache(maxsize=None)
+def transport_constraints(m: int, n: int) -> np.ndarray:
+    """Equality-constraint matrix of an m x n transportation problem.
+
+    Rows 0..m-1 are the row-marginal constraints and rows m..m+n-1 the
+    column-marginal constraints on gamma.flatten(). Cached per shape;
+    treat the result as read-only.
+    """
+    A_eq = np.vstack([np.kron(np.eye(m), np.ones(n)),
+                      np.kron(np.ones(m), np.eye(n))])
+    A_eq.flags.writeable = False
+    return A_eq
+
+
+def solve_ot_linprog(mu: np.ndarray, nu: np.ndarray, cost: np.ndarray,
+                     maximize: bool = False) -> Tuple[Optional[np.ndarray], Optional[float]]:
+    """Solve the OT problem with scipy's HiGHS LP solver.
+
+    Returns (gamma, value), or (None, None) if the LP fails.
+    """
+    from scipy.optimize import linprog
+
+    m, n = cost.shape
+    c = -cost.ravel() if maximize else cost.ravel()
+    result = linprog(c, A_eq=transport_constraints(m, n),
+                     b_eq=np.concatenate([mu, nu]),
+                     bounds=(0, None), method='highs')
+    if not result.success:
+        return None, None
+    return result.x.reshape(m, n), (-result.fun if maximize else result.fun)
+
+
+class OTSolver:
+    """Transportation-simplex OT solver with warm starts.
+
+    Usage:
+        solver = OTSolver()
+        gamma, value = solver.solve(mu, nu, cost)              # minimize
+        gamma, value = solver.solve(mu, nu, payoff, maximize=True)
+
+    A basis is a spanning tree of m + n - 1 cells of the m x n grid. After
+    each solve the optimal basis is kept per shape; the next solve of that
+    shape starts from it whenever it is still primal feasible for the new
+    marginals.
+    """
+
+    def __init__(self, warm_start: bool = True, max_pivots: int = 1000):
+        self.warm_start = warm_start
+        self.max_pivots = max_pivots
+        self._bases: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        self.n_pivots = 0        # pivots in the last solve
+        self.warm_started = False
+
+    def solve(self, mu: np.ndarray, nu: np.ndarray, cost: np.ndarray,
+              maximize: bool = False) -> Tuple[Optional[np.ndarray], Optional[float]]:
+        """Solve min (or max) sum gamma * cost s.t. gamma 1 = mu, gamma' 1 = nu, gamma >= 0.
+
+        Parameters
+        ----------
+        mu : np.ndarray
+            Row marginal, shape (m,)
+        nu : np.ndarray
+            Column marginal, shape (n,); must have the same total as mu
+        cost : np.ndarray
+            Cost (or payoff if `maximize`) matrix, shape (m, n)
+        maximize : bool
+            Maximize instead of minimize the objective
+
+        Returns (gamma, value), or (None, None) if the problem is infeasible
+        (negative or unbalanced marginals).
+        """
+        mu = np.asarray(mu, dtype=float)
+        nu = np.asarray(nu, dtype=float)
+        cost = np.asarray(cost, dtype=float)
+        m, n = cost.shape
+        total = mu.sum()
+        if (np.any(mu < 0) or np.any(nu < 0)
+                or abs(nu.sum() - total) > BALANCE_TOL * max(total, 1.0)):
+            return None, None
+        nu = nu * (total / nu.sum()) if nu.sum() > 0 else nu
+        c = -cost if maximize else cost
+
+        basis, flow = None, None
+        self.warm_started = False
+        if self.warm_start and (m, n) in self._bases:
+            basis = self._bases[(m, n)]
+            flow = _tree_flows(basis, mu, nu)
+            self.warm_started = flow is not None
+        if flow is None:
+            basis, flow = _north_west_corner(mu, nu)
+
+        result = _transport_simplex(c, basis, flow, self.max_pivots)
+        if result is None:
+            return solve_ot_linprog(mu, nu, cost, maximize)
+        basis, flow, self.n_pivots = result
+        self._bases[(m, n)] = basis
+
+        gamma = np.zeros((m, n))
+        for (i, j), x in zip(basis, flow):
+            gamma[i, j] = max(x, 0.0)
+        return gamma, float((gamma * cost).sum())
+
+
+    def rhs_ranging(self, mu: np.ndarray, nu: np.ndarray, cost: np.ndarray,
+                    d_mu: np.ndarray, d_nu: np.ndarray,
+                    maximize: bool = False) -> Tuple[Optional[np.ndarray], Optional[float],
+                                                     float, bool]:
+        """Solve at (mu, nu), then range the marginals along (d_mu, d_nu).
+
+        The marginals move as mu + eps * d_mu, nu + eps * d_nu (both
+        directions must have the same total, usually zero). The optimal
+        basis stays optimal while its flows x + eps * dx stay non-negative,
+        since the costs do not move, so the optimal coupling is affine in
+        eps up to the first breakpoint eps_break = min over dx < 0 of
+        x / -dx. At that point a positive flow reaches zero and the
+        support changes.
+
+        Returns (gamma, value, eps_break, degenerate). eps_break is inf if
+        no flow ever decreases. `degenerate` is True when a zero-flow basic
+        cell moves along the direction. In that case the support changes
+        at eps = 0+ for this basis, but possibly not for the LP, and
+        callers should search the breakpoint numerically instead.
+        """
+        gamma, value = self.solve(mu, nu, cost, maximize)
+        if gamma is None:
+            return None, None, 0.0, False
+        m, n = gamma.shape
+        basis = self._bases[(m, n)]
+        x = np.array([gamma[i, j] for i, j in basis])
+        dx = _tree_solve(basis, np.asarray(d_mu, dtype=float), np.asarray(d_nu, dtype=float))
+
+        tol = 1e-12 * max(np.abs(x).max(), 1.0)
+        dtol = 1e-12 * max(np.abs(dx).max(), 1.0)
+        zero = x <= tol
+        degenerate = bool(np.any(zero & (np.abs(dx) > dtol)))
+        decreasing = ~zero & (dx < -dtol)
+        eps_break = float(np.min(x[decreasing] / -dx[decreasing])) if decreasing.any() else np.inf
+        return gamma, value, eps_break, degenerate
+
+
+_default_solver = OTSolver()
+
+
+def solve_ot(mu: np.ndarray, nu: np.ndarray, cost: np.ndarray,
+             maximize: bool = False) -> Tuple[Optional[np.ndarray], Optional[float]]:
+    """Solve an OT problem with a module-level warm-started `OTSolver`.
+
+    Returns (gamma, value) like `OTSolver.solve`.
+    """
+    return _default_solver.solve(mu, nu, cost, maximize)
+
+
+def solve_row_marginal_ot(marginal: np.ndarray,
+                          cost: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Minimize sum gamma * cost subject only to the row marginal.
+
+    With the column marginal free the LP separates by row: each row's mass
+    goes to its cheapest column (the first one on ties). Returns
+    (gamma, value).
+    """
+    marginal = np.asarray(marginal, dtype=float)
+    cost = np.asarray(cost, dtype=float)
+    gamma = np.zeros(cost.shape)
+    gamma[np.arange(cost.shape[0]), np.argmin(cost, axis=1)] = marginal
+    return gamma, float((gamma * cost).sum())
+
+
+def rhs_ranging(mu: np.ndarray, nu: np.ndarray, cost: np.ndarray,
+                d_mu: np.ndarray, d_nu: np.ndarray, maximize: bool = False):
+    """`OTSolver.rhs_ranging` with the module-level solver."""
+    return _default_solver.rhs_ranging(mu, nu, cost, d_mu, d_nu, maximize)
+
+
+# ---------------------------------------------------------------------------
+# Transportation simplex internals
+# ---------------------------------------------------------------------------
+
+def _north_west_corner(mu, nu):
+    """Initial basic feasible solution with exactly m + n - 1 basic cells."""
+    m, n = len(mu), len(nu)
+    supply, demand = mu.copy(), nu.copy()
+    basis, flow = [], []
+    i = j = 0
+    while i < m and j < n:
+        x = min(supply[i], demand[j])
+        basis.append((i, j))
+        flow.append(x)
+        supply[i] -= x
+        demand[j] -= x
+        # Advance exactly one index (keeps degenerate zero cells basic)
+        if i < m - 1 and (supply[i] <= demand[j] or j == n - 1):
+            i += 1
+        else:
+            j += 1
+    return basis, np.array(flow)
+
+
+def _tree_adjacency(basis, m, n):
+    """Adjacency of the basis tree; rows are nodes 0..m-1, columns m..m+n-1."""
+    adj = [[] for _ in range(m + n)]
+    for k, (i, j) in enumerate(basis):
+        adj[i].append((m + j, k))
+        adj[m + j].append((i, k))
+    return adj
+
+
+def _tree_solve(basis, mu, nu):
+    """Flows on the basis tree that meet (mu, nu); may be negative.
+
+    Returns None if the basis does not span all rows and columns.
+    """
+    m, n = len(mu), len(nu)
+    adj = _tree_adjacency(basis, m, n)
+    residual = np.concatenate([mu, nu]).astype(float)
+    degree = np.array([len(a) for a in adj])
+    flow = np.zeros(len(basis))
+    assigned = np.zeros(len(basis), dtype=bool)
+    leaves = deque(v for v in range(m + n) if degree[v] == 1)
+    while leaves:
+        v = leaves.popleft()
+        edges = [(w, k) for w, k in adj[v] if not assigned[k]]
+        if not edges:
+            continue
+        w, k = edges[0]
+        flow[k] = residual[v]
+        assigned[k] = True
+        residual[w] -= residual[v]
+        degree[w] -= 1
+        if degree[w] == 1:
+            leaves.append(w)
+    return flow if assigned.all() else None
+
+
+def _tree_flows(basis, mu, nu):
+    """Flows of `basis` for marginals (mu, nu); None if any is negative."""
+    flow = _tree_solve(basis, mu, nu)
+    if flow is None or np.any(flow < -1e-12 * max(mu.sum(), 1.0)):
+        return None
+    return np.maximum(flow, 0.0)
+
+
+def _duals(c, basis, m, n):
+    """MODI potentials u (rows), v (columns) with u_i + v_j = c_ij on the basis."""
+    adj = _tree_adjacency(basis, m, n)
+    pot = np.full(m + n, np.nan)
+    pot[0] = 0.0
+    queue = deque([0])
+    while queue:
+        a = queue.popleft()
+        for b, k in adj[a]:
+            if np.isnan(pot[b]):
+                i, j = basis[k]
+                pot[b] = c[i, j] - pot[a]
+                queue.append(b)
+    return pot[:m], pot[m:]
+
+
+def _tree_path(basis, m, n, src, dst):
+    """Basis cell indices along the tree path from node src to node dst."""
+    adj = _tree_adjacency(basis, m, n)
+    prev = {src: None}
+    queue = deque([src])
+    while queue:
+        a = queue.popleft()
+        if a == dst:
+            break
+        for b, k in adj[a]:
+            if b not in prev:
+                prev[b] = (a, k)
+                queue.append(b)
+    path = []
+    node = dst
+    while prev[node] is not None:
+        node, k = prev[node]
+        path.append(k)
+    return path  # ordered from dst back to src
+
+
+def _transport_simplex(c, basis, flow, max_pivots):
+    """Pivot from a basic feasible solution to an optimal one.
+
+    Returns (basis, flow, n_pivots), or None if `max_pivots` is exceeded.
+    """
+    m, n = c.shape
+    basis, flow = list(basis), np.array(flow, dtype=float)
+    for pivot in range(max_pivots + 1):
+        u, v = _duals(c, basis, m, n)
+        reduced = c - u[:, None] - v[None, :]
+        for i, j in basis:
+            reduced[i, j] = 0.0
+        scale = max(np.abs(c).max(), 1.0)
+        i_in, j_in = np.unravel_index(np.argmin(reduced), reduced.shape)
+        if reduced[i_in, j_in] >= -OPT_TOL * scale:
+            return basis, flow, pivot
+        if pivot == max_pivots:
+            return None
+
+        # Entering cell closes the cycle (row i_in) -> ... -> (column j_in);
+        # along the path from the column back to the row, cells alternate
+        # between losing and gaining theta, starting with a loss.
+        path = _tree_path(basis, m, n, i_in, m + j_in)
+        losing = path[0::2]
+        gaining = path[1::2]
+        k_out = min(losing, key=lambda k: (flow[k], k))
+        theta = flow[k_out]
+        flow[losing] -= theta
+        flow[gaining] += theta
+        basis[k_out] = (i_in, j_in)
+        flow[k_out] = theta
+    return None
@@ -0,0 +1,282 @@
+"""
+Disk memoization of simulation results, shared across scripts and runs.
+
+`memoize` wraps a simulation function so its result is stored on disk
+under a hash of:
+
+- the function's qualified name and the source of its module (code version)
+- an explicit `version` number, bumped when dependencies change behaviour
+- every argument, canonicalized: arrays by dtype/shape/bytes, objects such
+  as MarkovChain by their public attributes, and np.random.Generator
+  arguments by their bit-generator state (i.e. seed and position)
+
+On a hit, arrays come back as read-only memory maps, and each Generator
+argument is moved to the state it had after the original call. Later draws
+from the same generator are therefore identical whether or not the call
+was cached.
+Calls with rng=None (fresh OS entropy) are never cached.
+
+Entries are directories written to a temporary name and renamed into
+place, so concurrent workers never see a partial entry; the loser of a
+race discards its copy. Once the cache exceeds its size budget, least-
+recently-used entries are evicted under an inter-process file lock.
+
+Environment:
+    SIM_CACHE=0          disable (every call recomputes)
+    SIM_CACHE_DIR        cache directory (default <workspace>/.cache/sim_results)
+    SIM_CACHE_MAX_MB     size budget (default 1024)
+
+Usage:
+    @memoize(version=1)
+    def simulate_path(mc, T, rng):
+        return mc.simulate(T, rng=rng)
+
+    states = simulate_path(mc, 5000, np.random.default_rng(42))
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import marshal
+import os
+import shutil
+import sys
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # no inter-process locking off POSIX
+    fcntl = None
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache" / "sim_results"
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+_META = "meta.json"
+
+
+class SimCache:
+    """Directory of memoized results with LRU eviction by total size."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def load(self, key: str) -> Optional[Tuple[Any, List]]:
+        """(result, generator end states) for `key`, or None on a miss."""
+        entry = self.cache_dir / key
+        try:
+            meta = json.loads((entry / _META).read_text())
+            result = _decode(meta["result"], entry)
+            os.utime(entry / _META)  # mark as recently used
+        except (FileNotFoundError, NotADirectoryError):
+            return None  # missing, or evicted while we were reading
+        return result, meta["rng_states"]
+
+    def store(self, key: str, result: Any, rng_states: List, label: str = ""):
+        """Write an entry atomically; a concurrent writer of the same key wins."""
+        tmp = self.cache_dir / f".tmp-{key}-{uuid.uuid4().hex}"
+        tmp.mkdir()
+        meta = {"function": label, "result": _encode(result, tmp, [0]),
+                "rng_states": rng_states}
+        (tmp / _META).write_text(json.dumps(meta))
+        try:
+            os.rename(tmp, self.cache_dir / key)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict()
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+
+    def size_bytes(self) -> int:
+        return sum(f.stat().st_size for f in self.cache_dir.rglob("*") if f.is_file())
+
+    def _evict(self):
+        """Drop least-recently-used entries until the cache fits max_bytes."""
+        with self._lock, open(self.cache_dir / ".lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = []
+            for entry in self.cache_dir.iterdir():
+                meta = entry / _META
+                if entry.name.startswith(".") or not meta.exists():
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in entry.iterdir())
+                    entries.append((meta.stat().st_mtime, size, entry))
+                except FileNotFoundError:
+                    continue
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                # Readers holding memory maps of these files keep them on POSIX
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+
+_default_cache = None
+
+
+def default_cache() -> Optional[SimCache]:
+    """Process-wide cache configured from the environment (None if disabled)."""
+    global _default_cache
+    if os.environ.get("SIM_CACHE", "1") == "0":
+        return None
+    if _default_cache is None:
+        max_mb = float(os.environ.get("SIM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 ** 2))
+        _default_cache = SimCache(os.environ.get("SIM_CACHE_DIR", DEFAULT_CACHE_DIR),
+                                  max_bytes=int(max_mb * 1024 ** 2))
+    return _default_cache
+
+
+def memoize(version: int = 0, cache: Optional[SimCache] = None) -> Callable:
+    """Decorator caching a simulation function's result on disk.
+
+    Parameters
+    ----------
+    version : int
+        Part of the key; bump it when code outside the function's module
+        changes what the function returns
+    cache : SimCache, optional
+        Cache to use (default: default_cache(), re-read on every call)
+
+    The result must be an array, a scalar, or a tuple/list/str-keyed dict
+    of those. Arguments must be canonicalizable (see `_feed`).
+    """
+    def decorator(fn):
+        sig = inspect.signature(fn)
+        label = f"{fn.__module__}.{fn.__qualname__}"
+        code_hash = []
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            store = cache if cache is not None else default_cache()
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if store is None or bound.arguments.get("rng", 0) is None:
+                return fn(*args, **kwargs)
+
+            if not code_hash:
+                code_hash.append(_code_version(fn))
+            h = hashlib.sha256()
+            h.update(f"{label}\0{code_hash[0]}\0{version}\0".encode())
+            _feed(h, dict(bound.arguments))
+            key = h.hexdigest()
+
+            generators = [v for v in bound.arguments.values()
+                          if isinstance(v, np.random.Generator)]
+            hit = store.load(key)
+            if hit is not None:
+                result, rng_states = hit
+                for g, state in zip(generators, rng_states):
+                    g.bit_generator.state = state
+                return result
+
+            result = fn(*bound.args, **bound.kwargs)
+            store.store(key, result, [g.bit_generator.state for g in generators], label)
+            return result
+
+        return wrapper
+    return decorator
+
+
+def canonical_hash(obj) -> str:
+    """sha256 hex digest of obj's canonical encoding (see `_feed`)."""
+    h = hashlib.sha256()
+    _feed(h, obj)
+    return h.hexdigest()
+
+
+def _code_version(fn) -> str:
+    """Hash of fn's module source (of fn's bytecode if the source is unavailable)."""
+    try:
+        code = inspect.getsource(sys.modules[fn.__module__]).encode()
+    except (OSError, TypeError):
+        code = marshal.dumps(fn.__code__)
+    return hashlib.sha256(code).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Canonical hashing of arguments
+# ----------------------------------------------------------------------
+
+def _feed(h, obj):
+    """Update hash `h` with a canonical, type-tagged encoding of obj."""
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        h.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, (np.ndarray, np.generic)):
+        arr = np.ascontiguousarray(obj)
+        h.update(f"nd:{arr.dtype.str}:{arr.shape};".encode())
+        h.update(arr.tobytes())
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}:{len(obj)}[".encode())
+        for item in obj:
+            _feed(h, item)
+        h.update(b"]")
+    elif isinstance(obj, dict):
+        h.update(f"dict:{len(obj)}{{".encode())
+        for k in sorted(obj, key=repr):
+            _feed(h, k)
+            _feed(h, obj[k])
+        h.update(b"}")
+    elif isinstance(obj, np.random.Generator):
+        state = json.dumps(obj.bit_generator.state, sort_keys=True, default=str)
+        h.update(f"rng:{state};".encode())
+    elif hasattr(obj, "__dict__"):
+        cls = type(obj)
+        h.update(f"obj:{cls.__module__}.{cls.__qualname__}".encode())
+        _feed(h, {k: v for k, v in vars(obj).items()
+                  if not k.startswith("_") and not callable(v)})
+    else:
+        raise TypeError(f"Cannot build a cache key from {type(obj).__name__}")
+
+
+# ----------------------------------------------------------------------
+# Result layout: arrays as .npy files, structure in meta.json
+# ----------------------------------------------------------------------
+
+def _encode(obj, directory: Path, counter: List[int]):
+    if isinstance(obj, (np.ndarray, np.generic)):
+        name = f"a{counter[0]}.npy"
+        counter[0] += 1
+        np.save(directory / name, np.asarray(obj))
+        return {"array": name, "scalar": isinstance(obj, np.generic)}
+    if isinstance(obj, (list, tuple)):
+        return {type(obj).__name__: [_encode(item, directory, counter) for item in obj]}
+    if isinstance(obj, dict):
+        if not all(isinstance(k, str) for k in obj):
+            raise TypeError("Only dicts with str keys can be cached")
+        return {"dict": {k: _encode(v, directory, counter) for k, v in obj.items()}}
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return {"value": obj}
+    raise TypeError(f"Cannot cache a result of type {type(obj).__name__}")
+
+
+def _decode(spec, directory: Path):
+    if "array" in spec:
+        try:
+            arr = np.load(directory / spec["array"], mmap_mode="r")
+        except ValueError:  # empty arrays cannot be memory-mapped
+            arr = np.load(directory / spec["array"])
+        return arr[()] if spec["scalar"] else arr
+    if "list" in spec:
+        return [_decode(s, directory) for s in spec["list"]]
+    if "tuple" in spec:
+        return tuple(_decode(s, directory) for s in spec["tuple"])
+    if "dict" in spec:
+        return {k: _decode(s, directory) for k, s in spec["dict"].items()}
+    return spec["value"]
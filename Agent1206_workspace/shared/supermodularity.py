@@ -0,0 +1,155 @@
+"""
+Supermodularity (increasing differences) of payoffs under total orders on
+the state space. Used by the SA7 monotonicity scripts and the
+RefineAIReview verification checks.
+"""
+
+import numpy as np
+from fractions import Fraction
+from math import factorial
+from typing import List, Optional, Tuple, Union
+
+# Bitmask DP over subsets needs 2**n counters
+MAX_DP_STATES = 20
+
+
+def action_differences(payoff_matrix: np.ndarray) -> np.ndarray:
+    """Payoff differences u[s, a'] - u[s, a] for every action pair a < a'.
+
+    Returns an array of shape (n_states, n_action_pairs).
+    """
+    a, a_prime = np.triu_indices(payoff_matrix.shape[1], k=1)
+    return payoff_matrix[:, a_prime] - payoff_matrix[:, a]
+
+
+def second_differences(payoff_matrix: np.ndarray,
+                       orders: Optional[np.ndarray] = None) -> np.ndarray:
+    """Cross differences of the payoff for every pair of ranks and actions.
+
+    Returns an array of shape (..., n, n, n_action_pairs) with
+    [..., i, j, p] = D[order[j], p] - D[order[i], p], D from
+    `action_differences`; `orders` is None (row order), one permutation
+    or an (n_orders, n_states) batch. Increasing differences requires
+    these to be >= 0 wherever rank i < rank j.
+    """
+    diffs = action_differences(payoff_matrix)
+    if orders is not None:
+        diffs = diffs[np.asarray(orders)]
+    return diffs[..., None, :, :] - diffs[..., :, None, :]
+
+
+def check_increasing_differences(payoff_matrix: np.ndarray,
+                                 order: Optional[np.ndarray] = None,
+                                 tol: float = 1e-12,
+                                 strict: bool = False) -> Tuple[bool, List[Tuple]]:
+    """Check increasing differences of payoff_matrix[state, action].
+
+    States are ranked by `order` (order[r] = state at rank r, lowest first;
+    default: row order) and actions by column index. For every pair of
+    states s_low below s_high and actions a < a':
+      u[s_high, a'] - u[s_high, a] >= u[s_low, a'] - u[s_low, a]
+    (strictly greater, beyond `tol`, if `strict`).
+
+    Returns (is_supermodular, violations) with one
+    (s_low, s_high, a, a_prime, diff_high - diff_low) tuple per violated
+    inequality, states given as row indices.
+    """
+    n = payoff_matrix.shape[0]
+    order = np.arange(n) if order is None else np.asarray(order)
+    margin = second_differences(payoff_matrix, order)
+    bad = margin <= tol if strict else margin < -tol
+    violated = bad & np.triu(np.ones((n, n), dtype=bool), k=1)[:, :, None]
+    a, a_prime = np.triu_indices(payoff_matrix.shape[1], k=1)
+    violations = [(int(order[i]), int(order[j]), int(a[p]), int(a_prime[p]),
+                   float(margin[i, j, p]))
+                  for i, j, p in zip(*np.nonzero(violated))]
+    return len(violations) == 0, violations
+
+
+def count_violations(payoff_matrix: np.ndarray, orders: np.ndarray,
+                     tol: float = 1e-12,
+                     strict: bool = False) -> Union[int, np.ndarray]:
+    """Number of violated increasing-differences inequalities per order.
+
+    `orders` is one permutation of the states (lowest rank first) or an
+    (n_orders, n_states) array of them, checked in one vectorized pass.
+    Returns an int, or an (n_orders,) array; zero means supermodular.
+    """
+    orders = np.asarray(orders)
+    # bad[s, t]: inequalities violated when s is ranked below t
+    margin = second_differences(payoff_matrix)
+    bad = (margin <= tol if strict else margin < -tol).sum(axis=-1)
+
+    n = payoff_matrix.shape[0]
+    upper = np.triu(np.ones((n, n), dtype=bool), k=1)
+    counts = (bad[orders[..., :, None], orders[..., None, :]] * upper).sum(axis=(-2, -1))
+    return int(counts) if counts.ndim == 0 else counts
+
+
+def precedence_relation(payoff_matrix: np.ndarray, tol: float = 1e-12) -> np.ndarray:
+    """Which states may be ranked below which under increasing differences.
+
+    Returns a boolean (n_states, n_states) matrix R with R[i, j] True when
+    placing state i below state j violates no increasing-differences
+    inequality, i.e. u[j, a'] - u[j, a] >= u[i, a'] - u[i, a] - tol for
+    all a < a'. A total order is supermodular iff R[i, j] holds for every
+    pair with i ranked below j.
+    """
+    return np.all(second_differences(payoff_matrix) >= -tol, axis=-1)
+
+
+def count_supermodular_orders(payoff_matrix: np.ndarray,
+                              tol: float = 1e-12) -> Tuple[int, int]:
+    """Count the total orders on states under which the payoff is supermodular.
+
+    Orders are counted as linear extensions of `precedence_relation`:
+    f(S) = number of valid rankings of the state set S as the bottom |S|
+    states, and state v can be stacked on S iff R[u, v] for all u in S.
+    The DP over subsets (bitmasks) is evaluated one popcount layer at a
+    time, vectorized over all masks in the layer, in O(2^n n) work.
+
+    Parameters
+    ----------
+    payoff_matrix : np.ndarray
+        payoff_matrix[state, action], actions ordered by column index
+    tol : float
+        Slack allowed in each increasing-differences inequality
+
+    Returns (n_valid_orders, n_total_orders) with n_total_orders = n!.
+    """
+    n = payoff_matrix.shape[0]
+    if n > MAX_DP_STATES:
+        raise ValueError(f"Exact order counting supports at most {MAX_DP_STATES} "
+                         f"states, got {n}")
+    R = precedence_relation(payoff_matrix, tol)
+
+    # A pair that can be ranked neither way rules out every order
+    if not np.all(R | R.T):
+        return 0, factorial(n)
+
+    # allowed_below[v]: bitmask of states that may sit below v
+    allowed_below = (R.astype(np.int64) << np.arange(n)[:, None]).sum(axis=0)
+
+    masks = np.arange(1 << n, dtype=np.int64)
+    popcount = np.zeros(1 << n, dtype=np.int64)
+    for v in range(n):
+        popcount += (masks >> v) & 1
+
+    f = np.zeros(1 << n, dtype=np.int64)
+    f[0] = 1
+    for k in range(n):
+        layer = masks[(popcount == k)]
+        layer = layer[f[layer] > 0]
+        for v in range(n):
+            ok = ((layer & ~allowed_below[v]) == 0) & (((layer >> v) & 1) == 0)
+            src = layer[ok]
+            f[src | (1 << v)] += f[src]
+
+    return int(f[-1]), factorial(n)
+
+
+def supermodular_fraction(payoff_matrix: np.ndarray,
+                          tol: float = 1e-12) -> Fraction:
+    """Exact fraction of total orders under which the payoff is supermodular."""
+    count, total = count_supermodular_orders(payoff_matrix, tol)
+    return Fraction(count, total)
@@ -0,0 +1,250 @@
+"""
+On-disk store of simulated trajectories (states, actions, beliefs, ...).
+
+A store is a directory with one or more chunked arrays and a
+`manifest.json` recording the simulation parameters, the seed and, for
+every array, its dtype, shape and chunk files. Each chunk is a plain .npy
+file holding up to `chunk_len` rows along axis 0 (usually time).
+
+Writing appends rows chunk by chunk, so long simulations never need the
+full array in memory. Reading opens chunks as read-only memory maps: a
+`ChunkedArray` only touches the chunks a slice needs, and a slice inside
+one chunk is a zero-copy view.
+
+Usage:
+    with TrajectoryStore.create('signal_data', params={'T': T, 'alpha': 0.3},
+                                seed=42) as store:
+        store.write('states', states)
+        for chunk in chunks:
+            store.append('beliefs', chunk)
+
+    store = TrajectoryStore.open('signal_data')
+    store.params['T'], store['states'].shape
+    store['beliefs'][1000:2000]           # reads only the chunks it needs
+    for block in store['beliefs'].iter_chunks():
+        ...
+"""
+
+import json
+import os
+import shutil
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+MANIFEST = 'manifest.json'
+DEFAULT_CHUNK_BYTES = 64 * 1024 ** 2
+
+
+class ChunkedArray:
+    """Read-only, lazily loaded array stored as .npy chunks along axis 0."""
+
+    def __init__(self, directory: str, name: str, spec: Dict):
+        self.name = name
+        self.dtype = np.dtype(spec['dtype'])
+        self.shape = tuple(spec['shape'])
+        self.chunk_len = spec['chunk_len']
+        self._paths = [os.path.join(directory, f) for f in spec['chunks']]
+        self._chunks = [None] * len(self._paths)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __repr__(self):
+        return (f"ChunkedArray({self.name!r}, shape={self.shape}, dtype={self.dtype}, "
+                f"chunks={len(self._paths)})")
+
+    def chunk(self, k: int) -> np.ndarray:
+        """Chunk k as a read-only memory map."""
+        if self._chunks[k] is None:
+            self._chunks[k] = np.load(self._paths[k], mmap_mode='r')
+        return self._chunks[k]
+
+    def iter_chunks(self) -> Iterator[np.ndarray]:
+        """Yield the chunks in order (memory maps, no copies)."""
+        for k in range(len(self._paths)):
+            yield self.chunk(k)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        first, rest = key[0], key[1:]
+        if isinstance(first, (int, np.integer)):
+            i = int(first) + (len(self) if first < 0 else 0)
+            if not 0 <= i < len(self):
+                raise IndexError(f"index {first} out of range for length {len(self)}")
+            return self.chunk(i // self.chunk_len)[(i % self.chunk_len,) + rest]
+        if not isinstance(first, slice):
+            raise TypeError("ChunkedArray supports integer and slice indexing along axis 0")
+
+        start, stop, step = first.indices(len(self))
+        if step < 0:
+            r = range(start, stop, step)
+            if not r:
+                return self[(slice(0, 0),) + rest]
+            return self[(slice(r[-1], r[0] + 1),) + rest][::-1][::-step]
+        pieces = []
+        pos = start
+        while pos < stop:
+            k = pos // self.chunk_len
+            offset = k * self.chunk_len
+            local_stop = min(stop, offset + self.chunk_len) - offset
+            pieces.append(self.chunk(k)[(slice(pos - offset, local_stop, step),) + rest])
+            # First index at or after the next chunk on the step grid
+            next_chunk = offset + self.chunk_len
+            pos = pos + -(-(next_chunk - pos) // step) * step
+        if not pieces:
+            return np.empty((0,) + self.shape[1:], dtype=self.dtype)[(slice(None),) + rest]
+        if len(pieces) == 1:
+            return pieces[0]
+        return np.concatenate(pieces)
+
+    def __array__(self, dtype=None, copy=None):
+        out = self[:]
+        return np.asarray(out, dtype=dtype)
+
+
+class TrajectoryStore:
+    """Directory of chunked trajectory arrays with a JSON manifest.
+
+    Attributes
+    ----------
+    path : str
+        Store directory
+    params : dict
+        Simulation parameters recorded at creation
+    seed : int or None
+        Root seed of the simulation
+    """
+
+    def __init__(self, path: str, manifest: Dict, writable: bool):
+        self.path = path
+        self.params = manifest.get('params', {})
+        self.seed = manifest.get('seed')
+        self._specs = manifest.get('arrays', {})
+        self._writable = writable
+        self._open = {}  # name -> (memmap of the chunk being filled, rows filled)
+
+    @classmethod
+    def create(cls, path: str, params: Optional[Dict] = None, seed=None,
+               overwrite: bool = True) -> 'TrajectoryStore':
+        """Create an empty store at `path` (replacing an existing one if overwrite)."""
+        if os.path.exists(path):
+            if not overwrite:
+                raise FileExistsError(f"Trajectory store {path} already exists")
+            shutil.rmtree(path)
+        os.makedirs(path)
+        store = cls(path, {'params': params or {}, 'seed': seed, 'arrays': {}}, writable=True)
+        store._write_manifest()
+        return store
+
+    @classmethod
+    def open(cls, path: str) -> 'TrajectoryStore':
+        """Open an existing store read-only."""
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        return cls(path, manifest, writable=False)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, MANIFEST))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._writable:
+            self.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def keys(self):
+        return self._specs.keys()
+
+    def __getitem__(self, name: str) -> ChunkedArray:
+        if name in self._open:
+            raise RuntimeError(f"Array {name!r} is still being written; close the store first")
+        return ChunkedArray(self.path, name, self._specs[name])
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, name: str, rows: np.ndarray, chunk_len: Optional[int] = None):
+        """Append rows (along axis 0) to array `name`, creating it on first use.
+
+        chunk_len (rows per chunk file) is fixed by the first call; by
+        default chunks are about 64 MB.
+        """
+        if not self._writable:
+            raise RuntimeError(f"Trajectory store {self.path} is open read-only")
+        rows = np.asarray(rows)
+        if name not in self._specs:
+            if chunk_len is None:
+                row_bytes = max(rows[:1].nbytes, 1)
+                chunk_len = max(1, DEFAULT_CHUNK_BYTES // row_bytes)
+            self._specs[name] = {'dtype': rows.dtype.str, 'shape': [0] + list(rows.shape[1:]),
+                                 'chunk_len': int(chunk_len), 'chunks': []}
+        spec = self._specs[name]
+        if list(rows.shape[1:]) != spec['shape'][1:]:
+            raise ValueError(f"Rows for {name!r} have shape {rows.shape[1:]}, "
+                             f"expected {tuple(spec['shape'][1:])}")
+
+        pos = 0
+        while pos < len(rows):
+            if name not in self._open:
+                fname = f"{name}.{len(spec['chunks']):05d}.npy"
+                spec['chunks'].append(fname)
+                mm = np.lib.format.open_memmap(
+                    os.path.join(self.path, fname), mode='w+', dtype=np.dtype(spec['dtype']),
+                    shape=(spec['chunk_len'],) + tuple(spec['shape'][1:]))
+                self._open[name] = (mm, 0)
+            mm, filled = self._open[name]
+            n = min(len(rows) - pos, spec['chunk_len'] - filled)
+            mm[filled:filled + n] = rows[pos:pos + n]
+            pos += n
+            filled += n
+            spec['shape'][0] += n
+            if filled == spec['chunk_len']:
+                mm.flush()
+                del self._open[name]
+            else:
+                self._open[name] = (mm, filled)
+
+    def write(self, name: str, array: np.ndarray, chunk_len: Optional[int] = None):
+        """Write a whole array (a single append; chunks no longer than the array)."""
+        array = np.asarray(array)
+        if chunk_len is None and name not in self._specs:
+            row_bytes = max(array[:1].nbytes, 1)
+            chunk_len = max(1, min(DEFAULT_CHUNK_BYTES // row_bytes, len(array)))
+        self.append(name, array, chunk_len=chunk_len)
+
+    def close(self):
+        """Truncate partially filled chunks and write the manifest."""
+        while self._open:
+            name, (mm, filled) = self._open.popitem()
+            path, data = mm.filename, np.array(mm[:filled])
+            del mm
+            np.save(path, data)
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {'params': self.params, 'seed': self.seed, 'arrays': self._specs}
+        tmp = os.path.join(self.path, MANIFEST + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2, default=_json_default)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+
+def _json_default(obj):
+    """Serialize numpy scalars and arrays in params."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,29 @@
+"""
+Per-script worker budget for the process pools in shared/.
+
+Run standalone, a script may use every CPU. The orchestrator, however,
+runs several scripts at once. It therefore sets SCRIPT_WORKERS to each
+script's share of the CPUs, and the pools in run_replicates,
+evaluate_grid and FigureQueue size themselves from it, so that the
+scripts together do not oversubscribe the machine.
+
+Environment:
+    SCRIPT_WORKERS       worker processes per script (default os.cpu_count())
+"""
+
+import os
+
+WORKERS_ENV = 'SCRIPT_WORKERS'
+
+
+def default_workers() -> int:
+    """Worker processes a pool in this script may start (at least 1)."""
+    budget = os.environ.get(WORKERS_ENV)
+    if budget:
+        return max(1, int(budget))
+    return os.cpu_count() or 1
+
+
+def worker_budget(n_cpus: int, n_concurrent: int) -> int:
+    """Workers each of `n_concurrent` scripts gets when sharing `n_cpus`."""
+    return max(1, n_cpus // max(1, n_concurrent))
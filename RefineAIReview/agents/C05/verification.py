@@ -7,7 +7,13 @@ We demonstrate:
 3. Adding a function of theta alone preserves supermodularity
 """
 
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..',
+                                'Agent1206_workspace'))
+
 import numpy as np
+from shared.supermodularity import check_increasing_differences
 
 
 def check_supermodularity(g, states, actions):
@@ -16,23 +22,12 @@ def check_supermodularity(g, states, actions):
     For all theta_H > theta_L and a_H > a_L:
       g(theta_H, a_H) - g(theta_H, a_L) >= g(theta_L, a_H) - g(theta_L, a_L)
     """
-    violations = []
-    for i, theta_H in enumerate(states):
-        for j, theta_L in enumerate(states):
-            if j >= i:
-                continue
-            for k, a_H in enumerate(actions):
-                for l, a_L in enumerate(actions):
-                    if l >= k:
-                        continue
-                    diff_H = g[i][k] - g[i][l]
-                    diff_L = g[j][k] - g[j][l]
-                    if diff_H < diff_L - 1e-10:
-                        violations.append({
-                            'theta_H': theta_H, 'theta_L': theta_L,
-                            'a_H': a_H, 'a_L': a_L,
-                            'diff_H': diff_H, 'diff_L': diff_L
-                        })
+    _, found = check_increasing_differences(np.asarray(g, dtype=float), tol=1e-10)
+    violations = [{
+        'theta_H': states[i], 'theta_L': states[j],
+        'a_H': actions[k], 'a_L': actions[l],
+        'diff_H': g[i][k] - g[i][l], 'diff_L': g[j][k] - g[j][l]
+    } for j, i, l, k, _ in found]
     return len(violations) == 0, violations
 
 
@@ -6,6 +6,14 @@ payoffs u1 that depend only on theta_t preserve strict supermodularity despite b
 constant in theta_{t-1}.
 """
 
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..',
+                                'Agent1206_workspace'))
+
+import numpy as np
+from shared.supermodularity import action_differences, second_differences
+
 
 def check_strict_supermodularity(u, states_ordered, actions_ordered):
     """
@@ -18,24 +26,26 @@ def check_strict_supermodularity(u, states_ordered, actions_ordered):
     violations = []
     satisfied = []
 
+    U = np.array([[u[(s, a)] for a in actions_ordered] for s in states_ordered])
+    diffs = action_differences(U)
+    margin = second_differences(U)  # [low, high, action pair]
+    a_L, a_H = np.triu_indices(len(actions_ordered), k=1)
+    pairs = np.lexsort((a_L, a_H))
+
     for i in range(len(states_ordered)):
         for j in range(i):
             s_H = states_ordered[i]
             s_L = states_ordered[j]
-            for k in range(len(actions_ordered)):
-                for l in range(k):
-                    a_H = actions_ordered[k]
-                    a_L = actions_ordered[l]
-
-                    diff_H = u[(s_H, a_H)] - u[(s_H, a_L)]
-                    diff_L = u[(s_L, a_H)] - u[(s_L, a_L)]
-
-                    if diff_H > diff_L + 1e-10:
-                        satisfied.append(f"  {s_H} vs {s_L}: diff_H={diff_H:.3f} > diff_L={diff_L:.3f} ✓")
-                    elif abs(diff_H - diff_L) < 1e-10:
-                        violations.append(f"  {s_H} vs {s_L}: diff_H={diff_H:.3f} = diff_L={diff_L:.3f} (weak, not strict)")
-                    else:
-                        violations.append(f"  {s_H} vs {s_L}: diff_H={diff_H:.3f} < diff_L={diff_L:.3f} ✗")
+            for p in pairs:
+                diff_H = diffs[i, p]
+                diff_L = diffs[j, p]
+
+                if margin[j, i, p] > 1e-10:
+                    satisfied.append(f"  {s_H} vs {s_L}: diff_H={diff_H:.3f} > diff_L={diff_L:.3f} ✓")
+                elif abs(margin[j, i, p]) < 1e-10:
+                    violations.append(f"  {s_H} vs {s_L}: diff_H={diff_H:.3f} = diff_L={diff_L:.3f} (weak, not strict)")
+                else:
+                    violations.append(f"  {s_H} vs {s_L}: diff_H={diff_H:.3f} < diff_L={diff_L:.3f} ✗")
 
     return violations, satisfied
 